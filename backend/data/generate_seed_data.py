@@ -13,8 +13,13 @@ Usage:
 
 import os
 import sqlite3
+import sys
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.schema import SEED_DERIVED_TABLES, ensure_schema
+
 TODAY = datetime(2026, 2, 26, 12, 0, 0)
 
 # ── Experience catalog ──────────────────────────────────────────────────────
@@ -687,6 +692,8 @@ def create_database(db_path: str) -> None:
         cur.execute("DROP TABLE IF EXISTS incoming_calls;")
         cur.execute("DROP TABLE IF EXISTS booking_refund_records;")
         cur.execute("DROP TABLE IF EXISTS customer_profiles;")
+        for table in SEED_DERIVED_TABLES:
+            cur.execute(f"DROP TABLE IF EXISTS {table};")
         cur.execute(_DDL_CUSTOMERS)
         cur.execute(_DDL_BOOKINGS)
         cur.execute(_DDL_CALLS)
@@ -713,6 +720,7 @@ def create_database(db_path: str) -> None:
             );""")
 
         conn.commit()
+        ensure_schema(db_path)
 
         # Print summary
         for t in ("customer_profiles", "booking_refund_records", "incoming_calls"):
@@ -0,0 +1,155 @@
+"""Per-customer booking aggregates: the counts Layer 2 and the profile refresh read.
+
+``customer_booking_aggregates`` is kept current by triggers (utils/schema.py)
+as bookings and refunds are written, so scoring a customer is one primary-key
+read instead of a pass over their history. ``aggregate_history`` is the same
+computation in Python over a loaded history; ``check_aggregates`` compares the
+two and ``rebuild_aggregates`` recreates the table from scratch.
+"""
+
+import sqlite3
+
+from engine.config import RECENCY_DECAY_DAYS, RECENCY_FULL_WEIGHT_DAYS
+from engine.timestamps import days_ago, row_epoch
+from utils.db import chunked, query, query_one
+from utils.schema import CUSTOMER_AGGREGATE_COLUMNS, TRIGGERS, apply_schema
+
+_TABLE = "customer_booking_aggregates"
+
+
+def empty_aggregates() -> dict:
+    """Aggregates of a customer with no bookings."""
+    return {**{col: 0 for col in CUSTOMER_AGGREGATE_COLUMNS}, "data_version": 0}
+
+
+def _bucket_days(epoch):
+    # A missing timestamp and one from today both fall into the oldest bucket;
+    # the original list comprehensions used ``days or 999``.
+    return days_ago(epoch) or 999
+
+
+def aggregate_history(bookings: list) -> dict:
+    """Reduce a customer's booking history to the counts and sums the signals read."""
+    agg = empty_aggregates()
+    agg["total_bookings"] = len(bookings)
+    for b in bookings:
+        booked = row_epoch(b, "booking_date")
+        days = _bucket_days(booked)
+        if days <= RECENCY_FULL_WEIGHT_DAYS:
+            agg["bookings_recent"] += 1
+        elif days <= RECENCY_DECAY_DAYS:
+            agg["bookings_mid"] += 1
+        else:
+            agg["bookings_old"] += 1
+
+        if b["confirmation_opened"] is not None:
+            agg["email_known"] += 1
+            if b["confirmation_opened"]:
+                agg["email_opened"] += 1
+
+        if b["refund_requested_at"] is None:
+            continue
+        agg["total_refunds"] += 1
+        requested = row_epoch(b, "refund_requested_at")
+        days = _bucket_days(requested)
+        if days <= RECENCY_FULL_WEIGHT_DAYS:
+            agg["refunds_recent"] += 1
+        elif days <= RECENCY_DECAY_DAYS:
+            agg["refunds_mid"] += 1
+        else:
+            agg["refunds_old"] += 1
+
+        if requested is not None and booked is not None:
+            if requested > booked:
+                agg["post_experience"] += 1
+            else:
+                agg["pre_experience"] += 1
+
+        if b["experience_value_percentile"] is not None:
+            agg["percentile_sum"] += b["experience_value_percentile"]
+            agg["percentile_count"] += 1
+
+        if b.get("refund_reason") == "no_show":
+            agg["no_show_claims"] += 1
+            if b.get("qr_checkin_confirmed"):
+                agg["no_show_contradicted"] += 1
+    return agg
+
+
+def _from_row(row: sqlite3.Row) -> dict:
+    agg = dict(row)
+    agg.pop("customer_id", None)
+    return agg
+
+
+def get_aggregates(customer_id: str, conn: sqlite3.Connection | None = None) -> dict:
+    row = query_one(f"SELECT * FROM {_TABLE} WHERE customer_id = ?", (customer_id,), conn=conn)
+    return _from_row(row) if row else empty_aggregates()
+
+
+def load_aggregates(customer_ids: list[str], conn: sqlite3.Connection | None = None) -> dict[str, dict]:
+    """Aggregates for many customers; customers without bookings get empty aggregates."""
+    found: dict[str, dict] = {}
+    for chunk in chunked(list(dict.fromkeys(customer_ids))):
+        for row in query(
+            f"SELECT * FROM {_TABLE} WHERE customer_id IN ({', '.join('?' for _ in chunk)})",
+            tuple(chunk),
+            conn=conn,
+        ):
+            found[row["customer_id"]] = _from_row(row)
+    return {cid: found.get(cid) or empty_aggregates() for cid in customer_ids}
+
+
+def _matches(field: str, stored, expected) -> bool:
+    if field == "data_version":
+        # a write counter, not derivable from history
+        return True
+    if field == "percentile_sum":
+        # summed in a different order when percentiles are fractional
+        return abs(stored - expected) <= 1e-9 * max(1.0, abs(expected))
+    return stored == expected
+
+
+def check_aggregates(conn: sqlite3.Connection, customer_ids: list[str] | None = None) -> list[dict]:
+    """
+    Compare stored aggregates with a full recomputation from booking history.
+
+    Returns one entry per mismatching field: customer_id, field, stored, expected.
+    """
+    if customer_ids is None:
+        customer_ids = [r["customer_id"] for r in query(
+            f"SELECT customer_id FROM booking_refund_records UNION SELECT customer_id FROM {_TABLE}",
+            conn=conn,
+        )]
+    stored = load_aggregates(customer_ids, conn=conn)
+    mismatches = []
+    for customer_id in customer_ids:
+        history = [dict(r) for r in query(
+            "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date",
+            (customer_id,),
+            conn=conn,
+        )]
+        expected = aggregate_history(history)
+        for field, value in expected.items():
+            have = stored[customer_id][field]
+            if not _matches(field, have, value):
+                mismatches.append({"customer_id": customer_id, "field": field, "stored": have, "expected": value})
+    return mismatches
+
+
+def rebuild_aggregates(conn: sqlite3.Connection) -> int:
+    """Drop and recreate the aggregate table and its triggers, then backfill. Caller commits.
+
+    Needed after changing NOW or the recency thresholds, which are baked into
+    the trigger bodies. Data and notes versions restart at 0, so every profile
+    and stored note signal is marked stale. Returns the number of customers
+    written.
+    """
+    for name, _ in TRIGGERS:
+        if name.startswith(("trg_customer_aggregates_", "trg_customer_data_version_")):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(f"DROP TABLE IF EXISTS {_TABLE}")
+    apply_schema(conn)
+    conn.execute("UPDATE customer_profiles SET profile_version = NULL")
+    conn.execute("UPDATE customer_note_signals SET notes_version = NULL")
+    return conn.execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
@@ -0,0 +1,69 @@
+"""Read-through cache of engine results (Layers 0-3 and the classifier) per booking.
+
+An entry is keyed by everything the result depends on: the database, the
+booking and the reason being assessed, the customer's ``data_version``, the
+Layer 0 refund volume for the booking's experience and day, and a hash of the
+engine configuration. Triggers (utils/schema.py) bump data_version on every
+insert and delete of the customer's bookings, and on every update that
+changes a column other than ``DATA_VERSION_IGNORED_COLUMNS`` (the agent
+notes, which no layer reads). Policy, value and confirmation columns are
+included, so a booking write changes the key rather than serving a stale
+result. Profile updates (``update_profile``, which /resolve
+and L2 resolution call) drop the customer's entries explicitly, since the
+profile feeds Layers 1 and 2 without changing data_version. The TTL bounds
+how long anything neither covers (a hand-edited profile row) can be served.
+
+The cache is per process; cached result dicts are shared and must not be mutated.
+"""
+
+import os
+import sqlite3
+
+from engine import config
+from utils.cache import TTLCache
+from utils.db import DB_PATH
+
+ASSESSMENT_CACHE_SIZE = int(os.environ.get("RAD_ASSESSMENT_CACHE_SIZE", "4096"))
+ASSESSMENT_CACHE_TTL_SECONDS = float(os.environ.get("RAD_ASSESSMENT_CACHE_TTL", "300"))
+
+ASSESSMENT_CACHE = TTLCache(ASSESSMENT_CACHE_SIZE, ASSESSMENT_CACHE_TTL_SECONDS)
+
+
+def config_hash() -> int:
+    """Hash of the engine thresholds and weights, so changing them misses the cache."""
+    return hash(tuple(sorted(
+        (name, value) for name, value in vars(config).items() if name.isupper()
+    )))
+
+
+def _db_path(conn: sqlite3.Connection | None) -> str:
+    return getattr(conn, "db_path", None) or DB_PATH
+
+
+def assessment_key(conn: sqlite3.Connection | None, booking: dict, aggregates: dict, volume: dict) -> tuple:
+    return (
+        _db_path(conn),
+        booking["booking_id"],
+        booking["refund_reason"],
+        aggregates["data_version"],
+        volume["refund_count"],
+        tuple(volume["affected_booking_ids"]),
+        config_hash(),
+    )
+
+
+def get_assessment(key: tuple) -> dict | None:
+    return ASSESSMENT_CACHE.get(key)
+
+
+def store_assessment(key: tuple, customer_id: str, layers: dict) -> None:
+    ASSESSMENT_CACHE.set(key, layers, tag=(key[0], customer_id))
+
+
+def invalidate_customer(customer_id: str, conn: sqlite3.Connection | None = None) -> int:
+    """Drop the customer's cached assessments; returns how many were dropped."""
+    return ASSESSMENT_CACHE.invalidate_tag((_db_path(conn), customer_id))
+
+
+def cache_stats() -> dict:
+    return ASSESSMENT_CACHE.stats()
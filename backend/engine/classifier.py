@@ -1,8 +1,10 @@
 """Final classification: combines all layer results into a decision + resolution options."""
 
 from engine.config import LOW_RISK_CEILING, HIGH_RISK_FLOOR
+from utils.perf import timed
 
 
+@timed("classify")
 def classify(layer0_result: dict, layer1_result: dict,
              layer2_result: dict | None = None,
              layer3_result: dict | None = None) -> dict:
@@ -0,0 +1,231 @@
+"""Assessment context: the booking, profile and history aggregates loaded once per case.
+
+Every layer used to fetch its own copy of the same rows. Loading them together
+keeps one assessment at a fixed number of primary-key reads regardless of how
+long the customer's history is; the full history is only read when a caller
+displays it.
+"""
+
+import sqlite3
+from dataclasses import dataclass
+
+from engine.aggregates import get_aggregates, load_aggregates
+from engine.assessment_cache import assessment_key, get_assessment, store_assessment
+from engine.classifier import classify
+from engine.layer0_anomaly import anomaly_key, check_anomaly, load_refund_volumes
+from engine.layer1_policy_gate import evaluate_policy
+from engine.layer2_risk_profile import compute_risk_score
+from engine.layer2_vectorized import compute_risk_scores_from_aggregates
+from engine.layer3_request_eval import evaluate_request
+from engine.profile_manager import is_profile_stale, update_profile
+from utils.db import chunked, query, query_one
+
+
+class OrderNotFound(LookupError):
+    pass
+
+
+class OrderCustomerMismatch(ValueError):
+    pass
+
+
+class CustomerNotFound(LookupError):
+    pass
+
+
+@dataclass
+class AssessmentContext:
+    customer_id: str
+    booking: dict
+    profile: dict
+    aggregates: dict  # engine.aggregates counts for the customer's history
+    history: list[dict] | None = None  # all of the customer's bookings, oldest first, if loaded
+
+
+def load_context(conn: sqlite3.Connection, customer_id: str, booking_id: str,
+                 refund_reason: str | None = None, with_history: bool = False) -> AssessmentContext:
+    """
+    Load the booking, the customer's profile and history aggregates.
+
+    ``with_history`` also loads the full booking history (for display).
+    Raises OrderNotFound, OrderCustomerMismatch or CustomerNotFound (checked in that order).
+    """
+    booking_row = query_one(
+        "SELECT * FROM booking_refund_records WHERE booking_id = ?",
+        (booking_id,),
+        conn=conn,
+    )
+    if booking_row is None:
+        raise OrderNotFound(booking_id)
+    if booking_row["customer_id"] != customer_id:
+        raise OrderCustomerMismatch(booking_id)
+    profile_row = query_one(
+        "SELECT * FROM customer_profiles WHERE customer_id = ?",
+        (customer_id,),
+        conn=conn,
+    )
+    if profile_row is None:
+        raise CustomerNotFound(customer_id)
+
+    # Read even when the history is loaded: its data_version keys the assessment cache.
+    aggregates = get_aggregates(customer_id, conn=conn)
+    history = None
+    if with_history:
+        history = [
+            dict(row) for row in query(
+                "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date",
+                (customer_id,),
+                conn=conn,
+            )
+        ]
+
+    # The current request may carry a different reason than the stored booking;
+    # keep history and aggregates untouched so Layer 2 sees what was actually recorded.
+    booking = dict(booking_row)
+    if refund_reason is not None:
+        booking["refund_reason"] = refund_reason
+
+    return AssessmentContext(
+        customer_id=customer_id,
+        booking=booking,
+        profile=dict(profile_row),
+        aggregates=aggregates,
+        history=history,
+    )
+
+
+def load_contexts(conn: sqlite3.Connection,
+                  items: list[tuple[str, str, str | None]]) -> list[AssessmentContext | Exception]:
+    """
+    Batch form of load_context for (customer_id, booking_id, refund_reason) items.
+
+    Uses one multi-row fetch per table. Contexts for the same customer share
+    the profile and aggregates dicts. Items that cannot be loaded get the
+    exception load_context would have raised, in the same position.
+    """
+    bookings: dict[str, dict] = {}
+    for chunk in chunked(list(dict.fromkeys(booking_id for _, booking_id, _ in items))):
+        for r in query(
+            f"SELECT * FROM booking_refund_records WHERE booking_id IN ({', '.join('?' for _ in chunk)})",
+            tuple(chunk),
+            conn=conn,
+        ):
+            bookings[r["booking_id"]] = dict(r)
+
+    customer_ids = list(dict.fromkeys(
+        customer_id for customer_id, booking_id, _ in items
+        if booking_id in bookings and bookings[booking_id]["customer_id"] == customer_id
+    ))
+    profiles: dict[str, dict] = {}
+    for chunk in chunked(customer_ids):
+        for r in query(
+            f"SELECT * FROM customer_profiles WHERE customer_id IN ({', '.join('?' for _ in chunk)})",
+            tuple(chunk),
+            conn=conn,
+        ):
+            profiles[r["customer_id"]] = dict(r)
+    aggregates = load_aggregates(list(profiles), conn=conn)
+
+    contexts: list[AssessmentContext | Exception] = []
+    for customer_id, booking_id, refund_reason in items:
+        booking = bookings.get(booking_id)
+        if booking is None:
+            contexts.append(OrderNotFound(booking_id))
+        elif booking["customer_id"] != customer_id:
+            contexts.append(OrderCustomerMismatch(booking_id))
+        elif customer_id not in profiles:
+            contexts.append(CustomerNotFound(customer_id))
+        else:
+            booking = dict(booking)
+            if refund_reason is not None:
+                booking["refund_reason"] = refund_reason
+            contexts.append(AssessmentContext(
+                customer_id=customer_id,
+                booking=booking,
+                profile=profiles[customer_id],
+                aggregates=aggregates[customer_id],
+            ))
+    return contexts
+
+
+def refresh_profile_if_stale(ctx: AssessmentContext, conn: sqlite3.Connection) -> None:
+    """Recompute the stored profile from the already-loaded aggregates when it is stale."""
+    if not is_profile_stale(ctx.profile, conn=conn, aggregates=ctx.aggregates):
+        return
+    ctx.profile.update(update_profile(
+        ctx.customer_id,
+        risk_score=ctx.profile.get("risk_score"),
+        disposition=ctx.profile.get("disposition"),
+        conn=conn,
+        aggregates=ctx.aggregates,
+    ))
+
+
+def run_layers(ctx: AssessmentContext, conn: sqlite3.Connection,
+               volume: dict | None = None, risk_scores: dict | None = None) -> dict:
+    """
+    Run Layers 0-3 and the classifier over a loaded context.
+
+    ``volume`` is a precomputed Layer 0 refund volume; ``risk_scores`` is a
+    per-customer cache of Layer 2 results shared across a batch. Results are
+    served from engine.assessment_cache when nothing they depend on has
+    changed; the returned dict may be shared and must not be mutated.
+
+    Returns dict with: layer0, layer1, layer2, layer3, final
+    """
+    if volume is None:
+        key = anomaly_key(ctx.booking)
+        volume = load_refund_volumes([key], conn=conn)[key]
+    cache_key = assessment_key(conn, ctx.booking, ctx.aggregates, volume)
+    cached = get_assessment(cache_key)
+    if cached is not None:
+        return cached
+
+    layer0 = check_anomaly(ctx.booking, conn=conn, volume=volume)
+    layer1 = evaluate_policy(ctx.booking, layer0["enrichment"], ctx.profile)
+
+    layer2 = None
+    layer3 = None
+    if not layer0["is_anomaly"] and layer1["outcome"] not in ("auto_approve", "auto_flag_l2"):
+        if risk_scores is not None and ctx.customer_id in risk_scores:
+            layer2 = risk_scores[ctx.customer_id]
+        else:
+            layer2 = compute_risk_score(ctx.customer_id, ctx.profile, aggregates=ctx.aggregates)
+            if risk_scores is not None:
+                risk_scores[ctx.customer_id] = layer2
+        layer3 = evaluate_request(ctx.booking, layer0["enrichment"], layer2.get("risk_score"))
+
+    layers = {
+        "layer0": layer0,
+        "layer1": layer1,
+        "layer2": layer2,
+        "layer3": layer3,
+        "final": classify(layer0, layer1, layer2, layer3),
+    }
+    store_assessment(cache_key, ctx.customer_id, layers)
+    return layers
+
+
+def run_layers_batch(contexts: list[AssessmentContext], conn: sqlite3.Connection) -> list[dict]:
+    """
+    Run the engine over many contexts as a set.
+
+    Refund volumes are fetched once for all experience/day pairs and Layer 2
+    is scored for every customer in one vectorized pass. Stale profiles are
+    refreshed once per customer.
+    """
+    customers: dict[str, AssessmentContext] = {}
+    for ctx in contexts:
+        if ctx.customer_id not in customers:
+            refresh_profile_if_stale(ctx, conn)
+            customers[ctx.customer_id] = ctx
+
+    volumes = load_refund_volumes((anomaly_key(ctx.booking) for ctx in contexts), conn=conn)
+    risk_scores = dict(zip(customers, compute_risk_scores_from_aggregates(
+        [ctx.profile for ctx in customers.values()],
+        [ctx.aggregates for ctx in customers.values()],
+    )))
+    return [
+        run_layers(ctx, conn, volume=volumes[anomaly_key(ctx.booking)], risk_scores=risk_scores)
+        for ctx in contexts
+    ]
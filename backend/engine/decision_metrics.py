@@ -0,0 +1,168 @@
+"""Decision-log metrics over time, read from ``decision_metrics_rollup``.
+
+Triggers on decision_log (utils/schema.py) add every decision to a minute
+bucket keyed by classification, escalation and override, with its risk score
+sum and count. ``compact_rollups`` folds minute buckets older than
+``METRICS_MINUTE_RETENTION_HOURS`` into hours, and hour buckets older than
+``METRICS_HOUR_RETENTION_DAYS`` into days, so a year of history is a few
+thousand rows per key. The API runs it every ``METRICS_COMPACT_INTERVAL_SECONDS``.
+
+``timeseries`` reads only the rollups. Buckets are selected by their start
+time and regrouped to the requested granularity. A range older than a tier's
+retention is only available at that tier's resolution, which each bucket
+reports as ``resolution``.
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from utils.db import query, write_transaction
+from utils.schema import ROLLUP_GRANULARITIES, ROLLUP_KEY
+
+METRICS_MINUTE_RETENTION_HOURS = float(os.environ.get("RAD_METRICS_MINUTE_RETENTION_HOURS", "48"))
+METRICS_HOUR_RETENTION_DAYS = float(os.environ.get("RAD_METRICS_HOUR_RETENTION_DAYS", "90"))
+METRICS_COMPACT_INTERVAL_SECONDS = float(os.environ.get("RAD_METRICS_COMPACT_INTERVAL", "300"))
+
+# Granularities /api/metrics/timeseries accepts, finest first: the SQL that
+# maps a stored bucket_start to the start of its bucket, and the default span.
+GRANULARITIES = {
+    "minute": ("strftime('%Y-%m-%d %H:%M:00', bucket_start)", timedelta(hours=2)),
+    "hour": ("strftime('%Y-%m-%d %H:00:00', bucket_start)", timedelta(days=2)),
+    "day": ("date(bucket_start) || ' 00:00:00'", timedelta(days=30)),
+    "week": ("date(bucket_start, '-6 days', 'weekday 1') || ' 00:00:00'", timedelta(weeks=26)),
+}
+_RANK = {name: rank for rank, name in enumerate(GRANULARITIES)}
+
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Tier to fold into, and the bucket start expression in that tier.
+_COMPACTION = {
+    "minute": ("hour", "strftime('%Y-%m-%d %H:00:00', bucket_start)"),
+    "hour": ("day", "date(bucket_start) || ' 00:00:00'"),
+}
+
+
+def utcnow() -> datetime:
+    """Naive UTC, like decision_log timestamps (SQLite CURRENT_TIMESTAMP)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _fold(conn: sqlite3.Connection, source: str, before: str) -> int:
+    target, bucket = _COMPACTION[source]
+    conn.execute(
+        f"""
+        INSERT INTO decision_metrics_rollup ({ROLLUP_KEY}, decisions, risk_score_sum, risk_score_count)
+        SELECT '{target}', {bucket}, classification, escalated, overridden,
+               SUM(decisions), SUM(risk_score_sum), SUM(risk_score_count)
+        FROM decision_metrics_rollup
+        WHERE granularity = ? AND bucket_start < ?
+        GROUP BY 2, 3, 4, 5
+        ON CONFLICT ({ROLLUP_KEY}) DO UPDATE SET
+            decisions = decisions + excluded.decisions,
+            risk_score_sum = risk_score_sum + excluded.risk_score_sum,
+            risk_score_count = risk_score_count + excluded.risk_score_count
+        """,
+        (source, before),
+    )
+    return conn.execute(
+        "DELETE FROM decision_metrics_rollup WHERE granularity = ? AND bucket_start < ?", (source, before)
+    ).rowcount
+
+
+def compact_rollups(now: datetime | None = None, db_path: str | None = None,
+                    conn: sqlite3.Connection | None = None) -> dict:
+    """Fold expired minute buckets into hours and hour buckets into days, in one transaction.
+
+    Cutoffs are aligned to the coarser tier, so only whole hours (days) are
+    folded. Buckets that netted out to nothing (a decision moved or deleted)
+    are dropped. Returns the number of rows folded per source tier.
+    """
+    now = now or utcnow()
+    minute_cutoff = (now - timedelta(hours=METRICS_MINUTE_RETENTION_HOURS)).strftime("%Y-%m-%d %H:00:00")
+    hour_cutoff = (now - timedelta(days=METRICS_HOUR_RETENTION_DAYS)).strftime("%Y-%m-%d 00:00:00")
+
+    def compact(c: sqlite3.Connection) -> dict:
+        folded = {"minute": _fold(c, "minute", minute_cutoff), "hour": _fold(c, "hour", hour_cutoff)}
+        c.execute(
+            "DELETE FROM decision_metrics_rollup "
+            "WHERE decisions = 0 AND risk_score_count = 0 AND risk_score_sum = 0"
+        )
+        return folded
+
+    return write_transaction(compact, db_path=db_path, conn=conn)
+
+
+def _bucket(start: str, resolution: str) -> dict:
+    return {
+        "bucket_start": start,
+        "resolution": resolution,
+        "total_processed": 0,
+        "auto_approved": 0,
+        "agent_reviewed": 0,
+        "escalated": 0,
+        "overrides": 0,
+        "vendor_anomalies": 0,
+        "avg_risk_score": None,
+        "by_classification": {},
+        "_risk_score_sum": 0,
+        "_risk_score_count": 0,
+    }
+
+
+def timeseries(start: datetime, end: datetime, granularity: str,
+               conn: sqlite3.Connection | None = None) -> list[dict]:
+    """
+    Decision counts per bucket for buckets starting in [start, end), oldest first.
+
+    Each bucket carries the /api/metrics counts (total_processed,
+    auto_approved, agent_reviewed, escalated, overrides, vendor_anomalies,
+    avg_risk_score) plus a per-classification breakdown. Buckets without
+    decisions are omitted.
+    """
+    bucket_sql, _ = GRANULARITIES[granularity]
+    rows = query(
+        f"""
+        SELECT {bucket_sql} AS bucket, classification, escalated, overridden,
+               MAX(CASE granularity {" ".join(f"WHEN '{g}' THEN {_RANK[g]}" for g in ROLLUP_GRANULARITIES)} END)
+                   AS tier,
+               SUM(decisions) AS decisions, SUM(risk_score_sum) AS risk_score_sum,
+               SUM(risk_score_count) AS risk_score_count
+        FROM decision_metrics_rollup
+        WHERE granularity IN ({", ".join(f"'{g}'" for g in ROLLUP_GRANULARITIES)})
+          AND bucket_start >= ? AND bucket_start < ?
+        GROUP BY bucket, classification, escalated, overridden
+        ORDER BY bucket
+        """,
+        (start.strftime(_TIMESTAMP_FORMAT), end.strftime(_TIMESTAMP_FORMAT)),
+        conn=conn,
+    )
+    names = list(GRANULARITIES)
+    buckets: dict[str, dict] = {}
+    for r in rows:
+        resolution = names[max(_RANK[granularity], r["tier"])]
+        b = buckets.setdefault(r["bucket"], _bucket(r["bucket"], resolution))
+        if _RANK[resolution] > _RANK[b["resolution"]]:
+            b["resolution"] = resolution
+        decisions = r["decisions"]
+        classification = r["classification"]
+        b["total_processed"] += decisions
+        b["auto_approved"] += decisions if classification == "auto_approved" else 0
+        b["agent_reviewed"] += decisions if classification in ("low_risk", "medium_risk") else 0
+        b["vendor_anomalies"] += decisions if classification == "vendor_anomaly" else 0
+        b["escalated"] += decisions if r["escalated"] else 0
+        b["overrides"] += decisions if r["overridden"] else 0
+        if classification:
+            b["by_classification"][classification] = b["by_classification"].get(classification, 0) + decisions
+        b["_risk_score_sum"] += r["risk_score_sum"]
+        b["_risk_score_count"] += r["risk_score_count"]
+
+    series = []
+    for b in buckets.values():
+        risk_sum, risk_count = b.pop("_risk_score_sum"), b.pop("_risk_score_count")
+        if not b["total_processed"]:
+            continue
+        b["avg_risk_score"] = round(risk_sum / risk_count, 2) if risk_count else None
+        b["by_classification"] = {k: v for k, v in sorted(b["by_classification"].items()) if v}
+        series.append(b)
+    return series
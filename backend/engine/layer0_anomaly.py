@@ -1,6 +1,9 @@
 """Layer 0: Experience-level anomaly detection and request enrichment."""
 
-from utils.db import query
+import sqlite3
+
+from utils.db import IN_CLAUSE_CHUNK, chunked, query
+from utils.perf import timed
 from engine.config import ANOMALY_MIN_COUNT
 
 SUPPLIER_INVENTORY_MAP = {
@@ -10,28 +13,76 @@ SUPPLIER_INVENTORY_MAP = {
 }
 
 
-def check_anomaly(booking: dict) -> dict:
+def anomaly_key(booking: dict) -> tuple[str, str]:
+    """(experience_id, calendar day) that refund volume is counted under."""
+    return booking["experience_id"], booking.get("booking_day") or str(booking["booking_date"])[:10]
+
+
+def load_refund_volumes(keys, conn: sqlite3.Connection | None = None) -> dict[tuple[str, str], dict]:
+    """
+    Refund volume for many experience/day pairs in two indexed multi-row reads.
+
+    Returns {key: {"refund_count": int, "affected_booking_ids": list[str]}}; booking IDs
+    are only fetched for pairs at or above ANOMALY_MIN_COUNT.
+    """
+    keys = list(dict.fromkeys(keys))
+    volumes = {key: {"refund_count": 0, "affected_booking_ids": []} for key in keys}
+
+    # Refund requests per experience/day, maintained by trigger
+    for chunk in chunked(keys, IN_CLAUSE_CHUNK // 2):
+        values = ", ".join("(?, ?)" for _ in chunk)
+        rows = query(
+            f"""
+            WITH k(experience_id, booking_day) AS (VALUES {values})
+            SELECT c.experience_id, c.booking_day, c.refund_count
+            FROM k JOIN experience_day_refund_counts c
+              ON c.experience_id = k.experience_id AND c.booking_day = k.booking_day
+            """,
+            tuple(v for key in chunk for v in key),
+            conn=conn,
+        )
+        for r in rows:
+            volumes[(r["experience_id"], r["booking_day"])]["refund_count"] = r["refund_count"]
+
+    anomalous = [key for key, v in volumes.items() if v["refund_count"] >= ANOMALY_MIN_COUNT]
+    for chunk in chunked(anomalous, IN_CLAUSE_CHUNK // 2):
+        values = ", ".join("(?, ?)" for _ in chunk)
+        rows = query(
+            f"""
+            WITH k(experience_id, booking_day) AS (VALUES {values})
+            SELECT b.experience_id, b.booking_day, b.booking_id
+            FROM k JOIN booking_refund_records b
+              ON b.experience_id = k.experience_id AND b.booking_day = k.booking_day
+            WHERE b.refund_requested_at IS NOT NULL
+            """,
+            tuple(v for key in chunk for v in key),
+            conn=conn,
+        )
+        for r in rows:
+            volumes[(r["experience_id"], r["booking_day"])]["affected_booking_ids"].append(r["booking_id"])
+
+    return volumes
+
+
+@timed("layer0.check_anomaly")
+def check_anomaly(booking: dict, conn: sqlite3.Connection | None = None,
+                  volume: dict | None = None) -> dict:
     """
     Check if the experience+date has abnormal refund volume
     and enrich the request with supplier context.
 
+    ``volume`` is this booking's entry from load_refund_volumes, when the caller
+    has already fetched it (batch assessment).
+
     Returns dict with: is_anomaly, anomaly_details, enrichment
     """
     experience_id = booking["experience_id"]
     booking_date = booking["booking_date"]
 
-    # Count refund requests for same experience on same date
-    rows = query(
-        """
-        SELECT booking_id, customer_id, refund_requested_at
-        FROM booking_refund_records
-        WHERE experience_id = ?
-          AND DATE(booking_date) = DATE(?)
-          AND refund_requested_at IS NOT NULL
-        """,
-        (experience_id, booking_date),
-    )
-    refund_count = len(rows)
+    if volume is None:
+        key = anomaly_key(booking)
+        volume = load_refund_volumes([key], conn=conn)[key]
+    refund_count = volume["refund_count"]
 
     is_anomaly = refund_count >= ANOMALY_MIN_COUNT
     anomaly_details = None
@@ -43,7 +94,7 @@ def check_anomaly(booking: dict) -> dict:
             "refund_count_for_date": refund_count,
             "expected_count": 1,
             "supplier_type": booking["supplier_type"],
-            "affected_booking_ids": [r["booking_id"] for r in rows],
+            "affected_booking_ids": list(volume["affected_booking_ids"]),
         }
 
     supplier_type = booking["supplier_type"] or "direct_contract"
@@ -1,6 +1,9 @@
 """Layer 1: Deterministic policy gate — auto-approve, hard-flag, or pass to scoring."""
 
+from utils.perf import timed
 
+
+@timed("layer1.evaluate_policy")
 def evaluate_policy(booking: dict, enrichment: dict, customer_profile: dict) -> dict:
     """
     Determine if existing refund policy dictates the outcome.
@@ -1,58 +1,43 @@
 """Layer 2: Customer risk profile assessment — 6-signal scoring with recency decay."""
 
-from datetime import datetime, timedelta
-from utils.db import query
+import sqlite3
 from engine.config import (
     WEIGHT_REFUND_FREQUENCY, WEIGHT_NO_SHOW_HISTORY, WEIGHT_EMAIL_ENGAGEMENT,
     WEIGHT_REFUND_TIMING, WEIGHT_EXPERIENCE_VALUE, WEIGHT_TENURE,
     REFUND_RATE_HIGH_RISK, REFUND_RATE_LOW_RISK,
-    RECENCY_FULL_WEIGHT_DAYS, RECENCY_DECAY_DAYS, RECENCY_MIN_WEIGHT,
+    RECENCY_MIN_WEIGHT,
 )
+from engine.aggregates import aggregate_history, get_aggregates
+from engine.timestamps import days_ago, row_epoch
+from utils.perf import timed
 
-NOW = datetime(2026, 2, 26, 12, 0, 0)
 
-
-def _parse_ts(ts_str):
-    if not ts_str:
-        return None
-    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(ts_str, fmt)
-        except ValueError:
-            continue
-    return None
-
-
-def _days_ago(ts_str):
-    dt = _parse_ts(ts_str)
-    if not dt:
-        return None
-    return (NOW - dt).days
-
-
-def _recency_weight(days):
-    if days is None:
-        return RECENCY_MIN_WEIGHT
-    if days <= RECENCY_FULL_WEIGHT_DAYS:
-        return 1.0
-    if days <= RECENCY_DECAY_DAYS:
-        return 0.6
-    return RECENCY_MIN_WEIGHT
-
-
-def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
+@timed("layer2.compute_risk_score")
+def compute_risk_score(customer_id: str, customer_profile: dict,
+                       conn: sqlite3.Connection | None = None,
+                       bookings: list | None = None,
+                       aggregates: dict | None = None) -> dict:
     """
     Compute a risk score from 0-100 based on 6 signals.
 
     Returns dict with: risk_score, signal_breakdown, lifetime_baseline, recency_summary,
     insufficient_data (bool)
+
+    Scores from the customer's stored aggregates unless ``aggregates`` or
+    ``bookings`` (an already-loaded history) is passed.
     """
-    bookings = query(
-        "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date",
-        (customer_id,),
-    )
+    if aggregates is None:
+        if bookings is not None:
+            aggregates = aggregate_history(bookings)
+        else:
+            aggregates = get_aggregates(customer_id, conn=conn)
+
+    return score_aggregates(aggregates, customer_profile)
+
 
-    if not bookings or len(bookings) == 0:
+def insufficient_result(agg: dict) -> dict | None:
+    """The early-exit result for an empty or single-booking history, else None."""
+    if agg["total_bookings"] == 0:
         return {
             "risk_score": None,
             "signal_breakdown": [],
@@ -60,56 +45,72 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
             "recency_summary": {},
             "insufficient_data": True,
         }
-
-    total_bookings = len(bookings)
-    refund_bookings = [b for b in bookings if b["refund_requested_at"] is not None]
-    total_refunds = len(refund_bookings)
-
-    if total_bookings <= 1 and total_refunds == 0:
+    if agg["total_bookings"] <= 1 and agg["total_refunds"] == 0:
         return {
             "risk_score": None,
             "signal_breakdown": [],
             "lifetime_baseline": {
-                "total_bookings": total_bookings,
+                "total_bookings": agg["total_bookings"],
                 "total_refunds": 0,
                 "refund_rate": 0.0,
             },
             "recency_summary": {},
             "insufficient_data": True,
         }
+    return None
 
-    # Lifetime baseline
-    refund_rate = total_refunds / total_bookings if total_bookings > 0 else 0
-
-    # Recency buckets
-    recent_90 = [b for b in refund_bookings if (_days_ago(b["refund_requested_at"]) or 999) <= RECENCY_FULL_WEIGHT_DAYS]
-    mid_period = [b for b in refund_bookings if RECENCY_FULL_WEIGHT_DAYS < (_days_ago(b["refund_requested_at"]) or 999) <= RECENCY_DECAY_DAYS]
-    old_period = [b for b in refund_bookings if (_days_ago(b["refund_requested_at"]) or 999) > RECENCY_DECAY_DAYS]
-
-    recency_summary = {
-        "last_90_days": len(recent_90),
-        "90_to_180_days": len(mid_period),
-        "over_180_days": len(old_period),
-    }
 
-    signals = []
+def derive_rates(agg: dict, customer_profile: dict) -> dict:
+    """Rates and profile values the signal thresholds compare against."""
+    total_bookings = agg["total_bookings"]
+    refund_rate = agg["total_refunds"] / total_bookings if total_bookings > 0 else 0
 
-    # --- Signal 1: Refund Frequency (max 30) ---
     weighted_refunds = (
-        len(recent_90) * 1.0
-        + len(mid_period) * 0.6
-        + len(old_period) * RECENCY_MIN_WEIGHT
+        agg["refunds_recent"] * 1.0
+        + agg["refunds_mid"] * 0.6
+        + agg["refunds_old"] * RECENCY_MIN_WEIGHT
     )
-    bookings_recent = [b for b in bookings if (_days_ago(b["booking_date"]) or 999) <= RECENCY_FULL_WEIGHT_DAYS]
-    bookings_mid = [b for b in bookings if RECENCY_FULL_WEIGHT_DAYS < (_days_ago(b["booking_date"]) or 999) <= RECENCY_DECAY_DAYS]
-    bookings_old = [b for b in bookings if (_days_ago(b["booking_date"]) or 999) > RECENCY_DECAY_DAYS]
     weighted_bookings = (
-        len(bookings_recent) * 1.0
-        + len(bookings_mid) * 0.6
-        + len(bookings_old) * RECENCY_MIN_WEIGHT
+        agg["bookings_recent"] * 1.0
+        + agg["bookings_mid"] * 0.6
+        + agg["bookings_old"] * RECENCY_MIN_WEIGHT
     )
     weighted_rate = weighted_refunds / weighted_bookings if weighted_bookings > 0 else refund_rate
 
+    if agg["email_known"]:
+        open_pct = agg["email_opened"] / agg["email_known"]
+    else:
+        open_pct = 0.5  # Neutral if no data
+
+    total_timed = agg["post_experience"] + agg["pre_experience"]
+    post_ratio = agg["post_experience"] / total_timed if total_timed > 0 else 0
+
+    if agg["percentile_count"]:
+        avg_percentile = agg["percentile_sum"] / agg["percentile_count"]
+    else:
+        avg_percentile = 50
+
+    account_days = days_ago(row_epoch(customer_profile, "account_created_at"))
+    if account_days is not None:
+        account_age_months = account_days / 30.44
+    else:
+        account_age_months = 12  # Default neutral
+
+    return {
+        "refund_rate": refund_rate,
+        "weighted_rate": weighted_rate,
+        "no_show_count": customer_profile.get("total_no_show_refund_claims", 0) or 0,
+        "contradicted": customer_profile.get("no_show_claims_contradicted", 0) or 0,
+        "open_pct": open_pct,
+        "post_ratio": post_ratio,
+        "avg_percentile": avg_percentile,
+        "account_age_months": account_age_months,
+    }
+
+
+def signal_scores(rates: dict) -> dict:
+    """Points for each of the six signals."""
+    weighted_rate = rates["weighted_rate"]
     if weighted_rate > REFUND_RATE_HIGH_RISK:
         freq_score = WEIGHT_REFUND_FREQUENCY
     elif weighted_rate > REFUND_RATE_LOW_RISK:
@@ -118,24 +119,7 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
     else:
         freq_score = 0
 
-    signals.append({
-        "name": "Refund Frequency",
-        "raw_value": f"{refund_rate:.1%} ({total_refunds}/{total_bookings})",
-        "weighted_rate": f"{weighted_rate:.1%}",
-        "weight": WEIGHT_REFUND_FREQUENCY,
-        "score": freq_score,
-        "explanation": (
-            f"Refund rate {refund_rate:.1%} overall, {weighted_rate:.1%} recency-weighted. "
-            + ("Exceeds 40% threshold." if weighted_rate > REFUND_RATE_HIGH_RISK
-               else "Below 10% — risk-reducing." if weighted_rate < REFUND_RATE_LOW_RISK
-               else "Moderate range.")
-        ),
-    })
-
-    # --- Signal 2: No-Show + Refund Claim History (max 25) ---
-    no_show_count = customer_profile.get("total_no_show_refund_claims", 0) or 0
-    contradicted = customer_profile.get("no_show_claims_contradicted", 0) or 0
-
+    no_show_count, contradicted = rates["no_show_count"], rates["contradicted"]
     if no_show_count == 0:
         noshow_score = 0
     elif no_show_count == 1 and contradicted == 0:
@@ -147,26 +131,7 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
     else:
         noshow_score = 15
 
-    signals.append({
-        "name": "No-Show + Refund Claims",
-        "raw_value": f"{no_show_count} claims, {contradicted} contradicted",
-        "weight": WEIGHT_NO_SHOW_HISTORY,
-        "score": noshow_score,
-        "explanation": (
-            f"{no_show_count} no-show refund claims"
-            + (f", {contradicted} contradicted by QR evidence" if contradicted else "")
-            + "."
-        ),
-    })
-
-    # --- Signal 3: Email Engagement (max 15) ---
-    bookings_with_email = [b for b in bookings if b["confirmation_opened"] is not None]
-    if bookings_with_email:
-        opened_count = sum(1 for b in bookings_with_email if b["confirmation_opened"])
-        open_pct = opened_count / len(bookings_with_email)
-    else:
-        open_pct = 0.5  # Neutral if no data
-
+    open_pct = rates["open_pct"]
     if open_pct == 0:
         email_score = WEIGHT_EMAIL_ENGAGEMENT
     elif open_pct < 0.5:
@@ -176,37 +141,7 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
     else:
         email_score = 0
 
-    signals.append({
-        "name": "Email Engagement",
-        "raw_value": f"{open_pct:.0%} confirmations opened",
-        "weight": WEIGHT_EMAIL_ENGAGEMENT,
-        "score": email_score,
-        "explanation": (
-            f"{open_pct:.0%} of confirmation emails opened. "
-            + ("Never engaged — suspicious." if open_pct == 0
-               else "High engagement — risk-reducing." if open_pct >= 0.8
-               else "Moderate engagement.")
-        ),
-    })
-
-    # --- Signal 4: Refund Timing (max 15) ---
-    post_experience = 0
-    pre_experience = 0
-    for b in refund_bookings:
-        req_dt = _parse_ts(b["refund_requested_at"])
-        book_dt = _parse_ts(b["booking_date"])
-        if req_dt and book_dt:
-            if req_dt > book_dt:
-                post_experience += 1
-            else:
-                pre_experience += 1
-
-    total_timed = post_experience + pre_experience
-    if total_timed > 0:
-        post_ratio = post_experience / total_timed
-    else:
-        post_ratio = 0
-
+    post_ratio = rates["post_ratio"]
     if post_ratio > 0.7:
         timing_score = WEIGHT_REFUND_TIMING
     elif post_ratio > 0.3:
@@ -214,27 +149,7 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
     else:
         timing_score = 0
 
-    signals.append({
-        "name": "Refund Timing",
-        "raw_value": f"{post_experience} post-exp, {pre_experience} pre-exp",
-        "weight": WEIGHT_REFUND_TIMING,
-        "score": timing_score,
-        "explanation": (
-            f"{post_ratio:.0%} of refunds are post-experience claims. "
-            + ("Primarily post-experience — suspicious." if post_ratio > 0.7
-               else "Primarily pre-experience — lower risk." if post_ratio <= 0.3
-               else "Mixed timing pattern.")
-        ),
-    })
-
-    # --- Signal 5: Experience Value (max 8) ---
-    refunded_percentiles = [
-        b["experience_value_percentile"]
-        for b in refund_bookings
-        if b["experience_value_percentile"] is not None
-    ]
-    avg_percentile = sum(refunded_percentiles) / len(refunded_percentiles) if refunded_percentiles else 50
-
+    avg_percentile = rates["avg_percentile"]
     if avg_percentile > 85:
         value_score = WEIGHT_EXPERIENCE_VALUE
     elif avg_percentile > 60:
@@ -242,26 +157,7 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
     else:
         value_score = 0
 
-    signals.append({
-        "name": "Experience Value",
-        "raw_value": f"Avg {avg_percentile:.0f}th percentile",
-        "weight": WEIGHT_EXPERIENCE_VALUE,
-        "score": value_score,
-        "explanation": (
-            f"Average refunded experience at {avg_percentile:.0f}th percentile. "
-            + ("High-value targeting." if avg_percentile > 85
-               else "Normal range." if avg_percentile <= 60
-               else "Moderate value range.")
-        ),
-    })
-
-    # --- Signal 6: Tenure (max 7, can be negative = reducer) ---
-    acct_created = _parse_ts(customer_profile.get("account_created_at", ""))
-    if acct_created:
-        account_age_months = (NOW - acct_created).days / 30.44
-    else:
-        account_age_months = 12  # Default neutral
-
+    account_age_months, refund_rate = rates["account_age_months"], rates["refund_rate"]
     if account_age_months < 6 and refund_rate > 0.30:
         tenure_score = WEIGHT_TENURE
     elif account_age_months > 24 and refund_rate < 0.15:
@@ -269,18 +165,104 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
     else:
         tenure_score = 0
 
-    signals.append({
-        "name": "Tenure",
-        "raw_value": f"{account_age_months:.0f} months, {total_bookings} bookings",
-        "weight": WEIGHT_TENURE,
-        "score": tenure_score,
-        "explanation": (
-            f"Account age {account_age_months:.0f} months. "
-            + ("New account with high refund rate — suspicious." if tenure_score > 0
-               else "Long tenure with low refund rate — risk reducer." if tenure_score < 0
-               else "Neutral tenure profile.")
-        ),
-    })
+    return {
+        "refund_frequency": freq_score,
+        "no_show": noshow_score,
+        "email_engagement": email_score,
+        "refund_timing": timing_score,
+        "experience_value": value_score,
+        "tenure": tenure_score,
+    }
+
+
+def build_result(agg: dict, rates: dict, scores: dict) -> dict:
+    """Assemble the Layer 2 result (signal breakdown, baseline, recency) from scored aggregates."""
+    total_bookings = agg["total_bookings"]
+    total_refunds = agg["total_refunds"]
+    refund_rate = rates["refund_rate"]
+    weighted_rate = rates["weighted_rate"]
+    no_show_count = rates["no_show_count"]
+    contradicted = rates["contradicted"]
+    open_pct = rates["open_pct"]
+    post_ratio = rates["post_ratio"]
+    avg_percentile = rates["avg_percentile"]
+    account_age_months = rates["account_age_months"]
+    tenure_score = scores["tenure"]
+
+    signals = [
+        {
+            "name": "Refund Frequency",
+            "raw_value": f"{refund_rate:.1%} ({total_refunds}/{total_bookings})",
+            "weighted_rate": f"{weighted_rate:.1%}",
+            "weight": WEIGHT_REFUND_FREQUENCY,
+            "score": scores["refund_frequency"],
+            "explanation": (
+                f"Refund rate {refund_rate:.1%} overall, {weighted_rate:.1%} recency-weighted. "
+                + ("Exceeds 40% threshold." if weighted_rate > REFUND_RATE_HIGH_RISK
+                   else "Below 10% — risk-reducing." if weighted_rate < REFUND_RATE_LOW_RISK
+                   else "Moderate range.")
+            ),
+        },
+        {
+            "name": "No-Show + Refund Claims",
+            "raw_value": f"{no_show_count} claims, {contradicted} contradicted",
+            "weight": WEIGHT_NO_SHOW_HISTORY,
+            "score": scores["no_show"],
+            "explanation": (
+                f"{no_show_count} no-show refund claims"
+                + (f", {contradicted} contradicted by QR evidence" if contradicted else "")
+                + "."
+            ),
+        },
+        {
+            "name": "Email Engagement",
+            "raw_value": f"{open_pct:.0%} confirmations opened",
+            "weight": WEIGHT_EMAIL_ENGAGEMENT,
+            "score": scores["email_engagement"],
+            "explanation": (
+                f"{open_pct:.0%} of confirmation emails opened. "
+                + ("Never engaged — suspicious." if open_pct == 0
+                   else "High engagement — risk-reducing." if open_pct >= 0.8
+                   else "Moderate engagement.")
+            ),
+        },
+        {
+            "name": "Refund Timing",
+            "raw_value": f"{agg['post_experience']} post-exp, {agg['pre_experience']} pre-exp",
+            "weight": WEIGHT_REFUND_TIMING,
+            "score": scores["refund_timing"],
+            "explanation": (
+                f"{post_ratio:.0%} of refunds are post-experience claims. "
+                + ("Primarily post-experience — suspicious." if post_ratio > 0.7
+                   else "Primarily pre-experience — lower risk." if post_ratio <= 0.3
+                   else "Mixed timing pattern.")
+            ),
+        },
+        {
+            "name": "Experience Value",
+            "raw_value": f"Avg {avg_percentile:.0f}th percentile",
+            "weight": WEIGHT_EXPERIENCE_VALUE,
+            "score": scores["experience_value"],
+            "explanation": (
+                f"Average refunded experience at {avg_percentile:.0f}th percentile. "
+                + ("High-value targeting." if avg_percentile > 85
+                   else "Normal range." if avg_percentile <= 60
+                   else "Moderate value range.")
+            ),
+        },
+        {
+            "name": "Tenure",
+            "raw_value": f"{account_age_months:.0f} months, {total_bookings} bookings",
+            "weight": WEIGHT_TENURE,
+            "score": tenure_score,
+            "explanation": (
+                f"Account age {account_age_months:.0f} months. "
+                + ("New account with high refund rate — suspicious." if tenure_score > 0
+                   else "Long tenure with low refund rate — risk reducer." if tenure_score < 0
+                   else "Neutral tenure profile.")
+            ),
+        },
+    ]
 
     # Final score
     raw_score = sum(s["score"] for s in signals)
@@ -296,6 +278,19 @@ def compute_risk_score(customer_id: str, customer_profile: dict) -> dict:
             "no_show_claims": no_show_count,
             "contradicted_claims": contradicted,
         },
-        "recency_summary": recency_summary,
+        "recency_summary": {
+            "last_90_days": agg["refunds_recent"],
+            "90_to_180_days": agg["refunds_mid"],
+            "over_180_days": agg["refunds_old"],
+        },
         "insufficient_data": False,
     }
+
+
+def score_aggregates(agg: dict, customer_profile: dict) -> dict:
+    """Layer 2 result for a customer whose history has already been aggregated."""
+    insufficient = insufficient_result(agg)
+    if insufficient is not None:
+        return insufficient
+    rates = derive_rates(agg, customer_profile)
+    return build_result(agg, rates, signal_scores(rates))
@@ -0,0 +1,229 @@
+"""Layer 2 risk scoring over many customers at once with NumPy arrays.
+
+Produces the same results as ``layer2_risk_profile.compute_risk_score``: the
+per-booking work (timestamp parsing, recency buckets, refund timing) becomes
+array operations over every booking in the batch, the six signal scores are
+computed column-wise, and only the final result dicts are built per customer
+through the shared ``build_result``.
+"""
+
+import numpy as np
+
+from engine.config import (
+    WEIGHT_REFUND_FREQUENCY, WEIGHT_NO_SHOW_HISTORY, WEIGHT_EMAIL_ENGAGEMENT,
+    WEIGHT_REFUND_TIMING, WEIGHT_EXPERIENCE_VALUE, WEIGHT_TENURE,
+    REFUND_RATE_HIGH_RISK, REFUND_RATE_LOW_RISK,
+    RECENCY_FULL_WEIGHT_DAYS, RECENCY_DECAY_DAYS, RECENCY_MIN_WEIGHT,
+)
+from engine.layer2_risk_profile import build_result, insufficient_result
+from engine.timestamps import NOW_EPOCH, SECONDS_PER_DAY, row_epoch
+from utils.perf import timed
+
+_MISSING = np.iinfo(np.int64).min
+
+_AGG_KEYS = (
+    "total_bookings", "total_refunds",
+    "refunds_recent", "refunds_mid", "refunds_old",
+    "bookings_recent", "bookings_mid", "bookings_old",
+    "email_known", "email_opened",
+    "post_experience", "pre_experience",
+    "percentile_sum", "percentile_count",
+)
+_SIGNAL_KEYS = (
+    "refund_frequency", "no_show", "email_engagement",
+    "refund_timing", "experience_value", "tenure",
+)
+
+
+def _epochs(rows: list[dict], column: str) -> np.ndarray:
+    epochs = (row_epoch(row, column) for row in rows)
+    return np.fromiter((_MISSING if e is None else e for e in epochs), dtype=np.int64, count=len(rows))
+
+
+def _bucket_days(epochs: np.ndarray) -> np.ndarray:
+    """Whole days before NOW; missing timestamps and day 0 map to 999 like ``days or 999``."""
+    missing = epochs == _MISSING
+    days = np.floor_divide(NOW_EPOCH - np.where(missing, NOW_EPOCH, epochs), SECONDS_PER_DAY)
+    return np.where(missing | (days == 0), 999, days)
+
+
+def _buckets(days: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    recent = days <= RECENCY_FULL_WEIGHT_DAYS
+    mid = ~recent & (days <= RECENCY_DECAY_DAYS)
+    return recent, mid, ~recent & ~mid
+
+
+def aggregate_histories(histories: list[list]) -> dict[str, np.ndarray]:
+    """Per-customer aggregates (same keys as ``aggregate_history``) for a list of histories."""
+    n = len(histories)
+    rows = [b for history in histories for b in history]
+    group = np.repeat(np.arange(n), [len(h) for h in histories])
+
+    def count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(group[mask], minlength=n)
+
+    booked = _epochs(rows, "booking_date")
+    requested = _epochs(rows, "refund_requested_at")
+    refunded = np.fromiter((b["refund_requested_at"] is not None for b in rows), dtype=bool, count=len(rows))
+
+    opened_raw = [b["confirmation_opened"] for b in rows]
+    email_known = np.fromiter((v is not None for v in opened_raw), dtype=bool, count=len(rows))
+    email_opened = np.fromiter((bool(v) for v in opened_raw), dtype=bool, count=len(rows))
+
+    percentile_raw = [b["experience_value_percentile"] for b in rows]
+    has_percentile = refunded & np.fromiter(
+        (v is not None for v in percentile_raw), dtype=bool, count=len(rows)
+    )
+    percentiles = np.array([v if v is not None else 0 for v in percentile_raw], dtype=np.float64)
+
+    b_recent, b_mid, b_old = _buckets(_bucket_days(booked))
+    r_recent, r_mid, r_old = _buckets(_bucket_days(requested))
+    timed = refunded & (requested != _MISSING) & (booked != _MISSING)
+    post = timed & (requested > booked)
+
+    return {
+        "total_bookings": np.bincount(group, minlength=n),
+        "total_refunds": count(refunded),
+        "refunds_recent": count(refunded & r_recent),
+        "refunds_mid": count(refunded & r_mid),
+        "refunds_old": count(refunded & r_old),
+        "bookings_recent": count(b_recent),
+        "bookings_mid": count(b_mid),
+        "bookings_old": count(b_old),
+        "email_known": count(email_known),
+        "email_opened": count(email_known & email_opened),
+        "post_experience": count(post),
+        "pre_experience": count(timed & ~post),
+        "percentile_sum": np.bincount(group[has_percentile], weights=percentiles[has_percentile], minlength=n),
+        "percentile_count": count(has_percentile),
+    }
+
+
+def _ratio(num: np.ndarray, den: np.ndarray, default) -> np.ndarray:
+    out = np.full(num.shape, default, dtype=np.float64)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def derive_rates(agg: dict[str, np.ndarray], profiles: list[dict]) -> dict[str, np.ndarray]:
+    """Array form of ``layer2_risk_profile.derive_rates``."""
+    refund_rate = _ratio(agg["total_refunds"], agg["total_bookings"], 0.0)
+    weighted_refunds = (
+        agg["refunds_recent"] * 1.0 + agg["refunds_mid"] * 0.6 + agg["refunds_old"] * RECENCY_MIN_WEIGHT
+    )
+    weighted_bookings = (
+        agg["bookings_recent"] * 1.0 + agg["bookings_mid"] * 0.6 + agg["bookings_old"] * RECENCY_MIN_WEIGHT
+    )
+    weighted_rate = np.where(
+        weighted_bookings > 0, _ratio(weighted_refunds, weighted_bookings, 0.0), refund_rate
+    )
+
+    created = _epochs(profiles, "account_created_at")
+    missing = created == _MISSING
+    account_days = np.floor_divide(NOW_EPOCH - np.where(missing, NOW_EPOCH, created), SECONDS_PER_DAY)
+    account_age_months = np.where(missing, 12.0, account_days / 30.44)
+
+    return {
+        "refund_rate": refund_rate,
+        "weighted_rate": weighted_rate,
+        "no_show_count": np.array(
+            [p.get("total_no_show_refund_claims", 0) or 0 for p in profiles], dtype=np.int64
+        ),
+        "contradicted": np.array(
+            [p.get("no_show_claims_contradicted", 0) or 0 for p in profiles], dtype=np.int64
+        ),
+        "open_pct": _ratio(agg["email_opened"], agg["email_known"], 0.5),
+        "post_ratio": _ratio(agg["post_experience"], agg["post_experience"] + agg["pre_experience"], 0.0),
+        "avg_percentile": _ratio(agg["percentile_sum"], agg["percentile_count"], 50.0),
+        "account_age_months": account_age_months,
+    }
+
+
+def signal_scores(rates: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Array form of ``layer2_risk_profile.signal_scores``."""
+    weighted_rate = rates["weighted_rate"]
+    proportion = (weighted_rate - REFUND_RATE_LOW_RISK) / (REFUND_RATE_HIGH_RISK - REFUND_RATE_LOW_RISK)
+    no_show, contradicted = rates["no_show_count"], rates["contradicted"]
+    open_pct = rates["open_pct"]
+    post_ratio = rates["post_ratio"]
+    avg_percentile = rates["avg_percentile"]
+    months, refund_rate = rates["account_age_months"], rates["refund_rate"]
+
+    # np.rint rounds half to even, as Python's round() does
+    return {
+        "refund_frequency": np.select(
+            [weighted_rate > REFUND_RATE_HIGH_RISK, weighted_rate > REFUND_RATE_LOW_RISK],
+            [WEIGHT_REFUND_FREQUENCY, np.rint(proportion * 25)],
+            0,
+        ).astype(np.int64),
+        "no_show": np.select(
+            [
+                no_show == 0,
+                (no_show == 1) & (contradicted == 0),
+                (no_show == 1) & (contradicted > 0),
+                (no_show >= 2) & (contradicted > 0),
+            ],
+            [0, 8, 18, WEIGHT_NO_SHOW_HISTORY],
+            15,
+        ),
+        "email_engagement": np.select(
+            [open_pct == 0, open_pct < 0.5, open_pct < 0.8],
+            [WEIGHT_EMAIL_ENGAGEMENT, 8, 3],
+            0,
+        ),
+        "refund_timing": np.select([post_ratio > 0.7, post_ratio > 0.3], [WEIGHT_REFUND_TIMING, 8], 0),
+        "experience_value": np.select(
+            [avg_percentile > 85, avg_percentile > 60], [WEIGHT_EXPERIENCE_VALUE, 4], 0
+        ),
+        "tenure": np.select(
+            [(months < 6) & (refund_rate > 0.30), (months > 24) & (refund_rate < 0.15)],
+            [WEIGHT_TENURE, -5],
+            0,
+        ),
+    }
+
+
+def _scalar(value):
+    # Counts stay ints and rates stay floats so f-string formatting matches the scalar path.
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _results(agg: dict[str, np.ndarray], profiles: list[dict]) -> list[dict]:
+    rates = derive_rates(agg, profiles)
+    scores = signal_scores(rates)
+
+    results = []
+    for i in range(len(profiles)):
+        customer_agg = {key: _scalar(agg[key][i]) for key in _AGG_KEYS}
+        insufficient = insufficient_result(customer_agg)
+        if insufficient is not None:
+            results.append(insufficient)
+            continue
+        customer_rates = {key: _scalar(value[i]) for key, value in rates.items()}
+        customer_scores = {key: _scalar(scores[key][i]) for key in _SIGNAL_KEYS}
+        results.append(build_result(customer_agg, customer_rates, customer_scores))
+    return results
+
+
+def compute_risk_scores(profiles: list[dict], histories: list[list]) -> list[dict]:
+    """
+    Layer 2 results for many customers; ``histories[i]`` belongs to ``profiles[i]``.
+
+    Each history must be ordered by booking_date like the Layer 2 query.
+    """
+    if not profiles:
+        return []
+    return _results(aggregate_histories(histories), profiles)
+
+
+@timed("layer2.compute_risk_scores_from_aggregates")
+def compute_risk_scores_from_aggregates(profiles: list[dict], aggregates: list[dict]) -> list[dict]:
+    """Layer 2 results for many customers from their stored aggregates (engine.aggregates)."""
+    if not profiles:
+        return []
+    return _results({key: np.array([a[key] for a in aggregates]) for key in _AGG_KEYS}, profiles)
+
+
+def compute_risk_score(customer_profile: dict, bookings: list) -> dict:
+    """Single-customer convenience wrapper around ``compute_risk_scores``."""
+    return compute_risk_scores([customer_profile], [bookings])[0]
@@ -4,20 +4,11 @@ from engine.config import (
     NON_CANCELABLE_AMPLIFIER, HIGH_VALUE_THRESHOLD_PERCENTILE,
     POST_EXPERIENCE_MODIFIER,
 )
+from engine.timestamps import row_epoch
+from utils.perf import timed
 
 
-def _parse_ts(ts_str):
-    if not ts_str:
-        return None
-    from datetime import datetime
-    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(ts_str, fmt)
-        except ValueError:
-            continue
-    return None
-
-
+@timed("layer3.evaluate_request")
 def evaluate_request(booking: dict, enrichment: dict, risk_score: int | None) -> dict:
     """
     Evaluate the current request and apply modifiers to the customer risk score.
@@ -60,10 +51,10 @@ def evaluate_request(booking: dict, enrichment: dict, risk_score: int | None) ->
         })
 
     # 2. Timing modifier
-    req_dt = _parse_ts(booking.get("refund_requested_at"))
-    book_dt = _parse_ts(booking.get("booking_date"))
+    requested = row_epoch(booking, "refund_requested_at")
+    booked = row_epoch(booking, "booking_date")
     is_post_experience = False
-    if req_dt and book_dt and req_dt > book_dt:
+    if requested is not None and booked is not None and requested > booked:
         is_post_experience = True
         request_flags.append("post_experience_claim")
         old = score
@@ -1,68 +1,71 @@
 """Profile CRUD, staleness checks, incremental updates, and decision logging."""
 
+import sqlite3
 from datetime import datetime
-from utils.db import query_one, query, execute, get_connection
+from engine.aggregates import aggregate_history, get_aggregates
+from engine.assessment_cache import invalidate_customer
+from utils.db import query_one, execute, get_connection
 
 NOW_STR = datetime(2026, 2, 26, 12, 0, 0).strftime("%Y-%m-%d %H:%M:%S")
 
 
-def get_profile(customer_id: str) -> dict | None:
+def get_profile(customer_id: str, conn: sqlite3.Connection | None = None) -> dict | None:
     row = query_one(
         "SELECT * FROM customer_profiles WHERE customer_id = ?",
         (customer_id,),
+        conn=conn,
     )
     if row is None:
         return None
     return dict(row)
 
 
-def is_profile_stale(profile: dict) -> bool:
-    """Check if new booking/refund events exist since last_profile_computed_at."""
-    if not profile or not profile.get("last_profile_computed_at"):
+def is_profile_stale(profile: dict, conn: sqlite3.Connection | None = None,
+                     aggregates: dict | None = None) -> bool:
+    """Check if bookings/refunds were written since the profile was last computed.
+
+    Compares the customer's data_version with the profile_version stored by
+    update_profile. Pass the customer's ``aggregates`` to check without a query.
+    """
+    if not profile or profile.get("profile_version") is None:
         return True
-    last_computed = profile["last_profile_computed_at"]
-    new_events = query_one(
-        """
-        SELECT COUNT(*) as cnt FROM booking_refund_records
-        WHERE customer_id = ?
-          AND (booking_created_at > ? OR refund_requested_at > ?)
-        """,
-        (profile["customer_id"], last_computed, last_computed),
-    )
-    return (new_events["cnt"] if new_events else 0) > 0
+    if aggregates is None:
+        aggregates = get_aggregates(profile["customer_id"], conn=conn)
+    return aggregates["data_version"] != profile["profile_version"]
 
 
-def compute_profile(customer_id: str) -> dict:
-    """Recompute profile stats from all booking_refund_records."""
-    bookings = query(
-        "SELECT * FROM booking_refund_records WHERE customer_id = ?",
-        (customer_id,),
-    )
-    total_bookings = len(bookings)
-    refund_bookings = [b for b in bookings if b["refund_requested_at"] is not None]
-    total_refunds = len(refund_bookings)
+def compute_profile(customer_id: str, conn: sqlite3.Connection | None = None,
+                    bookings: list | None = None, aggregates: dict | None = None) -> dict:
+    """Profile stats from the customer's stored aggregates (or the given aggregates/history)."""
+    if aggregates is None:
+        if bookings is not None:
+            aggregates = aggregate_history(bookings)
+        else:
+            aggregates = get_aggregates(customer_id, conn=conn)
+    total_bookings = aggregates["total_bookings"]
+    total_refunds = aggregates["total_refunds"]
     refund_rate = total_refunds / total_bookings if total_bookings > 0 else 0.0
 
-    no_show_claims = [
-        b for b in refund_bookings
-        if b["refund_reason"] == "no_show"
-    ]
-    total_no_show = len(no_show_claims)
-    contradicted = sum(1 for b in no_show_claims if b["qr_checkin_confirmed"])
-
     return {
         "total_bookings": total_bookings,
         "total_refunds": total_refunds,
         "refund_rate": round(refund_rate, 4),
-        "total_no_show_refund_claims": total_no_show,
-        "no_show_claims_contradicted": contradicted,
+        "total_no_show_refund_claims": aggregates["no_show_claims"],
+        "no_show_claims_contradicted": aggregates["no_show_contradicted"],
     }
 
 
 def update_profile(customer_id: str, risk_score: int | None = None,
-                    disposition: str | None = None) -> None:
-    """Update the customer profile after processing a case."""
-    stats = compute_profile(customer_id)
+                    disposition: str | None = None,
+                    conn: sqlite3.Connection | None = None,
+                    aggregates: dict | None = None) -> dict:
+    """Update the customer profile after processing a case. Returns the fields written.
+
+    Also drops the customer's cached assessments (engine.assessment_cache).
+    """
+    if aggregates is None:
+        aggregates = get_aggregates(customer_id, conn=conn)
+    stats = compute_profile(customer_id, conn=conn, aggregates=aggregates)
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # Determine disposition from stats if not provided
@@ -84,6 +87,7 @@ def update_profile(customer_id: str, risk_score: int | None = None,
             total_no_show_refund_claims = ?,
             no_show_claims_contradicted = ?,
             last_profile_computed_at = ?,
+            profile_version = ?,
             risk_score = COALESCE(?, risk_score),
             disposition = ?
         WHERE customer_id = ?
@@ -91,9 +95,20 @@ def update_profile(customer_id: str, risk_score: int | None = None,
         (
             stats["total_bookings"], stats["total_refunds"], stats["refund_rate"],
             stats["total_no_show_refund_claims"], stats["no_show_claims_contradicted"],
-            now, risk_score, disposition, customer_id,
+            now, aggregates["data_version"], risk_score, disposition, customer_id,
         ),
+        conn=conn,
     )
+    updated = {
+        **stats,
+        "last_profile_computed_at": now,
+        "profile_version": aggregates["data_version"],
+        "disposition": disposition,
+    }
+    if risk_score is not None:
+        updated["risk_score"] = risk_score
+    invalidate_customer(customer_id, conn=conn)
+    return updated
 
 
 def log_interaction(customer_id: str, booking_id: str, classification: str,
@@ -104,7 +119,8 @@ def log_interaction(customer_id: str, booking_id: str, classification: str,
                     l2_reason: str | None = None,
                     evidence_narrative: str | None = None,
                     agent_concern: str | None = None,
-                    customer_message: str | None = None) -> int:
+                    customer_message: str | None = None,
+                    conn: sqlite3.Connection | None = None) -> int:
     """Log a decision to the decision_log table. Returns log_id."""
     return execute(
         """
@@ -121,10 +137,12 @@ def log_interaction(customer_id: str, booking_id: str, classification: str,
             1 if escalated_to_l2 else 0, l2_decision, l2_reason, evidence_narrative,
             agent_concern, customer_message,
         ),
+        conn=conn,
     )
 
 
-def update_l2_decision(log_id: int, l2_decision: str, l2_reason: str) -> None:
+def update_l2_decision(log_id: int, l2_decision: str, l2_reason: str,
+                       conn: sqlite3.Connection | None = None) -> None:
     """Update an existing decision_log entry with L2's decision."""
     execute(
         """
@@ -133,6 +151,7 @@ def update_l2_decision(log_id: int, l2_decision: str, l2_reason: str) -> None:
         WHERE log_id = ?
         """,
         (l2_decision, l2_reason, log_id),
+        conn=conn,
     )
 
 
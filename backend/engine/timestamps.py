@@ -0,0 +1,66 @@
+"""Shared timestamp parsing for the scoring engine.
+
+Stored timestamps are text in one of two shapes, ``YYYY-MM-DD HH:MM:SS`` or
+``YYYY-MM-DD``. Rows read through ``SELECT *`` also carry an integer
+``<column>_epoch`` generated column (see utils/schema.py); ``row_epoch``
+prefers it and only falls back to parsing the text.
+
+``parse_ts`` accepts exactly the values that column accepts: valid,
+zero-padded dates and times in one of the two shapes. Anything else
+(unpadded fields, a ``T`` separator, 2023-02-29) is not a timestamp on either
+path, so the trigger-maintained aggregates and the Python recomputation agree.
+"""
+
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Fixed "current time" for the prototype's seed data.
+NOW = datetime(2026, 2, 26, 12, 0, 0)
+
+SECONDS_PER_DAY = 86400
+PARSE_CACHE_SIZE = 65536
+
+_EPOCH = datetime(1970, 1, 1)
+# Exactly the zero-padded shapes; strptime alone would accept unpadded fields
+# ("2026-2-5"), which the SQL round trip rejects.
+_CANONICAL = re.compile(r"\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?", re.ASCII)
+
+
+def parse_ts(ts_str: str | None) -> datetime | None:
+    """Parse a stored timestamp; None for empty, non-canonical or invalid values."""
+    if not ts_str or not _CANONICAL.fullmatch(ts_str):
+        return None
+    try:
+        return datetime.fromisoformat(ts_str)
+    except ValueError:
+        return None
+
+
+def to_epoch(dt: datetime) -> int:
+    return (dt - _EPOCH) // timedelta(seconds=1)
+
+
+NOW_EPOCH = to_epoch(NOW)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def epoch_seconds(ts_str: str | None) -> int | None:
+    """Epoch seconds of a text timestamp, memoized (histories repeat the same values)."""
+    dt = parse_ts(ts_str)
+    return None if dt is None else to_epoch(dt)
+
+
+def row_epoch(row: dict, column: str) -> int | None:
+    """Epoch seconds of ``row[column]``, from its ``_epoch`` column when present."""
+    epoch = row.get(f"{column}_epoch")
+    if epoch is not None:
+        return epoch
+    return epoch_seconds(row.get(column))
+
+
+def days_ago(epoch: int | None) -> int | None:
+    """Whole days between ``epoch`` and NOW, floored like ``timedelta.days``."""
+    if epoch is None:
+        return None
+    return (NOW_EPOCH - epoch) // SECONDS_PER_DAY
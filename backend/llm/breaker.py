@@ -0,0 +1,179 @@
+"""Per-model circuit breakers and adaptive timeouts for LLM calls.
+
+``llm.client`` routes every completion through the breaker for its model.
+Each breaker keeps a rolling window (``LLM_BREAKER_WINDOW_SECONDS``) of call
+outcomes and latencies:
+
+- closed: calls go through with a timeout adapted to recent latency, a
+  multiple of the window's p95 clamped to [``LLM_MIN_TIMEOUT_SECONDS``, the
+  model's ceiling in ``MODEL_TIMEOUTS``], so a slowing upstream fails in
+  seconds rather than after the client's full timeout.
+- open: after ``LLM_BREAKER_MIN_CALLS`` calls in the window with an error
+  rate of at least ``LLM_BREAKER_ERROR_RATE``. Calls are refused at once with
+  ``CircuitOpenError``, which the ``llm/*`` callers treat like any other
+  failure (fallback, ``llm_available: False``).
+- half-open: after ``LLM_BREAKER_COOLDOWN_SECONDS``, one probe call is let
+  through; its success closes the circuit, its failure reopens it.
+
+Client errors (4xx other than 429) say nothing about upstream health and are
+not counted. State is per process and reported under ``llm_breakers`` in
+``/api/metrics``.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+import openai
+
+LLM_BREAKER_WINDOW_SECONDS = float(os.environ.get("RAD_LLM_BREAKER_WINDOW", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get("RAD_LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.environ.get("RAD_LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("RAD_LLM_BREAKER_COOLDOWN", "30"))
+LLM_MIN_TIMEOUT_SECONDS = float(os.environ.get("RAD_LLM_MIN_TIMEOUT", "2"))
+LLM_TIMEOUT_P95_MULTIPLIER = 3.0
+
+# Ceiling per model: a short completion from the small model should never take
+# as long as a case brief from the large one.
+MODEL_TIMEOUTS = {
+    "llama-3.1-8b-instant": float(os.environ.get("RAD_LLM_TIMEOUT_SMALL", "10")),
+    "llama-3.3-70b-versatile": float(os.environ.get("RAD_LLM_TIMEOUT_LARGE", "30")),
+}
+DEFAULT_MODEL_TIMEOUT_SECONDS = float(os.environ.get("RAD_LLM_TIMEOUT", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit is open."""
+
+
+def counts_as_failure(exc: BaseException) -> bool:
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500 or exc.status_code == 429
+    return True
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """Rolling-window breaker for one model; thread-safe."""
+
+    def __init__(self, name: str, max_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_timeout = max_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls: deque[tuple[float, bool, float]] = deque()  # (finished_at, ok, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._counters = dict.fromkeys(("opened", "rejected"), 0)
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] <= now - LLM_BREAKER_WINDOW_SECONDS:
+            self._calls.popleft()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= LLM_BREAKER_COOLDOWN_SECONDS:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may start now; in half-open state only one probe at a time is allowed."""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= LLM_BREAKER_COOLDOWN_SECONDS:
+                self._state = HALF_OPEN
+            if self._state == CLOSED or (self._state == HALF_OPEN and not self._probing):
+                self._probing = self._state == HALF_OPEN
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def timeout(self) -> float:
+        """Per-call timeout: LLM_TIMEOUT_P95_MULTIPLIER x recent p95 latency, within [min, model ceiling]."""
+        with self._lock:
+            self._prune(self._clock())
+            latencies = [latency for _, ok, latency in self._calls if ok]
+        if len(latencies) < LLM_BREAKER_MIN_CALLS:
+            return self.max_timeout
+        adaptive = _percentile(latencies, 95) * LLM_TIMEOUT_P95_MULTIPLIER
+        return min(self.max_timeout, max(LLM_MIN_TIMEOUT_SECONDS, adaptive))
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            now = self._clock()
+            self._calls.append((now, ok, latency))
+            self._prune(now)
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            if (self._state == CLOSED and len(self._calls) >= LLM_BREAKER_MIN_CALLS
+                    and failures / len(self._calls) >= LLM_BREAKER_ERROR_RATE):
+                self._open(now)
+
+    def release(self) -> None:
+        """End a call that produced no health signal (e.g. a 4xx), freeing a half-open probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._counters["opened"] += 1
+
+    def stats(self) -> dict:
+        state = self.state
+        timeout = self.timeout()
+        with self._lock:
+            calls = list(self._calls)
+        latencies = [latency for _, ok, latency in calls if ok]
+        failures = sum(1 for _, ok, _ in calls if not ok)
+        return {
+            "state": state,
+            "window_calls": len(calls),
+            "window_error_rate": round(failures / len(calls), 4) if calls else 0.0,
+            "p50_latency_ms": round(_percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p95_latency_ms": round(_percentile(latencies, 95) * 1000, 1) if latencies else None,
+            "timeout_seconds": round(timeout, 3),
+            **self._counters,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(
+                model, CircuitBreaker(model, MODEL_TIMEOUTS.get(model, DEFAULT_MODEL_TIMEOUT_SECONDS))
+            )
+    return breaker
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def breaker_stats() -> dict:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {model: breaker.stats() for model, breaker in sorted(breakers.items())}
@@ -0,0 +1,271 @@
+"""Application-scoped LLM clients shared by every LLM-backed route.
+
+One OpenAI-compatible client (Groq by default) owns one HTTPX connection pool,
+so calls reuse kept-alive TLS connections instead of opening a new pool per
+request. ``get_async_llm_client`` is the ``AsyncOpenAI`` client the async
+routes await, so an in-flight generation holds no worker thread.
+``main.lifespan`` creates it at startup and closes it at shutdown; it is also
+created on first use for callers without the lifespan (tests, scripts).
+Without ``GROQ_API_KEY`` there is no client and the ``llm/*`` functions fall
+back.
+
+Point it elsewhere (e.g. a local stub server in tests) with ``RAD_LLM_BASE_URL``.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from openai import AsyncOpenAI
+
+from llm import response_cache
+from llm.breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError, counts_as_failure, get_breaker
+from llm.response_cache import ResponseCache, cache_key
+from utils import perf
+
+DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Connection pool and per-call limits. HTTP/1.1 carries one request per
+# connection, so max connections is also the cap on concurrent LLM calls.
+LLM_MAX_CONNECTIONS = int(os.environ.get("RAD_LLM_MAX_CONNECTIONS", "256"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("RAD_LLM_MAX_KEEPALIVE", "64"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("RAD_LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("RAD_LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("RAD_LLM_CONNECT_TIMEOUT", "5"))
+# Retries of a failed call (429, 5xx, connection errors). They are made here
+# rather than by the SDK so each attempt goes through the breaker, and all
+# attempts share one deadline: the breaker timeout when the call started.
+LLM_MAX_RETRIES = int(os.environ.get("RAD_LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.environ.get("RAD_LLM_RETRY_BACKOFF", "0.25"))
+
+_async_client: AsyncOpenAI | None = None
+_async_client_settings: tuple | None = None
+_lock = threading.Lock()
+
+
+def _settings() -> tuple[str, str] | None:
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        return None
+    return api_key, os.environ.get("RAD_LLM_BASE_URL") or DEFAULT_BASE_URL
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def create_async_llm_client(api_key: str, base_url: str = DEFAULT_BASE_URL) -> AsyncOpenAI:
+    """Build a client with a pooled keep-alive HTTP transport."""
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+        timeout=_timeout(),
+        max_retries=0,  # retried by complete_async/stream_async, within the breaker deadline
+    )
+
+
+def get_async_llm_client() -> AsyncOpenAI | None:
+    """The shared async client for the running event loop, or None without an API key.
+
+    The client is rebuilt if the key or base URL in the environment changes.
+    Pooled connections belong to the loop that opened them, so a client is
+    rebuilt if called from a different loop (only happens outside the server,
+    e.g. separate ``asyncio.run`` calls).
+    """
+    global _async_client, _async_client_settings
+    settings = _settings()
+    if settings is None:
+        return None
+    settings = (*settings, asyncio.get_running_loop())
+    if settings == _async_client_settings:
+        return _async_client
+    with _lock:
+        if settings != _async_client_settings:
+            # A client from another (finished) loop cannot be closed from this one.
+            _async_client = create_async_llm_client(*settings[:2])
+            _async_client_settings = settings
+        return _async_client
+
+
+async def close_llm_clients() -> None:
+    """Close the shared client if it belongs to the running event loop, and forget it."""
+    global _async_client, _async_client_settings
+    with _lock:
+        client, settings = _async_client, _async_client_settings
+        _async_client = None
+        _async_client_settings = None
+    if client is not None and settings[2] is asyncio.get_running_loop():
+        await client.close()
+
+
+def strip_code_fences(text: str) -> str:
+    """Drop a surrounding markdown code fence from a model reply."""
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1]
+        if text.endswith("```"):
+            text = text[:-3]
+    return text
+
+
+def llm_available(client, model: str) -> bool:
+    """A client is configured and the model's circuit (llm/breaker.py) is not open."""
+    return client is not None and get_breaker(model).state != OPEN
+
+
+def _start(model: str) -> tuple[CircuitBreaker, float]:
+    breaker = get_breaker(model)
+    if not breaker.allow():
+        raise CircuitOpenError(f"LLM circuit open for {model}")
+    return breaker, time.monotonic()
+
+
+def _deadline(model: str) -> float:
+    return time.monotonic() + get_breaker(model).timeout()
+
+
+def _remaining(deadline: float) -> float:
+    return max(deadline - time.monotonic(), 0.001)
+
+
+def _retry_delay(breaker: CircuitBreaker, exc: BaseException, attempt: int, deadline: float) -> float | None:
+    """Backoff before retrying a failed attempt, or None to give up and raise ``exc``."""
+    if attempt >= LLM_MAX_RETRIES or not isinstance(exc, Exception) or not counts_as_failure(exc):
+        return None
+    if breaker.state != CLOSED:
+        return None
+    delay = LLM_RETRY_BACKOFF_SECONDS * 2 ** attempt
+    # Not worth starting an attempt with less than the backoff left to run in.
+    return delay if deadline - time.monotonic() > 2 * delay else None
+
+
+def _finish(breaker: CircuitBreaker, started: float, exc: BaseException | None = None) -> None:
+    elapsed = time.monotonic() - started
+    if perf.PERF_ENABLED:
+        perf.record("llm", breaker.name, int(elapsed * 1e9))
+    if exc is None:
+        breaker.record(True, elapsed)
+    elif isinstance(exc, Exception) and counts_as_failure(exc):
+        breaker.record(False, elapsed)
+    else:
+        # Cancelled (deadline) or a client error: no signal about upstream health.
+        breaker.release()
+
+
+def _cached(client, cache: str | None, model: str, temperature: float, max_tokens: int,
+            prompt: str) -> tuple[ResponseCache, str] | None:
+    """(cache, key) when the call should go through the response cache (llm/response_cache.py)."""
+    store = response_cache.LLM_RESPONSE_CACHE
+    if cache is None or store is None:
+        return None
+    return store, cache_key(str(getattr(client, "base_url", "")), model, temperature, max_tokens, prompt)
+
+
+async def complete_async(client: AsyncOpenAI, model: str, prompt: str, temperature: float,
+                         max_tokens: int, cache: str | None = None) -> str:
+    """Single-prompt chat completion; returns the stripped reply text.
+
+    Goes through the model's circuit breaker (llm/breaker.py): raises
+    ``CircuitOpenError`` without a request while the circuit is open. Failed
+    attempts are retried up to ``LLM_MAX_RETRIES`` times, each recorded by the
+    breaker, and all within the breaker's adaptive timeout taken at the start.
+
+    With ``cache`` (an endpoint name from ``response_cache.LLM_CACHE_TTLS``)
+    a cached reply to the identical prompt is returned without a request; the
+    SQLite cache tier runs in the threadpool.
+    """
+    cached = _cached(client, cache, model, temperature, max_tokens, prompt)
+    if cached is not None:
+        hit = cached[0].get_memory(cache, cached[1])
+        if hit is None:
+            hit = await run_in_threadpool(cached[0].get_disk, cache, cached[1])
+        if hit is not None:
+            return hit
+    deadline = _deadline(model)
+    for attempt in itertools.count():
+        breaker, started = _start(model)
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=_remaining(deadline),
+            )
+        except BaseException as exc:
+            _finish(breaker, started, exc)
+            delay = _retry_delay(breaker, exc, attempt, deadline)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _finish(breaker, started)
+        break
+    text = response.choices[0].message.content.strip()
+    if cached is not None:
+        await run_in_threadpool(cached[0].set, cache, cached[1], text)
+    return text
+
+
+async def stream_async(client: AsyncOpenAI, model: str, prompt: str, temperature: float, max_tokens: int,
+                       cache: str | None = None) -> AsyncIterator[str]:
+    """``complete_async`` with ``stream=True``: yields reply text as the tokens arrive.
+
+    A cached reply is yielded whole; a completed stream is cached like
+    ``complete_async``'s reply. Errors propagate to the consumer.
+    """
+    cached = _cached(client, cache, model, temperature, max_tokens, prompt)
+    if cached is not None:
+        hit = cached[0].get_memory(cache, cached[1])
+        if hit is None:
+            hit = await run_in_threadpool(cached[0].get_disk, cache, cached[1])
+        if hit is not None:
+            yield hit
+            return
+    deadline = _deadline(model)
+    parts = []
+    for attempt in itertools.count():
+        breaker, started = _start(model)
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                timeout=_remaining(deadline),
+            )
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text and not parts:
+                    text = text.lstrip()
+                    if text and perf.PERF_ENABLED:
+                        perf.record("llm_ttft", model, int((time.monotonic() - started) * 1e9))
+                if text:
+                    parts.append(text)
+                    yield text
+        except BaseException as exc:
+            _finish(breaker, started, exc)
+            # Text already yielded cannot be taken back, so only retry before the first token.
+            delay = None if parts else _retry_delay(breaker, exc, attempt, deadline)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _finish(breaker, started)
+        break
+    if cached is not None and parts:
+        await run_in_threadpool(cached[0].set, cache, cached[1], "".join(parts).rstrip())
@@ -1,27 +1,13 @@
 import json
-import os
+from collections.abc import AsyncIterator
 
-from openai import OpenAI
+from llm.client import complete_async, stream_async
 
+MODEL = "llama-3.1-8b-instant"
 
-def get_groq_client():
-    """Get Groq client, return None if API key not set."""
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        return None
-    return OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
 
-
-def generate_guidance(classification, risk_score, recommended_action, evidence_summary, agent_message, policy_snippets):
-    """
-    Generate contextual guidance based on agent's situational update.
-    Returns: { guidance: str, llm_available: bool }
-    """
-    client = get_groq_client()
-    if not client:
-        return {"guidance": None, "llm_available": False}
-
-    prompt = f"""You are a decision support assistant for Headout customer service agents. The agent is in an active call and has received the system's risk assessment. The situation has evolved and the agent needs guidance.
+def _prompt(classification, risk_score, recommended_action, evidence_summary, agent_message, policy_snippets):
+    return f"""You are a decision support assistant for Headout customer service agents. The agent is in an active call and has received the system's risk assessment. The situation has evolved and the agent needs guidance.
 
 Your response must:
 - Be 2-4 sentences
@@ -44,16 +30,28 @@ Relevant policy rules:
 
 Generate ONLY the guidance response. No preamble, no explanation."""
 
+
+async def generate_guidance_async(client, classification, risk_score, recommended_action, evidence_summary,
+                                  agent_message, policy_snippets):
+    """
+    Generate contextual guidance based on agent's situational update.
+    ``client`` is the shared async LLM client (llm.client), or None when unavailable.
+    Returns: { guidance: str, llm_available: bool }
+    """
+    if not client:
+        return {"guidance": None, "llm_available": False}
+    prompt = _prompt(classification, risk_score, recommended_action, evidence_summary, agent_message,
+                     policy_snippets)
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=300,
-            temperature=0.3,
-        )
-        return {
-            "guidance": response.choices[0].message.content.strip(),
-            "llm_available": True,
-        }
+        guidance = await complete_async(client, MODEL, prompt, temperature=0.3, max_tokens=300, cache="guidance")
+        return {"guidance": guidance, "llm_available": True}
     except Exception as exc:
         return {"guidance": None, "llm_available": False, "error": str(exc)}
+
+
+def stream_guidance(client, classification, risk_score, recommended_action, evidence_summary, agent_message,
+                    policy_snippets) -> AsyncIterator[str]:
+    """Guidance text streamed token by token; errors propagate to the consumer."""
+    prompt = _prompt(classification, risk_score, recommended_action, evidence_summary, agent_message,
+                     policy_snippets)
+    return stream_async(client, MODEL, prompt, temperature=0.3, max_tokens=300, cache="guidance")
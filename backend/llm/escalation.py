@@ -0,0 +1,59 @@
+"""Deadline-bounded LLM work for L2 escalations (resolve handoff and escalation detail).
+
+Note-signal extraction (small model) and the case narrative (large model) are
+chained with deadlines instead of run back to back: the narrative starts with
+whatever note signals exist when ``NOTE_SIGNALS_DEADLINE_SECONDS`` arrives (at
+least the rule-based ones), so a handoff costs about one large-model round
+trip. Callers run these as tasks alongside their database and engine work.
+"""
+
+import asyncio
+import os
+from collections.abc import Awaitable
+from typing import Any
+
+from llm.evidence_summarizer import summarize_evidence_async
+from llm.note_extractor import extract_note_signals_async, rule_signals
+
+NOTE_SIGNALS_DEADLINE_SECONDS = float(os.environ.get("RAD_NOTE_SIGNALS_DEADLINE", "1.5"))
+NARRATIVE_DEADLINE_SECONDS = float(os.environ.get("RAD_NARRATIVE_DEADLINE", "20"))
+
+
+async def within(awaitable: Awaitable, seconds: float, default: Any = None) -> Any:
+    """Result of ``awaitable``, or ``default`` if it has not finished after ``seconds`` (it is cancelled)."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout=seconds)
+    except asyncio.TimeoutError:
+        return default
+
+
+async def note_signals(groq_client, notes: list[dict], deadline: float | None = None) -> dict | None:
+    """
+    Note signals if extraction finishes within ``deadline`` (default
+    NOTE_SIGNALS_DEADLINE_SECONDS), else the rule-based signals alone.
+    """
+    if not notes:
+        return None
+    if deadline is None:
+        deadline = NOTE_SIGNALS_DEADLINE_SECONDS
+    return await within(extract_note_signals_async(groq_client, notes), deadline, default=rule_signals(notes))
+
+
+async def escalation_narrative(groq_client, notes: list[dict], profile: dict, history_summary: str,
+                               risk_score: int | None, signal_breakdown: list,
+                               current_request: dict, signals: dict | None = None) -> str | None:
+    """
+    Case brief for L2. Pass already-known (stored) ``signals`` to skip extraction;
+    otherwise LLM-extracted signals are included only if they arrive before
+    their deadline, and the rule-based ones if they do not.
+    """
+    if groq_client is None:
+        return None
+    if signals is None:
+        signals = await note_signals(groq_client, notes)
+    return await within(
+        summarize_evidence_async(
+            groq_client, profile, history_summary, risk_score, signal_breakdown, current_request, signals,
+        ),
+        NARRATIVE_DEADLINE_SECONDS,
+    )
@@ -1,16 +1,12 @@
 """Evidence summarization for L2 escalations using Groq API (llama-3.3-70b-versatile)."""
 
+from llm.client import complete_async
+
+MODEL = "llama-3.3-70b-versatile"
 
-def summarize_evidence(groq_client, profile: dict, history_summary: str,
-                       risk_score: int | None, signal_breakdown: list,
-                       current_request: dict, note_signals: dict | None) -> str | None:
-    """
-    Generate a 4-6 sentence narrative case brief for the L2 floor manager.
-    Returns None if LLM unavailable.
-    """
-    if groq_client is None:
-        return None
 
+def _prompt(profile: dict, history_summary: str, risk_score: int | None, signal_breakdown: list,
+            current_request: dict, note_signals: dict | None) -> str:
     signal_text = "\n".join(
         f"- {s['name']}: {s['raw_value']} (score {s['score']}/{s['weight']}) — {s['explanation']}"
         for s in signal_breakdown
@@ -43,7 +39,7 @@ def summarize_evidence(groq_client, profile: dict, history_summary: str,
 
     request_text = "\n".join(f"- {k}: {v}" for k, v in current_request.items())
 
-    prompt = f"""You are a risk analysis assistant generating a case brief for a floor manager reviewing an escalated refund request.
+    return f"""You are a risk analysis assistant generating a case brief for a floor manager reviewing an escalated refund request.
 
 Synthesize the following evidence into a concise narrative paragraph (4-6 sentences). 
 Lead with the most critical finding. Include specific numbers and dates. 
@@ -67,13 +63,20 @@ Agent Note Signals:
 
 Generate ONLY the narrative paragraph. No preamble, no bullet points."""
 
+
+async def summarize_evidence_async(groq_client, profile: dict, history_summary: str,
+                                   risk_score: int | None, signal_breakdown: list,
+                                   current_request: dict, note_signals: dict | None) -> str | None:
+    """
+    Generate a 4-6 sentence narrative case brief for the L2 floor manager.
+    ``groq_client`` is the async client (llm.client.get_async_llm_client).
+    Returns None if LLM unavailable.
+    """
+    if groq_client is None:
+        return None
+    prompt = _prompt(profile, history_summary, risk_score, signal_breakdown, current_request, note_signals)
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-            max_tokens=500,
-        )
-        return response.choices[0].message.content.strip()
+        return await complete_async(groq_client, MODEL, prompt, temperature=0.5, max_tokens=500,
+                                    cache="evidence_summary")
     except Exception:
         return None
@@ -1,25 +1,25 @@
-"""Agent note signal extraction using Groq API (llama-3.1-8b-instant)."""
+"""Agent note signal extraction: rules first (llm/note_rules.py), Groq API (llama-3.1-8b-instant) second.
+
+The rule-based extractor decides the three boolean signals for most notes. The
+LLM then only writes the summary; it does the full extraction when the rules
+are not confident. Without the LLM (no key, error) the rule result is returned,
+so signals stay available. Results carry ``source``: "rules", "rules+llm" or "llm".
+"""
 
 import json
 
+from llm.client import complete_async, strip_code_fences
+from llm.note_rules import extract_rule_signals
 
-def extract_note_signals(groq_client, agent_notes: list[dict]) -> dict | None:
-    """
-    Extract structured signals from past agent notes.
-    agent_notes: list of {"timestamp": str, "note": str}
-    Returns dict with aggression_detected, chargeback_threat, repeated_claim_pattern,
-    notable_quotes, summary. Returns None if LLM unavailable or no notes.
-    """
-    if groq_client is None or not agent_notes:
-        return None
+MODEL = "llama-3.1-8b-instant"
 
-    formatted_notes = "\n".join(
-        f"[{n['timestamp']}] {n['note']}" for n in agent_notes if n.get("note")
-    )
-    if not formatted_notes.strip():
-        return None
 
-    prompt = f"""You are analyzing customer service agent notes to extract structured signals. 
+def _format_notes(agent_notes: list[dict]) -> str:
+    return "\n".join(f"[{n['timestamp']}] {n['note']}" for n in agent_notes if n.get("note"))
+
+
+def _prompt(agent_notes: list[dict]) -> str:
+    return f"""You are analyzing customer service agent notes to extract structured signals. 
 Given the following agent notes from past interactions with a customer, extract:
 
 1. aggression_detected: Did the customer show aggressive behavior? (true/false)
@@ -29,26 +29,58 @@ Given the following agent notes from past interactions with a customer, extract:
 5. summary: A 1-2 sentence summary of the behavioral pattern visible in these notes
 
 Agent notes:
-{formatted_notes}
+{_format_notes(agent_notes)}
 
 Respond ONLY in JSON format. No preamble."""
 
+
+def _summary_prompt(agent_notes: list[dict], rules: dict) -> str:
+    return f"""You are analyzing customer service agent notes. These signals have already been determined:
+- aggression_detected: {str(rules["aggression_detected"]).lower()}
+- chargeback_threat: {str(rules["chargeback_threat"]).lower()}
+- repeated_claim_pattern: {str(rules["repeated_claim_pattern"]).lower()}
+
+Write a 1-2 sentence summary of the behavioral pattern visible in these notes, consistent with the signals.
+
+Agent notes:
+{_format_notes(agent_notes)}
+
+Respond with ONLY the summary. No preamble."""
+
+
+def rule_signals(agent_notes: list[dict]) -> dict | None:
+    """Rule-only signals in the extractor's output shape, or None without note text."""
+    rules = extract_rule_signals(agent_notes)
+    if rules is None:
+        return None
+    rules.pop("confident")
+    return {**rules, "source": "rules"}
+
+
+async def extract_note_signals_async(groq_client, agent_notes: list[dict]) -> dict | None:
+    """
+    Extract structured signals from past agent notes.
+    agent_notes: list of {"timestamp": str, "note": str}
+    Returns dict with aggression_detected, chargeback_threat, repeated_claim_pattern,
+    notable_quotes, summary, source. Returns None if there are no notes.
+    ``groq_client`` is the async client (llm.client.get_async_llm_client) or None.
+    """
+    rules = extract_rule_signals(agent_notes or [])
+    if rules is None:
+        return None
+    confident = rules.pop("confident")
+    fallback = {**rules, "source": "rules"}
+    if groq_client is None:
+        return fallback
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=500,
-        )
-        text = response.choices[0].message.content.strip()
-        # Strip markdown code fences if present
-        if text.startswith("```"):
-            text = text.split("\n", 1)[-1]
-            if text.endswith("```"):
-                text = text[:-3]
-        return json.loads(text)
+        if confident:
+            summary = await complete_async(groq_client, MODEL, _summary_prompt(agent_notes, rules),
+                                           temperature=0.3, max_tokens=150)
+            return {**rules, "summary": summary, "source": "rules+llm"}
+        text = await complete_async(groq_client, MODEL, _prompt(agent_notes), temperature=0.3, max_tokens=500)
+        return {**json.loads(strip_code_fences(text)), "source": "llm"}
     except Exception:
-        return None
+        return fallback
 
 
 def collect_agent_notes(bookings: list) -> list[dict]:
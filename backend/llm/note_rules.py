@@ -0,0 +1,167 @@
+"""Rule-based agent-note signals: the fast path ahead of the LLM extractor.
+
+Agent notes are short and formulaic ("Threatened chargeback.", "Customer
+aggressive again.", "Repeated no-show claim"), so the three boolean signals
+can usually be read off a lexicon. Each lexicon is compiled once into a single
+regex whose alternation is factored by shared prefixes (a trie), so a note is
+scanned once per signal however many phrases there are.
+
+A result is ``confident`` unless a match is negated ("no chargeback") or a
+sentence carries only a hedge word the lexicons deliberately leave out
+("upset", "threatened a bad review"); callers send low-confidence notes to
+the LLM.
+"""
+
+import re
+
+# Phrases are matched case-insensitively on word boundaries after whitespace
+# is collapsed; a trailing "*" allows any word ending ("threaten*").
+AGGRESSION_PHRASES = (
+    "aggressive*", "aggression", "abusive", "abuse", "hostile", "rude",
+    "shout*", "yell*", "scream*", "swore", "swearing", "cursed", "cursing",
+    "raised voice", "raised their voice", "raised his voice", "raised her voice",
+    "irate", "verbally", "threatened staff", "threatened the guide", "insult*",
+)
+CHARGEBACK_PHRASES = (
+    "chargeback*", "charge back", "charge-back", "threatened to dispute", "dispute the charge",
+    "dispute with bank", "dispute with their bank", "contact their bank", "contact my bank",
+    "call their bank", "credit card company", "legal action", "lawyer", "attorney",
+    "sue", "suing", "small claims", "report to bank", "reverse the payment",
+)
+# "again" alone ("will call again tomorrow") is not a claim; it counts next to one.
+REPEAT_PHRASES = (
+    "claim* again", "again claim*", "request* again", "again request*", "refund again",
+    "reported again", "again reported", "repeated*", "repeat claim*", "same story", "same claim", "similar story",
+    "story structure", "similar to prior", "similar to previous", "pattern", "multiple similar",
+    "another no-show", "another no show", "second no-show", "second time", "third time",
+    "seems rehearsed", "rehearsed",
+)
+# Wording the LLM should judge: emotion or disputes that may or may not count,
+# and a bare "again" that may or may not be a repeat claim.
+HEDGE_PHRASES = (
+    "upset", "frustrated", "angry", "annoyed", "dispute*", "complain*", "unhappy",
+    "threat*", "escalat*", "could be coincidence", "possibly", "unclear", "again",
+)
+NEGATION_WORDS = ("no", "not", "never", "without", "denied", "didn't", "did not", "wasn't", "was not")
+NEGATION_WINDOW_WORDS = 3
+
+# Claim types counted across notes: the same claim in two or more notes is a repeat pattern.
+CLAIM_PHRASES = {
+    "no_show": ("no-show", "no show", "did not show", "didn't show", "not show up"),
+    "not_as_described": ("not as described",),
+    "transport": ("taxi", "transfer did not", "pickup did not", "pick-up did not"),
+    "closed": ("were closed", "was closed"),
+}
+
+MAX_NOTABLE_QUOTES = 3
+
+
+def _trie_pattern(phrases) -> str:
+    """Alternation over ``phrases`` with shared prefixes factored out."""
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase.lower():
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        end = "" in node
+        branches = []
+        for ch in sorted(k for k in node if k):
+            tail = build(node[ch])
+            if ch == "*":
+                branches.append(r"\w*" + tail)
+            else:
+                branches.append(re.escape(ch) + tail)
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if end else body
+
+    return build(trie)
+
+
+def compile_lexicon(phrases) -> re.Pattern:
+    return re.compile(rf"(?<![\w-])(?:{_trie_pattern(phrases)})(?![\w-])", re.IGNORECASE)
+
+
+AGGRESSION_RE = compile_lexicon(AGGRESSION_PHRASES)
+CHARGEBACK_RE = compile_lexicon(CHARGEBACK_PHRASES)
+REPEAT_RE = compile_lexicon(REPEAT_PHRASES)
+HEDGE_RE = compile_lexicon(HEDGE_PHRASES)
+CLAIM_RES = {claim: compile_lexicon(phrases) for claim, phrases in CLAIM_PHRASES.items()}
+_NEGATION_RE = compile_lexicon(NEGATION_WORDS)
+_SENTENCE_RE = re.compile(r"[^.!?;]+[.!?]?")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _negated(text: str, start: int) -> bool:
+    preceding = text[:start].split()[-NEGATION_WINDOW_WORDS:]
+    return bool(_NEGATION_RE.search(" ".join(preceding)))
+
+
+def _scan(pattern: re.Pattern, texts: list[str]) -> tuple[bool, bool, list[str]]:
+    """(matched, any match negated, sentences with an un-negated match)."""
+    matched = negated = False
+    sentences = []
+    for text in texts:
+        for sentence in _SENTENCE_RE.findall(text):
+            for m in pattern.finditer(sentence):
+                if _negated(sentence, m.start()):
+                    negated = True
+                    continue
+                matched = True
+                sentences.append(sentence.strip())
+                break
+    return matched, negated, sentences
+
+
+def _summary(signals: dict) -> str:
+    found = [
+        label for key, label in (
+            ("aggression_detected", "aggressive behaviour"),
+            ("chargeback_threat", "a chargeback or legal threat"),
+            ("repeated_claim_pattern", "a repeated claim pattern"),
+        ) if signals[key]
+    ]
+    if not found:
+        return "Agent notes show no aggression, chargeback threats or repeated claims."
+    return "Agent notes record " + ", ".join(found[:-1]) + (" and " if len(found) > 1 else "") + found[-1] + "."
+
+
+def extract_rule_signals(agent_notes: list[dict]) -> dict | None:
+    """
+    Rule-based signals for notes in ``collect_agent_notes`` form.
+
+    Returns the LLM extractor's keys (aggression_detected, chargeback_threat,
+    repeated_claim_pattern, notable_quotes, summary) plus ``confident``;
+    None when there is no note text.
+    """
+    texts = [_SPACE_RE.sub(" ", n["note"]).strip() for n in agent_notes if n.get("note")]
+    texts = [t for t in texts if t]
+    if not texts:
+        return None
+
+    aggression, aggression_neg, aggression_quotes = _scan(AGGRESSION_RE, texts)
+    chargeback, chargeback_neg, chargeback_quotes = _scan(CHARGEBACK_RE, texts)
+    repeat, repeat_neg, repeat_quotes = _scan(REPEAT_RE, texts)
+    if not repeat:
+        repeat = any(sum(1 for t in texts if claim_re.search(t)) >= 2 for claim_re in CLAIM_RES.values())
+    # A hedge word only lowers confidence where no lexicon phrase already explains the sentence.
+    hedged = any(
+        HEDGE_RE.search(sentence)
+        and not any(p.search(sentence) for p in (AGGRESSION_RE, CHARGEBACK_RE, REPEAT_RE))
+        for t in texts for sentence in _SENTENCE_RE.findall(t)
+    )
+
+    quotes = list(dict.fromkeys(chargeback_quotes + aggression_quotes + repeat_quotes))[:MAX_NOTABLE_QUOTES]
+    signals = {
+        "aggression_detected": aggression,
+        "chargeback_threat": chargeback,
+        "repeated_claim_pattern": repeat,
+        "notable_quotes": quotes,
+    }
+    signals["summary"] = _summary(signals)
+    signals["confident"] = not (hedged or aggression_neg or chargeback_neg or repeat_neg)
+    return signals
@@ -0,0 +1,165 @@
+"""Stored agent-note signals: extracted once per change of a customer's notes.
+
+``customer_note_signals`` holds the last signals extracted for each customer
+with the customer's ``notes_version`` (bumped by a trigger on every booking
+write that changes ``collect_agent_notes`` output) and a hash of the notes
+they came from. Page views compare the stored version with the current one,
+two primary-key lookups, and only read the booking history to extract again
+(stored for next time) when the row is missing or out of date; /resolve
+schedules ``refresh_note_signals`` in the background when it writes new
+agent notes. Callers read the version before the notes, so a write in
+between leaves the stored row out of date rather than wrongly current.
+
+Rule-only results (LLM unreachable or failed) are stored too, so signals
+follow the notes while Groq is down. Such a row is only served to callers
+that cannot reach the LLM either (``accept_rules``); for everyone else it
+is a miss, so the LLM is retried once it is back.
+"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+
+from llm.client import get_async_llm_client
+from llm.note_extractor import collect_agent_notes, extract_note_signals_async
+from utils.db import execute, get_pool, query, query_one
+
+# (db_path, customer_id) -> True while a refresh runs, set again if another is requested meanwhile
+_refreshing: dict[tuple[str, str], bool] = {}
+
+
+def notes_hash(notes: list[dict]) -> str:
+    """Order-independent hash (routes collect notes in different booking orders)."""
+    canonical = sorted(json.dumps(note, sort_keys=True) for note in notes)
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+
+def notes_version(customer_id: str, conn: sqlite3.Connection | None = None) -> int:
+    """The customer's current notes_version (0 before any booking)."""
+    row = query_one(
+        "SELECT notes_version FROM customer_booking_aggregates WHERE customer_id = ?",
+        (customer_id,),
+        conn=conn,
+    )
+    return row["notes_version"] if row else 0
+
+
+def get_stored_signals(customer_id: str, conn: sqlite3.Connection | None = None) -> tuple[int | None, dict] | None:
+    """(notes_version, signals) last stored for the customer, or None."""
+    row = query_one(
+        "SELECT notes_version, signals FROM customer_note_signals WHERE customer_id = ?",
+        (customer_id,),
+        conn=conn,
+    )
+    return (row["notes_version"], json.loads(row["signals"])) if row else None
+
+
+def store_signals(customer_id: str, version: int, notes: list[dict], signals: dict,
+                  conn: sqlite3.Connection | None = None) -> None:
+    """Store ``signals`` extracted from ``notes``, read at notes_version ``version``."""
+    execute(
+        """
+        INSERT INTO customer_note_signals (customer_id, notes_hash, signals, computed_at, notes_version)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(customer_id) DO UPDATE SET
+            notes_hash = excluded.notes_hash,
+            signals = excluded.signals,
+            computed_at = excluded.computed_at,
+            notes_version = excluded.notes_version
+        """,
+        (customer_id, notes_hash(notes), json.dumps(signals), datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+         version),
+        conn=conn,
+    )
+
+
+def delete_signals(customer_id: str, conn: sqlite3.Connection | None = None) -> None:
+    execute("DELETE FROM customer_note_signals WHERE customer_id = ?", (customer_id,), conn=conn)
+
+
+def needs_llm(signals: dict) -> bool:
+    """Whether ``signals`` came from the keyword rules alone."""
+    return signals.get("source") == "rules"
+
+
+def stored_signals(customer_id: str, version: int, conn: sqlite3.Connection | None = None,
+                   accept_rules: bool = False) -> dict | None:
+    """Stored signals if they were computed at notes_version ``version``, else None.
+
+    Rule-only signals count only with ``accept_rules`` (the caller has no LLM).
+    """
+    stored = get_stored_signals(customer_id, conn=conn)
+    if stored is None or stored[0] != version:
+        return None
+    if needs_llm(stored[1]) and not accept_rules:
+        return None
+    return stored[1]
+
+
+async def extract_and_store(groq_client, customer_id: str, version: int, notes: list[dict],
+                            conn: sqlite3.Connection | None = None) -> dict | None:
+    """Live extraction for a cache miss; the result is stored for the next reader."""
+    signals = await extract_note_signals_async(groq_client, notes)
+    if signals is not None:
+        await run_in_threadpool(store_signals, customer_id, version, notes, signals, conn)
+    return signals
+
+
+def customer_notes(customer_id: str, conn: sqlite3.Connection | None = None) -> list[dict]:
+    """The customer's agent notes, newest booking first. Reads their whole booking history."""
+    rows = query(
+        "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date DESC",
+        (customer_id,),
+        conn=conn,
+    )
+    return collect_agent_notes([dict(row) for row in rows])
+
+
+def _pending_notes(customer_id: str, db_path: str, accept_rules: bool) -> tuple[int, list[dict]] | None:
+    """(version, notes) if the stored signals are out of date; drops the row when no notes are left."""
+    with get_pool(db_path).connection() as conn:
+        version = notes_version(customer_id, conn)
+        if stored_signals(customer_id, version, conn, accept_rules) is not None:
+            return None
+        notes = customer_notes(customer_id, conn)
+        if notes:
+            return version, notes
+        if get_stored_signals(customer_id, conn=conn) is not None:
+            delete_signals(customer_id, conn=conn)
+    return None
+
+
+def _store(customer_id: str, version: int, notes: list[dict], signals: dict, db_path: str) -> None:
+    with get_pool(db_path).connection() as conn:
+        store_signals(customer_id, version, notes, signals, conn=conn)
+
+
+async def refresh_note_signals(customer_id: str, db_path: str) -> None:
+    """
+    Background job: re-extract the customer's note signals if their notes changed.
+
+    Without an LLM client the rule-based signals are stored. Runs at most
+    once at a time per customer; a request made while one is running
+    triggers one more pass afterwards so the latest notes win.
+    """
+    groq_client = get_async_llm_client()
+    key = (db_path, customer_id)
+    if key in _refreshing:
+        _refreshing[key] = True
+        return
+    _refreshing[key] = True
+    try:
+        while _refreshing[key]:
+            _refreshing[key] = False
+            pending = await run_in_threadpool(_pending_notes, customer_id, db_path, groq_client is None)
+            if pending is None:
+                continue
+            version, notes = pending
+            signals = await extract_note_signals_async(groq_client, notes)
+            if signals is not None:
+                await run_in_threadpool(_store, customer_id, version, notes, signals, db_path)
+    finally:
+        del _refreshing[key]
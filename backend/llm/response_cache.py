@@ -0,0 +1,223 @@
+"""Content-addressed cache of LLM replies, in memory and on disk.
+
+The response-script, guidance, evidence-summary and parse-concern prompts are
+fully determined by their inputs, so a reply is stored under a hash of
+(endpoint URL, model, temperature, max_tokens, prompt) and identical prompts
+are answered without a network call. ``llm.client.complete_async`` and
+``stream_async`` consult it when called with ``cache=<endpoint name>``.
+
+Two tiers: an LRU in process memory (bounded by entries and bytes), then a
+SQLite file (``RAD_LLM_CACHE_PATH``, default ``data/llm_cache.db``) shared by
+workers and restarts, bounded by bytes with least-recently-used rows evicted
+first. It is a separate file from the application database, so cache writes
+never queue behind booking writes and reseeding keeps the cache. Entries
+expire after their endpoint's TTL (``LLM_CACHE_TTLS``, overridable with
+``RAD_LLM_CACHE_TTL_<ENDPOINT>``). Set ``RAD_LLM_CACHE=0`` to turn it off.
+
+``stats()`` (part of every /api/metrics response) does not query the file:
+the SQLite tier's size is counted once when it is opened and then tracked
+from this process's writes, so with several workers it is an estimate.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.cache import TTLCache
+
+LLM_CACHE_ENABLED = os.environ.get("RAD_LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.environ.get("RAD_LLM_CACHE_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "llm_cache.db"
+)
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("RAD_LLM_CACHE_MEMORY_ENTRIES", "4096"))
+LLM_CACHE_MEMORY_BYTES = int(os.environ.get("RAD_LLM_CACHE_MEMORY_BYTES", str(8 * 1024 * 1024)))
+LLM_CACHE_DISK_BYTES = int(os.environ.get("RAD_LLM_CACHE_DISK_BYTES", str(64 * 1024 * 1024)))
+
+# Seconds a reply stays valid, per endpoint. Scripts and guidance depend only
+# on the assessment and policy text; the case brief embeds a live profile.
+LLM_CACHE_TTLS = {
+    "response_script": 7 * 24 * 3600,
+    "guidance": 24 * 3600,
+    "evidence_summary": 3600,
+    "parse_concern": 24 * 3600,
+    "paraphrase_context": 24 * 3600,
+}
+DEFAULT_TTL_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used_at);
+"""
+
+
+def ttl_for(endpoint: str) -> float:
+    override = os.environ.get(f"RAD_LLM_CACHE_TTL_{endpoint.upper()}")
+    return float(override) if override else LLM_CACHE_TTLS.get(endpoint, DEFAULT_TTL_SECONDS)
+
+
+def cache_key(base_url: str, model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+    payload = json.dumps([base_url, model, temperature, max_tokens, prompt])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _utf8_size(value: str) -> int:
+    return len(value.encode())
+
+
+class ResponseCache:
+    """Memory LRU in front of a byte-bounded SQLite table; thread-safe."""
+
+    def __init__(self, path: str, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 memory_bytes: int = LLM_CACHE_MEMORY_BYTES, disk_bytes: int = LLM_CACHE_DISK_BYTES):
+        self.path = path
+        self.disk_bytes = disk_bytes
+        self.memory = TTLCache(memory_entries, DEFAULT_TTL_SECONDS, maxbytes=memory_bytes, sizeof=_utf8_size)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, dict[str, int]] = {}
+        self._disk_entries = 0
+        self._disk_size = 0
+
+    def _count(self, endpoint: str, counter: str) -> None:
+        counters = self._endpoints.setdefault(endpoint, dict.fromkeys(("memory_hits", "disk_hits", "misses"), 0))
+        counters[counter] += 1
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._disk_entries, self._disk_size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses"
+            ).fetchone()
+            self._conn = conn
+        return self._conn
+
+    def _forget(self, removed: list[tuple[int]]) -> None:
+        """Take rows deleted with ``RETURNING size_bytes`` off the disk-tier counters."""
+        self._disk_entries -= len(removed)
+        self._disk_size -= sum(size for size, in removed)
+
+    def get_memory(self, endpoint: str, key: str) -> str | None:
+        """Memory tier only (cheap enough to call on the event loop)."""
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self._count(endpoint, "memory_hits")
+        return value
+
+    def get_disk(self, endpoint: str, key: str) -> str | None:
+        """SQLite tier; a hit is promoted into memory for the rest of its TTL."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT response, expires_at FROM llm_responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self._count(endpoint, "misses")
+                return None
+            db.execute("UPDATE llm_responses SET last_used_at = ? WHERE key = ?", (now, key))
+            self._count(endpoint, "disk_hits")
+        response, expires_at = row
+        self.memory.set(key, response, ttl=expires_at - now)
+        return response
+
+    def get(self, endpoint: str, key: str) -> str | None:
+        value = self.get_memory(endpoint, key)
+        return value if value is not None else self.get_disk(endpoint, key)
+
+    def set(self, endpoint: str, key: str, response: str) -> None:
+        ttl = ttl_for(endpoint)
+        now = time.time()
+        self.memory.set(key, response, ttl=ttl)
+        size = _utf8_size(response)
+        with self._lock:
+            db = self._db()
+            # The row being replaced and expired rows
+            self._forget(db.execute(
+                "DELETE FROM llm_responses WHERE key = ? OR expires_at <= ? RETURNING size_bytes", (key, now)
+            ).fetchall())
+            db.execute(
+                """
+                INSERT OR REPLACE INTO llm_responses (key, endpoint, response, size_bytes, expires_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, endpoint, response, size, now + ttl, now),
+            )
+            self._disk_entries += 1
+            self._disk_size += size
+            # Keep the most recently used rows that fit in disk_bytes.
+            self._forget(db.execute(
+                """
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size_bytes) OVER (ORDER BY last_used_at DESC, key) AS running
+                        FROM llm_responses
+                    ) WHERE running > ?
+                )
+                RETURNING size_bytes
+                """,
+                (self.disk_bytes,),
+            ).fetchall())
+
+    def clear(self) -> None:
+        self.memory.clear()
+        with self._lock:
+            self._db().execute("DELETE FROM llm_responses")
+            self._endpoints.clear()
+            self._disk_entries = self._disk_size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._db()  # counts the SQLite tier the first time
+            entries, size = self._disk_entries, self._disk_size
+            endpoints = {}
+            for endpoint, counters in sorted(self._endpoints.items()):
+                hits = counters["memory_hits"] + counters["disk_hits"]
+                lookups = hits + counters["misses"]
+                endpoints[endpoint] = {
+                    **counters,
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                    "ttl_seconds": ttl_for(endpoint),
+                }
+        hits = sum(c["memory_hits"] + c["disk_hits"] for c in endpoints.values())
+        lookups = hits + sum(c["misses"] for c in endpoints.values())
+        return {
+            "enabled": True,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": {"entries": entries, "bytes": size, "maxbytes": self.disk_bytes},
+            "endpoints": endpoints,
+        }
+
+
+LLM_RESPONSE_CACHE: ResponseCache | None = ResponseCache(LLM_CACHE_PATH) if LLM_CACHE_ENABLED else None
+
+
+def close_response_cache() -> None:
+    if LLM_RESPONSE_CACHE is not None:
+        LLM_RESPONSE_CACHE.close()
+
+
+def response_cache_stats() -> dict:
+    if LLM_RESPONSE_CACHE is None:
+        return {"enabled": False}
+    return LLM_RESPONSE_CACHE.stats()
@@ -1,21 +1,17 @@
 """L1 response script generation using Groq API (llama-3.1-8b-instant)."""
 
-import json
+from collections.abc import AsyncIterator
 
+from llm.client import complete_async, stream_async
 
-def generate_response_script(groq_client, classification: str, recommended_action: str,
-                             evidence_summary: dict, policy_snippet: str,
-                             customer_message: str) -> str | None:
-    """
-    Generate a 2-4 sentence agent response script grounded in evidence and policy.
-    Returns None if LLM is unavailable.
-    """
-    if groq_client is None:
-        return None
+MODEL = "llama-3.1-8b-instant"
 
+
+def _prompt(classification: str, recommended_action: str, evidence_summary: dict,
+            policy_snippet: str, customer_message: str) -> str:
     key_evidence = _format_evidence(evidence_summary)
 
-    prompt = f"""You are a customer service response assistant for Headout, an experiences marketplace. 
+    return f"""You are a customer service response assistant for Headout, an experiences marketplace. 
 Generate a brief, professional response script that an L1 support agent can use when speaking with a customer about their refund request.
 
 The response must:
@@ -35,18 +31,32 @@ Context:
 
 Generate ONLY the response script. No preamble, no explanation."""
 
+
+async def generate_response_script_async(groq_client, classification: str, recommended_action: str,
+                                         evidence_summary: dict, policy_snippet: str,
+                                         customer_message: str) -> str | None:
+    """
+    Generate a 2-4 sentence agent response script grounded in evidence and policy.
+    ``groq_client`` is the async client (llm.client.get_async_llm_client).
+    Returns None if LLM is unavailable.
+    """
+    if groq_client is None:
+        return None
+    prompt = _prompt(classification, recommended_action, evidence_summary, policy_snippet, customer_message)
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=300,
-        )
-        return response.choices[0].message.content.strip()
+        return await complete_async(groq_client, MODEL, prompt, temperature=0.7, max_tokens=300,
+                                    cache="response_script")
     except Exception:
         return None
 
 
+def stream_response_script(groq_client, classification: str, recommended_action: str, evidence_summary: dict,
+                           policy_snippet: str, customer_message: str) -> AsyncIterator[str]:
+    """``generate_response_script_async`` streamed token by token; errors propagate to the consumer."""
+    prompt = _prompt(classification, recommended_action, evidence_summary, policy_snippet, customer_message)
+    return stream_async(groq_client, MODEL, prompt, temperature=0.7, max_tokens=300, cache="response_script")
+
+
 def _format_evidence(evidence_summary: dict) -> str:
     parts = []
     l3 = evidence_summary.get("layer3", {})
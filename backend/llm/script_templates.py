@@ -0,0 +1,61 @@
+"""Templated L1 response scripts for the deterministic classifications.
+
+``auto_approved`` and ``vendor_anomaly`` are decided by fixed rules and carry
+everything a script needs in ``evidence_summary`` (refund amount and rate, or
+the affected experience and date), so their scripts are filled in from
+templates instead of generated. The wording follows the "Approving a refund"
+examples in data/policies/agent_response_guidelines.md. The scored risk tiers
+still go to the LLM (llm/response_generator.py).
+
+Templates are keyed by (classification, refund_reason); reason ``None`` is
+the classification's default.
+"""
+
+from string import Template
+
+TEMPLATES = {
+    ("auto_approved", None): Template(
+        "Thanks for reaching out. I've processed a $refund_kind of $amount for your booking, in line with "
+        "our cancellation policy. It should appear on your original payment method within 3–5 business days."
+    ),
+    ("auto_approved", "cancellation"): Template(
+        "Thanks for letting us know about the cancellation. Since it was made within the cancellation window, "
+        "I've processed a $refund_kind of $amount for your booking. It should appear on your original payment "
+        "method within 3–5 business days."
+    ),
+    ("vendor_anomaly", None): Template(
+        "I'm sorry the $experience on $date didn't go as expected. We've had similar reports about this "
+        "session and are following up with the operator, so I've approved your refund. You'll receive a "
+        "confirmation email shortly."
+    ),
+    ("vendor_anomaly", "no_show"): Template(
+        "I'm sorry the $experience on $date didn't run as it should have. We've had similar reports from other "
+        "guests and are following up with the operator, so I've approved your refund. You'll receive a "
+        "confirmation email shortly."
+    ),
+}
+
+TEMPLATED_CLASSIFICATIONS = frozenset(classification for classification, _ in TEMPLATES)
+
+
+def _fields(classification: str, evidence_summary: dict) -> dict:
+    if classification == "auto_approved":
+        details = evidence_summary["auto_approve"]
+        rate = details["refund_rate"] or 1.0
+        return {
+            "amount": f"${details['refund_amount']:.2f}",
+            "refund_kind": "full refund" if rate >= 1 else f"{int(rate * 100)}% refund",
+        }
+    anomaly = evidence_summary["anomaly"]
+    return {"experience": anomaly["experience_name"], "date": anomaly["date"][:10]}
+
+
+def render_script(classification: str, refund_reason: str | None, evidence_summary: dict) -> str | None:
+    """Script for a templated classification, or None (not templated, or evidence missing)."""
+    template = TEMPLATES.get((classification, refund_reason)) or TEMPLATES.get((classification, None))
+    if template is None:
+        return None
+    try:
+        return template.substitute(_fields(classification, evidence_summary))
+    except (KeyError, TypeError):
+        return None
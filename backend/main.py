@@ -1,13 +1,24 @@
+import asyncio
+import contextlib
+import logging
 import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 from data.generate_seed_data import create_database
+from engine.decision_metrics import METRICS_COMPACT_INTERVAL_SECONDS, compact_rollups
 from engine.profile_manager import ensure_decision_log_table
+from llm.client import close_llm_clients, get_async_llm_client
+from llm.response_cache import close_response_cache
+from utils.db import close_pools
+from utils.perf import PERF_ENABLED, PerfMiddleware
+from utils.schema import ensure_schema
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "rad_seed_data.db")
+logger = logging.getLogger(__name__)
 API_DESCRIPTION = """Refund Abuse Detection System — Backend API
 
 ### API Legend (LLM Usage)
@@ -17,12 +28,34 @@ API_DESCRIPTION = """Refund Abuse Detection System — Backend API
 """
 
 
+async def _compact_metrics_periodically():
+    """Fold old decision-metric rollups into coarser buckets (engine/decision_metrics.py)."""
+    while True:
+        await asyncio.sleep(METRICS_COMPACT_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(compact_rollups)
+        except Exception:
+            logger.exception("Decision metrics compaction failed; retrying next interval")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if not os.path.exists(DB_PATH):
         create_database(DB_PATH)
     ensure_decision_log_table(DB_PATH)
+    ensure_schema(DB_PATH)
+    get_async_llm_client()
+    compaction = (
+        asyncio.create_task(_compact_metrics_periodically()) if METRICS_COMPACT_INTERVAL_SECONDS > 0 else None
+    )
     yield
+    if compaction is not None:
+        compaction.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await compaction
+    await close_llm_clients()
+    close_response_cache()
+    close_pools()
 
 
 app = FastAPI(
@@ -32,6 +65,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+if PERF_ENABLED:
+    app.add_middleware(PerfMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
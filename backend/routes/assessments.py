@@ -1,22 +1,40 @@
-import os
+import asyncio
+import sqlite3
 
-from fastapi import APIRouter, HTTPException
-from openai import OpenAI
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 
-from engine.classifier import classify
 from engine.config import ANOMALY_MIN_COUNT
-from engine.layer0_anomaly import check_anomaly
-from engine.layer1_policy_gate import evaluate_policy
-from engine.layer2_risk_profile import compute_risk_score
-from engine.layer3_request_eval import evaluate_request
-from engine.profile_manager import get_profile, is_profile_stale, update_profile
-from llm.response_generator import generate_response_script
-from utils.db import get_db_connection
+from engine.context import (
+    AssessmentContext,
+    CustomerNotFound,
+    OrderCustomerMismatch,
+    OrderNotFound,
+    load_context,
+    load_contexts,
+    refresh_profile_if_stale,
+    run_layers,
+    run_layers_batch,
+)
+from llm.client import LLM_MAX_CONNECTIONS, get_async_llm_client, llm_available
+from llm.response_generator import MODEL as SCRIPT_MODEL
+from llm.response_generator import generate_response_script_async, stream_response_script
+from llm.script_templates import TEMPLATED_CLASSIFICATIONS, render_script
+from utils.db import get_db, with_connection
 from utils.policy_loader import get_relevant_policy
+from utils.sse import sse_event, sse_response
 
 router = APIRouter()
 
+BATCH_MAX_ITEMS = 5000
+
+_CONTEXT_ERRORS = {
+    OrderNotFound: (404, "Order not found"),
+    OrderCustomerMismatch: (400, "Order does not belong to this customer"),
+    CustomerNotFound: (404, "Customer not found"),
+}
+
 
 class AssessmentRequest(BaseModel):
     customer_id: str
@@ -24,18 +42,16 @@ class AssessmentRequest(BaseModel):
     refund_reason: str
 
 
+class BatchAssessmentRequest(BaseModel):
+    items: list[AssessmentRequest] = Field(..., max_length=BATCH_MAX_ITEMS)
+    include_response_script: bool = False
+
+
 class OrderValidation(BaseModel):
     customer_id: str
     booking_id: str
 
 
-def _get_groq_client():
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        return None
-    return OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
-
-
 def _build_key_factors(layer2_result: dict | None, layer3_result: dict | None) -> list[str]:
     factors: list[str] = []
     if layer2_result and not layer2_result.get("insufficient_data"):
@@ -56,134 +72,215 @@ def _build_key_factors(layer2_result: dict | None, layer3_result: dict | None) -
     return factors
 
 
+LLM_SCRIPT_CLASSIFICATIONS = ("low_risk", "medium_risk", "high_risk")
+
+
+async def _response_script(groq_client, booking_dict: dict, final_result: dict) -> str | None:
+    """Templated for deterministic outcomes (no LLM call), LLM-written for the scored risk tiers."""
+    if final_result["classification"] in TEMPLATED_CLASSIFICATIONS:
+        return render_script(
+            final_result["classification"], booking_dict.get("refund_reason"), final_result["evidence_summary"]
+        )
+    if final_result["classification"] not in LLM_SCRIPT_CLASSIFICATIONS:
+        return None
+    return await generate_response_script_async(groq_client, *_script_inputs(booking_dict, final_result))
+
+
+def _script_inputs(booking_dict: dict, final_result: dict) -> tuple:
+    policy_snippet = get_relevant_policy(
+        booking_dict.get("product_cancelable", ""),
+        booking_dict.get("refund_reason", ""),
+    )
+    return (
+        final_result["classification"],
+        final_result["recommended_action"],
+        final_result["evidence_summary"],
+        policy_snippet,
+        "",
+    )
+
+
+def _build_assessment_response(layers: dict, response_script: str | None, llm_available: bool) -> dict:
+    layer0, layer1, layer2, layer3 = layers["layer0"], layers["layer1"], layers["layer2"], layers["layer3"]
+    final_result = layers["final"]
+
+    score = None
+    if final_result["classification"] in ("low_risk", "medium_risk", "high_risk"):
+        score = layer3["final_score"] if layer3 else (layer2 or {}).get("risk_score")
+
+    layer2_breakdown = []
+    if layer2 and not layer2.get("insufficient_data"):
+        for signal in layer2.get("signal_breakdown", []):
+            layer2_breakdown.append(
+                {
+                    "signal": signal["name"],
+                    "raw_value": signal["raw_value"],
+                    "weight": signal["weight"],
+                    "score": signal["score"],
+                    "explanation": signal["explanation"],
+                }
+            )
+
+    return {
+        "classification": final_result["classification"],
+        "risk_score": score,
+        "recommended_action": final_result["recommended_action"],
+        "resolution_options": final_result["resolution_options"],
+        "response_script": response_script,
+        "llm_available": llm_available,
+        "layers": {
+            "layer0": {
+                "is_anomaly": layer0["is_anomaly"],
+                "refund_count_for_date": (
+                    layer0["anomaly_details"]["refund_count_for_date"] if layer0.get("anomaly_details") else 0
+                ),
+                "threshold": ANOMALY_MIN_COUNT,
+                "enrichment": layer0["enrichment"],
+            },
+            "layer1": layer1,
+            "layer2": {
+                "risk_score": layer2.get("risk_score") if layer2 else None,
+                "signal_breakdown": layer2_breakdown,
+            },
+            "layer3": {
+                "final_score": layer3.get("final_score") if layer3 else None,
+                "base_score": layer3.get("initial_score") if layer3 else None,
+                "modifiers_applied": layer3.get("modifiers_applied", []) if layer3 else [],
+                "request_flags": layer3.get("request_flags", []) if layer3 else [],
+                "mitigating_factors": layer3.get("mitigating_factors", []) if layer3 else [],
+            },
+        },
+        "evidence": {
+            "key_factors": _build_key_factors(layer2, layer3),
+            "mitigating": layer3.get("mitigating_factors", []) if layer3 else [],
+        },
+        "evidence_summary": final_result["evidence_summary"],
+    }
+
+
 @router.post("/validate-order")
-def validate_order(req: OrderValidation):
+def validate_order(req: OrderValidation, conn: sqlite3.Connection = Depends(get_db)):
     """Validate that an order exists and belongs to the specified customer."""
-    conn = get_db_connection()
+    booking = conn.execute(
+        "SELECT * FROM booking_refund_records WHERE booking_id = ?",
+        (req.booking_id,),
+    ).fetchone()
+    if not booking:
+        return {"valid": False, "error": "Order not found"}
+    if booking["customer_id"] != req.customer_id:
+        return {"valid": False, "error": "Order does not belong to this customer"}
+    return {
+        "valid": True,
+        "booking_summary": {
+            "experience_name": booking["experience_name"],
+            "date": booking["booking_date"],
+            "value": booking["experience_value"],
+            "status": booking["refund_status"] or "pending",
+        },
+    }
+
+
+def _assess(conn: sqlite3.Connection, req: AssessmentRequest) -> tuple[AssessmentContext, dict]:
     try:
-        booking = conn.execute(
-            "SELECT * FROM booking_refund_records WHERE booking_id = ?",
-            (req.booking_id,),
-        ).fetchone()
-        if not booking:
-            return {"valid": False, "error": "Order not found"}
-        if booking["customer_id"] != req.customer_id:
-            return {"valid": False, "error": "Order does not belong to this customer"}
-        return {
-            "valid": True,
-            "booking_summary": {
-                "experience_name": booking["experience_name"],
-                "date": booking["booking_date"],
-                "value": booking["experience_value"],
-                "status": booking["refund_status"] or "pending",
-            },
-        }
-    finally:
-        conn.close()
+        ctx = load_context(conn, req.customer_id, req.booking_id, refund_reason=req.refund_reason)
+    except (OrderNotFound, OrderCustomerMismatch, CustomerNotFound) as exc:
+        status_code, detail = _CONTEXT_ERRORS[type(exc)]
+        raise HTTPException(status_code=status_code, detail=detail)
+    refresh_profile_if_stale(ctx, conn)
+    return ctx, run_layers(ctx, conn)
 
 
-@router.post("/assess", summary="Run refund assessment - uses LLM for response script (with fallback)")
-def run_assessment(req: AssessmentRequest):
+@router.post("/assess", summary="Run refund assessment - uses LLM for risk-tier response scripts (with fallback)")
+async def run_assessment(req: AssessmentRequest):
     """Run the full 4-layer assessment on a specific order."""
-    conn = get_db_connection()
-    try:
-        booking = conn.execute(
-            "SELECT * FROM booking_refund_records WHERE booking_id = ?",
-            (req.booking_id,),
-        ).fetchone()
-        if not booking:
-            raise HTTPException(status_code=404, detail="Order not found")
-        if booking["customer_id"] != req.customer_id:
-            raise HTTPException(status_code=400, detail="Order does not belong to this customer")
-
-        profile = get_profile(req.customer_id)
-        if not profile:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        if is_profile_stale(profile):
-            update_profile(req.customer_id, risk_score=profile.get("risk_score"), disposition=profile.get("disposition"))
-            profile = get_profile(req.customer_id)
-
-        booking_dict = dict(booking)
-        booking_dict["refund_reason"] = req.refund_reason
-
-        layer0 = check_anomaly(booking_dict)
-        layer1 = evaluate_policy(booking_dict, layer0["enrichment"], profile)
-
-        layer2 = None
-        layer3 = None
-        if not layer0["is_anomaly"] and layer1["outcome"] not in ("auto_approve", "auto_flag_l2"):
-            layer2 = compute_risk_score(req.customer_id, profile)
-            layer3 = evaluate_request(booking_dict, layer0["enrichment"], layer2.get("risk_score"))
-
-        final_result = classify(layer0, layer1, layer2, layer3)
-
-        groq_client = _get_groq_client()
-        response_script = None
-        if final_result["classification"] in ("low_risk", "medium_risk", "high_risk", "auto_approved"):
-            policy_snippet = get_relevant_policy(
-                booking_dict.get("product_cancelable", ""),
-                booking_dict.get("refund_reason", ""),
-            )
-            response_script = generate_response_script(
-                groq_client,
-                final_result["classification"],
-                final_result["recommended_action"],
-                final_result["evidence_summary"],
-                policy_snippet,
-                "",
-            )
+    ctx, layers = await run_in_threadpool(with_connection, _assess, req)
+    groq_client = get_async_llm_client()
+    response_script = await _response_script(groq_client, ctx.booking, layers["final"])
+    return _build_assessment_response(layers, response_script, llm_available(groq_client, SCRIPT_MODEL))
 
-        score = None
-        if final_result["classification"] in ("low_risk", "medium_risk", "high_risk"):
-            score = layer3["final_score"] if layer3 else (layer2 or {}).get("risk_score")
-
-        layer2_breakdown = []
-        if layer2 and not layer2.get("insufficient_data"):
-            for signal in layer2.get("signal_breakdown", []):
-                layer2_breakdown.append(
-                    {
-                        "signal": signal["name"],
-                        "raw_value": signal["raw_value"],
-                        "weight": signal["weight"],
-                        "score": signal["score"],
-                        "explanation": signal["explanation"],
-                    }
-                )
-
-        return {
-            "classification": final_result["classification"],
-            "risk_score": score,
-            "recommended_action": final_result["recommended_action"],
-            "resolution_options": final_result["resolution_options"],
-            "response_script": response_script,
-            "llm_available": groq_client is not None,
-            "layers": {
-                "layer0": {
-                    "is_anomaly": layer0["is_anomaly"],
-                    "refund_count_for_date": (
-                        layer0["anomaly_details"]["refund_count_for_date"] if layer0.get("anomaly_details") else 0
-                    ),
-                    "threshold": ANOMALY_MIN_COUNT,
-                    "enrichment": layer0["enrichment"],
-                },
-                "layer1": layer1,
-                "layer2": {
-                    "risk_score": layer2.get("risk_score") if layer2 else None,
-                    "signal_breakdown": layer2_breakdown,
-                },
-                "layer3": {
-                    "final_score": layer3.get("final_score") if layer3 else None,
-                    "base_score": layer3.get("initial_score") if layer3 else None,
-                    "modifiers_applied": layer3.get("modifiers_applied", []) if layer3 else [],
-                    "request_flags": layer3.get("request_flags", []) if layer3 else [],
-                    "mitigating_factors": layer3.get("mitigating_factors", []) if layer3 else [],
-                },
-            },
-            "evidence": {
-                "key_factors": _build_key_factors(layer2, layer3),
-                "mitigating": layer3.get("mitigating_factors", []) if layer3 else [],
-            },
-            "evidence_summary": final_result["evidence_summary"],
-        }
-    finally:
-        conn.close()
+
+@router.post("/assess/stream", summary="Run refund assessment, then stream the response script over SSE - uses LLM")
+async def stream_assessment(req: AssessmentRequest):
+    """
+    /assess as Server-Sent Events, for agents on a live call.
+
+    ``assessment`` (the /assess response) is sent as soon as the engine is
+    done, with ``response_script`` null while an LLM script is pending; then
+    one ``token`` event per chunk of generated text ({"text": ...}); then
+    ``done`` with the complete script (null if the LLM was unavailable or
+    failed). Templated scripts arrive in ``assessment`` and ``done`` directly.
+    """
+    ctx, layers = await run_in_threadpool(with_connection, _assess, req)
+    groq_client = get_async_llm_client()
+    final_result = layers["final"]
+    available = llm_available(groq_client, SCRIPT_MODEL)
+    streamed = available and final_result["classification"] in LLM_SCRIPT_CLASSIFICATIONS
+    response_script = None if streamed else await _response_script(None, ctx.booking, final_result)
+    assessment = _build_assessment_response(layers, response_script, available)
+
+    async def events():
+        yield sse_event("assessment", assessment)
+        script = response_script
+        if streamed:
+            parts = []
+            try:
+                async for text in stream_response_script(groq_client, *_script_inputs(ctx.booking, final_result)):
+                    parts.append(text)
+                    yield sse_event("token", {"text": text})
+                script = "".join(parts).rstrip() or None
+            except Exception:
+                script = None
+        yield sse_event("done", {"response_script": script})
+
+    return sse_response(events())
+
+
+def _assess_batch(conn: sqlite3.Connection,
+                  req: BatchAssessmentRequest) -> list[tuple[AssessmentContext, dict] | Exception]:
+    contexts = load_contexts(
+        conn, [(item.customer_id, item.booking_id, item.refund_reason) for item in req.items]
+    )
+    loaded = [ctx for ctx in contexts if isinstance(ctx, AssessmentContext)]
+    layers_by_ctx = dict(zip(map(id, loaded), run_layers_batch(loaded, conn)))
+    return [
+        (ctx, layers_by_ctx[id(ctx)]) if isinstance(ctx, AssessmentContext) else ctx
+        for ctx in contexts
+    ]
+
+
+@router.post("/assess/batch", summary="Run refund assessments for many orders at once (LLM scripts off by default)")
+async def run_batch_assessment(req: BatchAssessmentRequest):
+    """
+    Run the 4-layer assessment over a list of orders.
+
+    Results come back in request order. Each is either the /assess response or
+    an error entry with the status code and detail /assess would have returned.
+    Response scripts, when requested, are generated concurrently.
+    """
+    assessed = await run_in_threadpool(with_connection, _assess_batch, req)
+    groq_client = get_async_llm_client() if req.include_response_script else None
+
+    scripts: list[str | None] = [None] * len(assessed)
+    if req.include_response_script:
+        # Bounded by the client's connection pool so queued calls don't hit the pool timeout
+        limit = asyncio.Semaphore(LLM_MAX_CONNECTIONS)
+
+        async def script(entry) -> str | None:
+            if isinstance(entry, Exception):
+                return None
+            ctx, layers = entry
+            async with limit:
+                return await _response_script(groq_client, ctx.booking, layers["final"])
+
+        scripts = await asyncio.gather(*(script(entry) for entry in assessed))
+
+    available = llm_available(groq_client, SCRIPT_MODEL)
+    results = []
+    for item, entry, response_script in zip(req.items, assessed, scripts):
+        if isinstance(entry, Exception):
+            status_code, detail = _CONTEXT_ERRORS[type(entry)]
+            result = {"error": {"status_code": status_code, "detail": detail}}
+        else:
+            result = _build_assessment_response(entry[1], response_script, available)
+        results.append({"customer_id": item.customer_id, "booking_id": item.booking_id, **result})
+    return {"count": len(results), "results": results}
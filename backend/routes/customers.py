@@ -1,106 +1,112 @@
-import os
+import sqlite3
 
-from fastapi import APIRouter, HTTPException
-from openai import OpenAI
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
+from engine.aggregates import get_aggregates
 from engine.profile_manager import get_profile, is_profile_stale, update_profile
-from llm.note_extractor import collect_agent_notes, extract_note_signals
-from utils.db import get_db_connection
+from llm.client import get_async_llm_client, llm_available
+from llm.note_extractor import MODEL as NOTE_MODEL
+from llm.note_store import customer_notes, extract_and_store, notes_version, stored_signals
+from utils.db import get_db, with_connection
+from utils.schema import public_row
 
 router = APIRouter()
 
 
-def _get_groq_client():
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        return None
-    return OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
-
-
 @router.get("/customer/{customer_id}")
-def get_customer_profile(customer_id: str):
+def get_customer_profile(customer_id: str, conn: sqlite3.Connection = Depends(get_db)):
     """Return customer profile with risk summary."""
-    profile = get_profile(customer_id)
+    profile = get_profile(customer_id, conn=conn)
     if not profile:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    if is_profile_stale(profile):
-        update_profile(customer_id, risk_score=profile.get("risk_score"), disposition=profile.get("disposition"))
-        profile = get_profile(customer_id)
-    return profile
+    aggregates = get_aggregates(customer_id, conn=conn)
+    if is_profile_stale(profile, conn=conn, aggregates=aggregates):
+        update_profile(
+            customer_id,
+            risk_score=profile.get("risk_score"),
+            disposition=profile.get("disposition"),
+            conn=conn,
+            aggregates=aggregates,
+        )
+        profile = get_profile(customer_id, conn=conn)
+    return public_row(profile)
 
 
 @router.get("/customer/{customer_id}/bookings")
-def get_customer_bookings(customer_id: str):
+def get_customer_bookings(customer_id: str, conn: sqlite3.Connection = Depends(get_db)):
     """Return all booking records for a customer."""
-    conn = get_db_connection()
-    try:
-        customer = conn.execute(
-            "SELECT customer_id FROM customer_profiles WHERE customer_id = ?",
-            (customer_id,),
-        ).fetchone()
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer not found")
-
-        rows = conn.execute(
-            """
-            SELECT * FROM booking_refund_records
-            WHERE customer_id = ?
-            ORDER BY booking_date DESC
-            """,
-            (customer_id,),
-        ).fetchall()
-        return [dict(row) for row in rows]
-    finally:
-        conn.close()
+    customer = conn.execute(
+        "SELECT customer_id FROM customer_profiles WHERE customer_id = ?",
+        (customer_id,),
+    ).fetchone()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    rows = conn.execute(
+        """
+        SELECT * FROM booking_refund_records
+        WHERE customer_id = ?
+        ORDER BY booking_date DESC
+        """,
+        (customer_id,),
+    ).fetchall()
+    return [public_row(row) for row in rows]
+
+
+def _stored_signals_or_notes(conn: sqlite3.Connection, customer_id: str,
+                             accept_rules: bool) -> tuple[int, dict | None, list[dict]]:
+    """(notes_version, stored signals, notes); the notes are only read when nothing current is stored."""
+    customer = conn.execute(
+        "SELECT customer_id FROM customer_profiles WHERE customer_id = ?",
+        (customer_id,),
+    ).fetchone()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    version = notes_version(customer_id, conn)
+    stored = stored_signals(customer_id, version, conn, accept_rules)
+    return version, stored, customer_notes(customer_id, conn) if stored is None else []
 
 
 @router.get("/customer/{customer_id}/agent-notes", summary="Get agent note signals - uses LLM (with fallback)")
-def get_agent_note_signals(customer_id: str):
-    """Extract signals from past agent notes for this customer."""
-    conn = get_db_connection()
-    try:
-        customer = conn.execute(
-            "SELECT customer_id FROM customer_profiles WHERE customer_id = ?",
-            (customer_id,),
-        ).fetchone()
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer not found")
-
-        bookings = conn.execute(
-            "SELECT * FROM booking_refund_records WHERE customer_id = ?",
-            (customer_id,),
-        ).fetchall()
-        notes = collect_agent_notes([dict(row) for row in bookings])
-        if not notes:
-            return {"signals": {}, "available": False, "llm_available": False}
-
-        groq_client = _get_groq_client()
-        signals = extract_note_signals(groq_client, notes) if groq_client else None
-        return {
-            "signals": signals or {},
-            "available": signals is not None,
-            "llm_available": groq_client is not None,
-        }
-    finally:
-        conn.close()
+async def get_agent_note_signals(customer_id: str):
+    """
+    Signals from past agent notes for this customer.
+
+    Served from the note-signal store (llm/note_store.py) when the stored row
+    is at the customer's current notes_version; otherwise the notes are read
+    and extracted now (rule-based, plus the LLM if available) and stored.
+    """
+    groq_client = get_async_llm_client()
+    usable = llm_available(groq_client, NOTE_MODEL)
+    version, stored, notes = await run_in_threadpool(
+        with_connection, _stored_signals_or_notes, customer_id, not usable
+    )
+    if stored is not None:
+        return {"signals": stored, "available": True, "llm_available": usable}
+    if not notes:
+        return {"signals": {}, "available": False, "llm_available": False}
+
+    signals = await extract_and_store(groq_client, customer_id, version, notes)
+    return {
+        "signals": signals or {},
+        "available": signals is not None,
+        "llm_available": llm_available(groq_client, NOTE_MODEL),
+    }
 
 
 @router.get("/customer/{customer_id}/payment")
-def get_customer_payment(customer_id: str):
+def get_customer_payment(customer_id: str, conn: sqlite3.Connection = Depends(get_db)):
     """Return payment method details for a customer."""
-    conn = get_db_connection()
-    try:
-        row = conn.execute(
-            """
-            SELECT customer_id, payment_type, payment_last_four, payment_gateway
-            FROM customer_profiles
-            WHERE customer_id = ?
-            """,
-            (customer_id,),
-        ).fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        return dict(row)
-    finally:
-        conn.close()
+    row = conn.execute(
+        """
+        SELECT customer_id, payment_type, payment_last_four, payment_gateway
+        FROM customer_profiles
+        WHERE customer_id = ?
+        """,
+        (customer_id,),
+    ).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return dict(row)
@@ -1,12 +1,17 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 
-from llm.contextual_guidance import generate_guidance
+from llm.client import get_async_llm_client
+from llm.contextual_guidance import generate_guidance_async, stream_guidance
 from utils.policy_loader import get_escalation_policy
+from utils.sse import sse_event, sse_response
 
 router = APIRouter()
 
 
+FALLBACK_MESSAGE = "AI guidance unavailable. Refer to escalation criteria in the processing details."
+
+
 class GuidanceRequest(BaseModel):
     customer_id: str
     booking_id: str
@@ -18,10 +23,11 @@ class GuidanceRequest(BaseModel):
 
 
 @router.post("/guidance", summary="Get contextual guidance - uses LLM (with fallback)")
-def get_contextual_guidance(req: GuidanceRequest):
+async def get_contextual_guidance(req: GuidanceRequest):
     """Generate contextual guidance based on agent's situational update."""
     policy_snippets = get_escalation_policy()
-    result = generate_guidance(
+    result = await generate_guidance_async(
+        get_async_llm_client(),
         req.classification,
         req.risk_score,
         req.recommended_action,
@@ -34,7 +40,43 @@ def get_contextual_guidance(req: GuidanceRequest):
         return {
             "guidance": None,
             "llm_available": False,
-            "fallback": "AI guidance unavailable. Refer to escalation criteria in the processing details.",
+            "fallback": FALLBACK_MESSAGE,
         }
 
     return {"guidance": result.get("guidance"), "llm_available": True}
+
+
+@router.post("/guidance/stream", summary="Stream contextual guidance over SSE - uses LLM (with fallback)")
+async def stream_contextual_guidance(req: GuidanceRequest):
+    """
+    /guidance as Server-Sent Events: one ``token`` event per chunk of text
+    ({"text": ...}), then ``done`` with the /guidance response. If the LLM is
+    unavailable or fails mid-stream, ``done`` carries the fallback and any
+    tokens already sent should be discarded.
+    """
+    client = get_async_llm_client()
+    fallback = {"guidance": None, "llm_available": False, "fallback": FALLBACK_MESSAGE}
+
+    async def events():
+        if client is None:
+            yield sse_event("done", fallback)
+            return
+        parts = []
+        try:
+            async for text in stream_guidance(
+                client,
+                req.classification,
+                req.risk_score,
+                req.recommended_action,
+                req.evidence_summary,
+                req.agent_message,
+                get_escalation_policy(),
+            ):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception:
+            yield sse_event("done", fallback)
+            return
+        yield sse_event("done", {"guidance": "".join(parts).rstrip(), "llm_available": True})
+
+    return sse_response(events())
@@ -1,9 +1,18 @@
+import sqlite3
+from datetime import datetime, timezone
 from pathlib import Path
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 
 from engine import config
-from utils.db import get_db_connection
+from engine.assessment_cache import cache_stats
+from engine.decision_metrics import GRANULARITIES, timeseries, utcnow
+from llm.breaker import breaker_stats
+from llm.response_cache import response_cache_stats
+from utils import perf
+from utils.db import get_db
+from utils.schema import DECISION_METRIC_COLUMNS
 
 router = APIRouter()
 
@@ -22,71 +31,103 @@ def _pct(part: int, total: int) -> float:
 
 
 @router.get("/metrics")
-def get_system_metrics():
-    """Return aggregate metrics from the decision log."""
-    conn = get_db_connection()
-    try:
-        total = conn.execute("SELECT COUNT(*) AS cnt FROM decision_log").fetchone()["cnt"]
-        auto_approved = conn.execute(
-            "SELECT COUNT(*) AS cnt FROM decision_log WHERE classification = 'auto_approved'"
-        ).fetchone()["cnt"]
-        agent_reviewed = conn.execute(
-            "SELECT COUNT(*) AS cnt FROM decision_log WHERE classification IN ('low_risk', 'medium_risk')"
-        ).fetchone()["cnt"]
-        escalated = conn.execute(
-            "SELECT COUNT(*) AS cnt FROM decision_log WHERE escalated_to_l2 = 1"
-        ).fetchone()["cnt"]
-        overrides = conn.execute(
-            "SELECT COUNT(*) AS cnt FROM decision_log WHERE agent_decision != recommended_action"
-        ).fetchone()["cnt"]
-        avg_risk = conn.execute(
-            "SELECT AVG(risk_score) AS avg_score FROM decision_log WHERE risk_score IS NOT NULL"
-        ).fetchone()["avg_score"]
-        vendor_anomalies = conn.execute(
-            "SELECT COUNT(*) AS cnt FROM decision_log WHERE classification = 'vendor_anomaly'"
-        ).fetchone()["cnt"]
-
-        return {
-            "total_processed": total,
-            "auto_approved": auto_approved,
-            "auto_approved_pct": _pct(auto_approved, total),
-            "agent_reviewed": agent_reviewed,
-            "agent_reviewed_pct": _pct(agent_reviewed, total),
-            "escalated": escalated,
-            "escalated_pct": _pct(escalated, total),
-            "overrides": overrides,
-            "override_pct": _pct(overrides, total),
-            "avg_risk_score": round(avg_risk, 2) if avg_risk is not None else None,
-            "vendor_anomalies": vendor_anomalies,
-            "engine_config": get_engine_config(),
-        }
-    finally:
-        conn.close()
+def get_system_metrics(conn: sqlite3.Connection = Depends(get_db)):
+    """Return aggregate metrics from the decision log.
+
+    The counts are kept in ``decision_metrics`` by triggers on decision_log
+    (utils/schema.py), so this is one primary-key read however long the log is.
+    """
+    row = conn.execute("SELECT * FROM decision_metrics WHERE id = 0").fetchone()
+    counts = dict(row) if row else dict.fromkeys(DECISION_METRIC_COLUMNS, 0)
+    total = counts["total_processed"]
+    auto_approved = counts["auto_approved"]
+    agent_reviewed = counts["agent_reviewed"]
+    escalated = counts["escalated"]
+    overrides = counts["overrides"]
+    vendor_anomalies = counts["vendor_anomalies"]
+    avg_risk = counts["risk_score_sum"] / counts["risk_score_count"] if counts["risk_score_count"] else None
+
+    return {
+        "total_processed": total,
+        "auto_approved": auto_approved,
+        "auto_approved_pct": _pct(auto_approved, total),
+        "agent_reviewed": agent_reviewed,
+        "agent_reviewed_pct": _pct(agent_reviewed, total),
+        "escalated": escalated,
+        "escalated_pct": _pct(escalated, total),
+        "overrides": overrides,
+        "override_pct": _pct(overrides, total),
+        "avg_risk_score": round(avg_risk, 2) if avg_risk is not None else None,
+        "vendor_anomalies": vendor_anomalies,
+        "engine_config": get_engine_config(),
+        "assessment_cache": cache_stats(),
+        "llm_cache": response_cache_stats(),
+        "llm_breakers": breaker_stats(),
+    }
+
+
+@router.get("/metrics/timeseries")
+def get_metrics_timeseries(
+    start: datetime | None = Query(None, alias="from", description="Bucket start lower bound (UTC)"),
+    end: datetime | None = Query(None, alias="to", description="Bucket start upper bound, exclusive (UTC)"),
+    granularity: str = Query("hour", pattern=f"^({'|'.join(GRANULARITIES)})$"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Decision metrics per minute, hour, day or week, from the rollup table
+    (engine/decision_metrics.py); never reads decision_log. ``to`` defaults
+    to now and ``from`` to a span that suits the granularity. Timestamps
+    without an offset are taken as UTC.
+    """
+    end = _as_utc(end) if end else utcnow()
+    start = _as_utc(start) if start else end - GRANULARITIES[granularity][1]
+    if start >= end:
+        raise HTTPException(status_code=422, detail="'from' must be before 'to'")
+    return {
+        "granularity": granularity,
+        "from": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "to": end.strftime("%Y-%m-%d %H:%M:%S"),
+        "buckets": timeseries(start, end, granularity, conn=conn),
+    }
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/metrics/perf")
+def get_perf_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """
+    Latency histograms per endpoint, engine stage, DB statement and LLM call
+    (utils/perf.py), as JSON (microseconds) or, with ``?format=prometheus``,
+    in the Prometheus text exposition format (seconds).
+    """
+    if format == "prometheus":
+        return PlainTextResponse(perf.prometheus_text(), media_type="text/plain; version=0.0.4")
+    return perf.snapshot()
 
 
 @router.get("/orders")
-def get_all_orders():
+def get_all_orders(conn: sqlite3.Connection = Depends(get_db)):
     """Return all booking records for the free exploration feature."""
-    conn = get_db_connection()
-    try:
-        rows = conn.execute(
-            """
-            SELECT
-                b.booking_id,
-                b.customer_id,
-                cp.customer_name,
-                b.experience_name,
-                b.experience_value,
-                b.booking_date,
-                b.refund_status
-            FROM booking_refund_records b
-            JOIN customer_profiles cp ON b.customer_id = cp.customer_id
-            ORDER BY b.booking_date DESC
-            """
-        ).fetchall()
-        return [dict(row) for row in rows]
-    finally:
-        conn.close()
+    rows = conn.execute(
+        """
+        SELECT
+            b.booking_id,
+            b.customer_id,
+            cp.customer_name,
+            b.experience_name,
+            b.experience_value,
+            b.booking_date,
+            b.refund_status
+        FROM booking_refund_records b
+        JOIN customer_profiles cp ON b.customer_id = cp.customer_id
+        ORDER BY b.booking_date DESC
+        """
+    ).fetchall()
+    return [dict(row) for row in rows]
 
 
 @router.get("/config")
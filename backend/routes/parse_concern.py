@@ -1,14 +1,17 @@
 import json
-import os
+import sqlite3
 
 from fastapi import APIRouter
-from openai import OpenAI
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-from utils.db import get_db_connection
+from llm.client import complete_async, get_async_llm_client, strip_code_fences
+from utils.db import with_connection
 
 router = APIRouter()
 
+MODEL = "llama-3.1-8b-instant"
+
 
 class ParseConcernRequest(BaseModel):
     customer_id: str
@@ -19,13 +22,6 @@ class ParaphraseContextRequest(BaseModel):
     customer_message: str
 
 
-def _get_groq_client():
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        return None
-    return OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
-
-
 EXTRACTION_PROMPT = """You are a structured data extractor for a customer service system. Given the agent's free-text description of a customer's concern, extract exactly three fields:
 
 1. "order_id": The booking or order reference the agent mentions (patterns like BK_xxx_xx, CUST_xxx_Bxxx, or any alphanumeric booking/order ID). If no order ID is mentioned, set to null.
@@ -42,51 +38,44 @@ Customer said: {customer_message}
 Write ONLY the agent's note. No preamble."""
 
 
-def _validate_order(order_id: str, customer_id: str) -> dict:
-    conn = get_db_connection()
-    try:
-        booking = conn.execute(
-            "SELECT * FROM booking_refund_records WHERE booking_id = ?",
-            (order_id,),
-        ).fetchone()
-        if not booking:
-            return {"order_valid": False, "order_error": "Order not found", "booking_summary": None}
-        if booking["customer_id"] != customer_id:
-            return {"order_valid": False, "order_error": "Order does not belong to this customer", "booking_summary": None}
-        return {
-            "order_valid": True,
-            "order_error": None,
-            "booking_summary": {
-                "experience_name": booking["experience_name"],
-                "date": booking["booking_date"],
-                "value": booking["experience_value"],
-                "status": booking["refund_status"] or "pending",
-            },
-        }
-    finally:
-        conn.close()
+def _validate_order(conn: sqlite3.Connection, order_id: str, customer_id: str) -> dict:
+    booking = conn.execute(
+        "SELECT * FROM booking_refund_records WHERE booking_id = ?",
+        (order_id,),
+    ).fetchone()
+    if not booking:
+        return {"order_valid": False, "order_error": "Order not found", "booking_summary": None}
+    if booking["customer_id"] != customer_id:
+        return {"order_valid": False, "order_error": "Order does not belong to this customer", "booking_summary": None}
+    return {
+        "order_valid": True,
+        "order_error": None,
+        "booking_summary": {
+            "experience_name": booking["experience_name"],
+            "date": booking["booking_date"],
+            "value": booking["experience_value"],
+            "status": booking["refund_status"] or "pending",
+        },
+    }
 
 
 @router.post("/parse-concern", summary="Parse concern from agent input - uses LLM (with fallback)")
-def parse_concern(req: ParseConcernRequest):
+async def parse_concern(req: ParseConcernRequest):
     """Extract order ID, refund reason, and summary from agent free text via LLM."""
-    client = _get_groq_client()
+    client = get_async_llm_client()
     if not client:
         return {"parsed": False, "fallback": True}
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": EXTRACTION_PROMPT.format(agent_input=req.agent_input)}],
+        text = await complete_async(
+            client,
+            MODEL,
+            EXTRACTION_PROMPT.format(agent_input=req.agent_input),
             temperature=0.2,
             max_tokens=300,
+            cache="parse_concern",
         )
-        text = response.choices[0].message.content.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[-1]
-            if text.endswith("```"):
-                text = text[:-3]
-        extracted = json.loads(text)
+        extracted = json.loads(strip_code_fences(text))
     except Exception:
         return {"parsed": False, "fallback": True}
 
@@ -108,7 +97,7 @@ def parse_concern(req: ParseConcernRequest):
     }
 
     if order_id:
-        order_validation = _validate_order(order_id, req.customer_id)
+        order_validation = await run_in_threadpool(with_connection, _validate_order, order_id, req.customer_id)
         if refund_reason == "other" and not summary_text.strip():
             return {
                 "parsed": True,
@@ -129,24 +118,21 @@ def parse_concern(req: ParseConcernRequest):
 
 
 @router.post("/paraphrase-context", summary="Paraphrase customer context - uses LLM (with fallback)")
-def paraphrase_context(req: ParaphraseContextRequest):
+async def paraphrase_context(req: ParaphraseContextRequest):
     """Paraphrase customer message into a concise internal agent note."""
-    client = _get_groq_client()
+    client = get_async_llm_client()
     if not client:
         return {"paraphrased": None, "llm_available": False}
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": PARAPHRASE_PROMPT.format(customer_message=req.customer_message)}],
+        text = await complete_async(
+            client,
+            MODEL,
+            PARAPHRASE_PROMPT.format(customer_message=req.customer_message),
             temperature=0.2,
             max_tokens=180,
+            cache="paraphrase_context",
         )
-        text = response.choices[0].message.content.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[-1]
-            if text.endswith("```"):
-                text = text[:-3]
-        return {"paraphrased": text.strip()}
+        return {"paraphrased": strip_code_fences(text).strip()}
     except Exception:
         return {"paraphrased": None, "llm_available": False}
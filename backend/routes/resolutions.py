@@ -1,13 +1,16 @@
-import os
+import asyncio
+import sqlite3
 
-from fastapi import APIRouter, HTTPException
-from openai import OpenAI
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from engine.profile_manager import get_profile, log_interaction, update_profile
-from llm.evidence_summarizer import summarize_evidence
-from llm.note_extractor import collect_agent_notes, extract_note_signals
-from utils.db import get_db_connection
+from llm.client import get_async_llm_client
+from llm.escalation import escalation_narrative
+from llm.note_extractor import collect_agent_notes
+from llm.note_store import notes_version, refresh_note_signals, stored_signals
+from utils.db import execute, get_pool, with_connection
 
 router = APIRouter()
 
@@ -43,13 +46,6 @@ class ResolutionRequest(BaseModel):
     signal_breakdown: list[dict] | None = None
 
 
-def _get_groq_client():
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        return None
-    return OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
-
-
 def _is_override(classification: str, agent_decision: str) -> bool:
     allowed_decisions = _NON_OVERRIDE_DECISIONS.get((classification or "").strip().lower())
     if not allowed_decisions:
@@ -57,87 +53,119 @@ def _is_override(classification: str, agent_decision: str) -> bool:
     return (agent_decision or "").strip().lower() not in allowed_decisions
 
 
-@router.post("/resolve", summary="Resolve case - conditionally uses LLM for escalation narrative (with fallback)")
-def resolve_case(req: ResolutionRequest):
-    """Log the agent's decision and update the customer profile."""
-    conn = get_db_connection()
-    try:
-        customer = conn.execute(
-            "SELECT customer_id FROM customer_profiles WHERE customer_id = ?",
-            (req.customer_id,),
-        ).fetchone()
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer not found")
-
-        booking = conn.execute(
-            "SELECT * FROM booking_refund_records WHERE booking_id = ?",
-            (req.booking_id,),
-        ).fetchone()
-        if not booking:
-            raise HTTPException(status_code=404, detail="Order not found")
-        if booking["customer_id"] != req.customer_id:
-            raise HTTPException(status_code=400, detail="Order does not belong to this customer")
-
-        if _is_override(req.classification, req.agent_decision) and not req.override_reason:
-            raise HTTPException(status_code=400, detail="override_reason is required when overriding recommendation")
-
-        evidence_narrative = None
-        if req.escalate_to_l2:
-            groq_client = _get_groq_client()
-            if groq_client:
-                profile = get_profile(req.customer_id) or {}
-                all_bookings = conn.execute(
-                    "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date DESC",
-                    (req.customer_id,),
-                ).fetchall()
-                booking_rows = [dict(row) for row in all_bookings]
-                history_summary = (
-                    f"{len(booking_rows)} total bookings. "
-                    f"{sum(1 for b in booking_rows if b.get('refund_requested_at'))} with refund requests. "
-                    f"{sum(1 for b in booking_rows if b.get('refund_reason') == 'no_show')} no-show claims."
-                )
-                note_signals = extract_note_signals(groq_client, collect_agent_notes(booking_rows))
-                current_request = {
-                    "booking_id": booking["booking_id"],
-                    "experience": booking["experience_name"],
-                    "value": f"${booking['experience_value']:.2f}",
-                    "reason": booking["refund_reason"],
-                    "booking_date": booking["booking_date"],
-                    "product_type": booking["product_cancelable"],
-                    "supplier_type": booking["supplier_type"],
-                }
-                evidence_narrative = summarize_evidence(
-                    groq_client,
-                    profile,
-                    history_summary,
-                    req.risk_score,
-                    req.signal_breakdown or [],
-                    current_request,
-                    note_signals,
-                )
-
-        log_id = log_interaction(
-            customer_id=req.customer_id,
-            booking_id=req.booking_id,
-            classification=req.classification,
-            risk_score=req.risk_score,
-            recommended_action=req.recommended_action,
-            agent_decision=req.agent_decision,
-            override_reason=req.override_reason,
-            escalated_to_l2=req.escalate_to_l2,
-            evidence_narrative=evidence_narrative,
-            agent_concern=req.agent_concern if req.escalate_to_l2 else None,
-            customer_message=req.customer_message if req.escalate_to_l2 else None,
+def _validate_resolution(conn: sqlite3.Connection, req: ResolutionRequest) -> sqlite3.Row:
+    customer = conn.execute(
+        "SELECT customer_id FROM customer_profiles WHERE customer_id = ?",
+        (req.customer_id,),
+    ).fetchone()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    booking = conn.execute(
+        "SELECT * FROM booking_refund_records WHERE booking_id = ?",
+        (req.booking_id,),
+    ).fetchone()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if booking["customer_id"] != req.customer_id:
+        raise HTTPException(status_code=400, detail="Order does not belong to this customer")
+
+    if _is_override(req.classification, req.agent_decision) and not req.override_reason:
+        raise HTTPException(status_code=400, detail="override_reason is required when overriding recommendation")
+    return booking
+
+
+def _escalation_inputs(conn: sqlite3.Connection, customer_id: str) -> tuple[dict, str, list[dict], dict | None]:
+    """Profile, history summary line, agent notes and their stored signals for the escalation narrative."""
+    profile = get_profile(customer_id, conn=conn) or {}
+    version = notes_version(customer_id, conn)
+    all_bookings = conn.execute(
+        "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date DESC",
+        (customer_id,),
+    ).fetchall()
+    booking_rows = [dict(row) for row in all_bookings]
+    history_summary = (
+        f"{len(booking_rows)} total bookings. "
+        f"{sum(1 for b in booking_rows if b.get('refund_requested_at'))} with refund requests. "
+        f"{sum(1 for b in booking_rows if b.get('refund_reason') == 'no_show')} no-show claims."
+    )
+    notes = collect_agent_notes(booking_rows)
+    return profile, history_summary, notes, stored_signals(customer_id, version, conn) if notes else None
+
+
+def _apply_resolution_writes(conn: sqlite3.Connection, req: ResolutionRequest) -> None:
+    """Agent notes and profile update; independent of the escalation narrative."""
+    if req.agent_notes:
+        execute(
+            "UPDATE booking_refund_records SET agent_notes = ? WHERE booking_id = ?",
+            (req.agent_notes, req.booking_id),
+            conn=conn,
         )
+    update_profile(req.customer_id, risk_score=req.risk_score, conn=conn)
+
+
+def _log_resolution(conn: sqlite3.Connection, req: ResolutionRequest, evidence_narrative: str | None) -> int:
+    return log_interaction(
+        customer_id=req.customer_id,
+        booking_id=req.booking_id,
+        classification=req.classification,
+        risk_score=req.risk_score,
+        recommended_action=req.recommended_action,
+        agent_decision=req.agent_decision,
+        override_reason=req.override_reason,
+        escalated_to_l2=req.escalate_to_l2,
+        evidence_narrative=evidence_narrative,
+        agent_concern=req.agent_concern if req.escalate_to_l2 else None,
+        customer_message=req.customer_message if req.escalate_to_l2 else None,
+        conn=conn,
+    )
 
-        if req.agent_notes:
-            conn.execute(
-                "UPDATE booking_refund_records SET agent_notes = ? WHERE booking_id = ?",
-                (req.agent_notes, req.booking_id),
-            )
-            conn.commit()
 
-        update_profile(req.customer_id, risk_score=req.risk_score)
-        return {"logged": True, "log_id": log_id, "escalated": req.escalate_to_l2}
+@router.post("/resolve", summary="Resolve case - conditionally uses LLM for escalation narrative (with fallback)")
+async def resolve_case(req: ResolutionRequest, background_tasks: BackgroundTasks):
+    """
+    Log the agent's decision and update the customer profile.
+
+    For escalations the narrative is generated while the profile and notes
+    are written; only the decision log insert waits for it. New agent notes
+    re-extract the customer's stored note signals after the response is sent.
+    """
+    booking = await run_in_threadpool(with_connection, _validate_resolution, req)
+
+    narrative = None
+    groq_client = get_async_llm_client() if req.escalate_to_l2 else None
+    if groq_client:
+        # Read before the agent-notes write so the narrative sees the same history as before.
+        profile, history_summary, notes, signals = await run_in_threadpool(
+            with_connection, _escalation_inputs, req.customer_id
+        )
+        current_request = {
+            "booking_id": booking["booking_id"],
+            "experience": booking["experience_name"],
+            "value": f"${booking['experience_value']:.2f}",
+            "reason": booking["refund_reason"],
+            "booking_date": booking["booking_date"],
+            "product_type": booking["product_cancelable"],
+            "supplier_type": booking["supplier_type"],
+        }
+        narrative = asyncio.create_task(escalation_narrative(
+            groq_client,
+            notes,
+            profile,
+            history_summary,
+            req.risk_score,
+            req.signal_breakdown or [],
+            current_request,
+            signals=signals,
+        ))
+
+    try:
+        await run_in_threadpool(with_connection, _apply_resolution_writes, req)
+        evidence_narrative = await narrative if narrative else None
     finally:
-        conn.close()
+        if narrative and not narrative.done():
+            narrative.cancel()
+    log_id = await run_in_threadpool(with_connection, _log_resolution, req, evidence_narrative)
+    if req.agent_notes:
+        background_tasks.add_task(refresh_note_signals, req.customer_id, get_pool().db_path)
+    return {"logged": True, "log_id": log_id, "escalated": req.escalate_to_l2}
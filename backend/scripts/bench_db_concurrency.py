@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Read throughput of the RAD database while writes are happening, per storage profile.
+
+Builds a fresh seed database per profile in a temp directory, then runs reader
+threads (the Layer 2 booking-history query and the profile lookup) alongside
+writer threads (decision_log inserts + customer_profiles updates, the
+/api/resolve write pattern) for a fixed duration.
+
+Usage:
+    python scripts/bench_db_concurrency.py [--seconds 5] [--readers 8] [--writers 4]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.generate_seed_data import create_database
+from engine.profile_manager import ensure_decision_log_table
+from utils.db import STORAGE_PROFILES, ConnectionPool, SerializedWriter, _connect
+
+_READ_SQL = "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date"
+_PROFILE_SQL = "SELECT * FROM customer_profiles WHERE customer_id = ?"
+_LOG_SQL = """
+    INSERT INTO decision_log
+    (customer_id, booking_id, classification, risk_score, recommended_action, agent_decision)
+    VALUES (?, ?, 'medium_risk', 42, 'Review recommended.', 'approve_full_refund')
+"""
+_PROFILE_UPDATE_SQL = "UPDATE customer_profiles SET risk_score = ? WHERE customer_id = ?"
+
+
+def _customers(db_path: str) -> list[str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return [r[0] for r in conn.execute("SELECT customer_id FROM customer_profiles")]
+    finally:
+        conn.close()
+
+
+def run_profile(profile: str, seconds: float, readers: int, writers: int) -> dict:
+    tmp = tempfile.mkdtemp(prefix=f"rad_bench_{profile}_")
+    db_path = os.path.join(tmp, "rad.db")
+    create_database(db_path)
+    ensure_decision_log_table(db_path)
+    customers = _customers(db_path)
+
+    pool = ConnectionPool(db_path, size=readers + writers, profile=profile)
+    writer = SerializedWriter(db_path, profile=profile) if STORAGE_PROFILES[profile]["serialized_writes"] else None
+    stop = threading.Event()
+    lock = threading.Lock()
+    read_latencies: list[float] = []
+    stats = {"reads": 0, "writes": 0, "locked_errors": 0}
+
+    def reader():
+        local: list[float] = []
+        rng = random.Random()
+        with pool.connection() as conn:
+            while not stop.is_set():
+                cid = rng.choice(customers)
+                t0 = time.perf_counter()
+                try:
+                    conn.execute(_PROFILE_SQL, (cid,)).fetchone()
+                    conn.execute(_READ_SQL, (cid,)).fetchall()
+                except sqlite3.OperationalError:
+                    with lock:
+                        stats["locked_errors"] += 1
+                    continue
+                local.append(time.perf_counter() - t0)
+        with lock:
+            stats["reads"] += len(local)
+            read_latencies.extend(local)
+
+    def write_job(cid: str, bid: str, score: int):
+        def job(conn: sqlite3.Connection):
+            conn.execute(_LOG_SQL, (cid, bid))
+            conn.execute(_PROFILE_UPDATE_SQL, (score, cid))
+        return job
+
+    def direct_writer():
+        rng = random.Random()
+        conn = _connect(db_path, profile=profile)
+        done = 0
+        try:
+            while not stop.is_set():
+                cid = rng.choice(customers)
+                try:
+                    write_job(cid, f"{cid}_BENCH", rng.randint(0, 100))(conn)
+                    conn.commit()
+                    done += 1
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    with lock:
+                        stats["locked_errors"] += 1
+        finally:
+            conn.close()
+        with lock:
+            stats["writes"] += done
+
+    def queued_writer():
+        rng = random.Random()
+        done = 0
+        while not stop.is_set():
+            cid = rng.choice(customers)
+            try:
+                writer.run(write_job(cid, f"{cid}_BENCH", rng.randint(0, 100)))
+                done += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    stats["locked_errors"] += 1
+        with lock:
+            stats["writes"] += done
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=queued_writer if writer else direct_writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    if writer:
+        writer.close()
+    pool.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    read_latencies.sort()
+    p99 = read_latencies[int(len(read_latencies) * 0.99) - 1] if read_latencies else 0.0
+    return {
+        "profile": profile,
+        "reads_per_s": stats["reads"] / seconds,
+        "writes_per_s": stats["writes"] / seconds,
+        "read_p50_ms": statistics.median(read_latencies) * 1000 if read_latencies else 0.0,
+        "read_p99_ms": p99 * 1000,
+        "locked_errors": stats["locked_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"DB concurrency benchmark — {args.readers} readers, {args.writers} writers, {args.seconds}s per profile\n")
+    print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'locked':>8}")
+    for profile in args.profiles:
+        r = run_profile(profile, args.seconds, args.readers, args.writers)
+        print(
+            f"{r['profile']:<10} {r['reads_per_s']:>10.0f} {r['writes_per_s']:>10.0f} "
+            f"{r['read_p50_ms']:>8.2f} {r['read_p99_ms']:>8.2f} {r['locked_errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
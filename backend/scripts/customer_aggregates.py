@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Check or rebuild the trigger-maintained customer_booking_aggregates table.
+
+    python scripts/customer_aggregates.py check [--db PATH] [--customer CUST_001 ...]
+    python scripts/customer_aggregates.py rebuild [--db PATH]
+
+``check`` recomputes every customer's aggregates from booking history and
+exits non-zero on any difference. ``rebuild`` drops and backfills the table
+and its triggers (required after changing NOW or the recency thresholds).
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.aggregates import check_aggregates, rebuild_aggregates
+from utils.db import DB_PATH, get_connection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--customer", nargs="+", help="check only these customers")
+    args = parser.parse_args()
+
+    conn = get_connection(args.db)
+    try:
+        if args.command == "rebuild":
+            count = rebuild_aggregates(conn)
+            conn.commit()
+            print(f"Rebuilt aggregates for {count} customers")
+            return
+
+        mismatches = check_aggregates(conn, args.customer)
+        for m in mismatches:
+            print(f"  [FAIL] {m['customer_id']}.{m['field']}: stored={m['stored']!r} expected={m['expected']!r}")
+        if mismatches:
+            print(f"\n{len(mismatches)} mismatched field(s); run 'rebuild' to repair")
+            sys.exit(1)
+        print("Aggregates consistent with booking history")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
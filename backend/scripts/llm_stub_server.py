@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Local OpenAI-compatible stand-in for Groq, for offline runs and load tests.
+
+Serves ``POST /v1/chat/completions`` (plain and ``stream=True`` SSE) and
+``GET /v1/models`` with canned replies shaped like what each ``llm/*`` prompt
+expects: note-signal JSON, concern-parsing JSON (order ID and reason read
+from the agent's text), and plain text for scripts, guidance, summaries and
+case briefs. Latency, streaming token rate and error rate are configurable,
+so /api/assess, /api/resolve and /api/guidance can be measured end to end
+under realistic LLM behaviour with no network.
+
+Point the API at it with the usual client settings, e.g.:
+
+    python scripts/llm_stub_server.py --port 8001 --latency lognormal --latency-ms 400 \\
+        --model-latency llama-3.3-70b-versatile=1500 --tokens-per-second 250 --error-rate 0.01
+    GROQ_API_KEY=stub RAD_LLM_BASE_URL=http://127.0.0.1:8001/v1 RAD_LLM_CACHE=0 uvicorn main:app
+
+(``RAD_LLM_CACHE=0`` so repeated prompts reach the stub instead of the response cache.)
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+_ORDER_ID_RE = re.compile(r"\b(?:CUST_\d+_B\d+|BK_\w+)\b", re.IGNORECASE)
+_REASON_KEYWORDS = (
+    ("no_show", ("no-show", "no show", "didn't show", "did not show", "never showed")),
+    ("partial_service", ("partial", "cut short", "part of")),
+    ("technical_issue", ("app", "ticket", "qr", "error", "crash")),
+    ("cancellation", ("cancel",)),
+)
+
+
+def _reason(text: str) -> str:
+    lowered = text.lower()
+    for reason, words in _REASON_KEYWORDS:
+        if any(word in lowered for word in words):
+            return reason
+    return "other"
+
+
+def canned_reply(prompt: str) -> str:
+    """Reply in the shape the prompt asks for (keyed on phrases from the llm/* and route prompts)."""
+    if "extract structured signals" in prompt:
+        notes = prompt.split("Agent notes:", 1)[-1].split("Respond ONLY", 1)[0].lower()
+        return json.dumps({
+            "aggression_detected": "aggressive" in notes,
+            "chargeback_threat": "chargeback" in notes,
+            "repeated_claim_pattern": "again" in notes,
+            "notable_quotes": [],
+            "summary": "Notes describe a customer with prior refund requests.",
+        })
+    if "structured data extractor" in prompt:
+        agent_input = prompt.rsplit("Agent's input:", 1)[-1].strip()
+        match = _ORDER_ID_RE.search(agent_input)
+        return json.dumps({
+            "order_id": match.group(0).upper() if match else None,
+            "refund_reason": _reason(agent_input),
+            "summary": "Customer is requesting a refund for their booking.",
+        })
+    if "Respond with ONLY the summary" in prompt:
+        return "Notes show a consistent pattern across the customer's recent bookings."
+    if "internal note" in prompt:
+        return "Customer told me their experience did not go as planned and asked for a refund."
+    if "case brief" in prompt:
+        return (
+            "The customer has a mixed refund history with several recent requests. The current claim is "
+            "partly supported by booking records. Prior agent notes mention friction but no confirmed abuse. "
+            "Review the evidence and decide whether a partial refund or coupon is appropriate."
+        )
+    if "guidance" in prompt:
+        return (
+            "Per the escalation criteria, this can stay at L1 if the customer accepts the offered resolution. "
+            "If they threaten a chargeback again, escalate to the floor manager with the evidence attached."
+        )
+    return (
+        "Thanks for your patience while I looked into this. I can see the details of your booking and "
+        "I'd like to make sure we resolve this fairly for you."
+    )
+
+
+class StubConfig:
+    """Latency, token-rate and error settings; ``sample_latency`` is thread-safe."""
+
+    def __init__(self, latency: str = "fixed", latency_ms: float = 0.0, jitter: float = 0.5,
+                 model_latency_ms: dict[str, float] | None = None, tokens_per_second: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int | None = None):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency must be one of {LATENCY_DISTRIBUTIONS}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.model_latency_ms = model_latency_ms or {}
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self, model: str) -> float:
+        """Seconds before the first token: ``latency_ms`` (or the model's override) is the median."""
+        median = self.model_latency_ms.get(model, self.latency_ms) / 1000
+        with self._lock:
+            if self.latency == "uniform":
+                return max(0.0, self._random.uniform(median * (1 - self.jitter), median * (1 + self.jitter)))
+            if self.latency == "lognormal" and median > 0:
+                return self._random.lognormvariate(math.log(median), self.jitter)
+            return median
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+def _tokens(text: str) -> list[str]:
+    """Word-sized chunks (with their leading space) standing in for tokens."""
+    return re.findall(r"\s*\S+", text)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "owned_by": "stub"}
+                for model in ("llama-3.1-8b-instant", "llama-3.3-70b-versatile")
+            ]})
+        else:
+            self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        request = json.loads(body or b"{}")
+        config: StubConfig = self.server.config
+        model = request.get("model", "stub")
+        time.sleep(config.sample_latency(model))
+        if config.should_fail():
+            self._json(config.error_status, {"error": {"message": "stub injected error", "type": "server_error"}})
+            return
+
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+        tokens = _tokens(canned_reply(prompt))[: request.get("max_tokens") or None]
+        usage = {"prompt_tokens": len(_tokens(prompt)), "completion_tokens": len(tokens),
+                 "total_tokens": len(_tokens(prompt)) + len(tokens)}
+        if request.get("stream"):
+            self._stream(model, tokens, config.tokens_per_second)
+            return
+        if config.tokens_per_second > 0:
+            time.sleep(len(tokens) / config.tokens_per_second)
+        self._json(200, {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(tokens)}}],
+            "usage": usage,
+        })
+
+    def _stream(self, model: str, tokens: list[str], tokens_per_second: float) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> None:
+            payload = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            if tokens_per_second > 0:
+                time.sleep(1 / tokens_per_second)
+            chunk({"content": token})
+        chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open many connections at once
+
+
+def make_server(config: StubConfig, host: str = "127.0.0.1", port: int = 8001) -> StubServer:
+    """Bound (not yet serving) stub; ``port=0`` picks a free port (``server.server_port``)."""
+    server = StubServer((host, port), StubHandler)
+    server.config = config
+    return server
+
+
+def _model_latency(value: str) -> tuple[str, float]:
+    model, sep, ms = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected MODEL=MS")
+    return model, float(ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="distribution of time to first token")
+    parser.add_argument("--latency-ms", type=float, default=300, help="median time to first token")
+    parser.add_argument("--jitter", type=float, default=0.5,
+                        help="uniform: +/- fraction of the median; lognormal: sigma")
+    parser.add_argument("--model-latency", type=_model_latency, action="append", default=[],
+                        metavar="MODEL=MS", help="median latency for one model (repeatable)")
+    parser.add_argument("--tokens-per-second", type=float, default=0,
+                        help="generation rate after the first token (0: instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        jitter=args.jitter,
+        model_latency_ms=dict(args.model_latency),
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    server = make_server(config, args.host, args.port)
+    print(f"LLM stub listening on http://{args.host}:{server.server_port}/v1", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Test settings applied before the app modules are imported."""
+
+import os
+
+import pytest
+
+# Fake LLM clients return canned replies per test; a shared reply cache would leak them across tests.
+# tests/test_llm_response_cache.py builds its own cache on a temporary file.
+os.environ["RAD_LLM_CACHE"] = "0"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _seed_database():
+    """The seed database is not versioned; main.lifespan creates it when missing, but
+    module-level TestClient(app) instances never run the lifespan."""
+    from data.generate_seed_data import create_database
+    from utils.db import DB_PATH
+    from utils.schema import ensure_schema
+
+    if not os.path.exists(DB_PATH):
+        create_database(DB_PATH)
+    ensure_schema(DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def _closed_circuits():
+    """Failures injected by one test must not leave an LLM circuit open for the next."""
+    from llm.breaker import reset_breakers
+
+    reset_breakers()
+    yield
@@ -1,8 +1,12 @@
 """API endpoint tests using FastAPI TestClient."""
 
+import asyncio
+import json
 import os
 import sys
+from types import SimpleNamespace
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
@@ -14,6 +18,34 @@ from main import app
 client = TestClient(app)
 
 
+class _StreamingClient:
+    """Fake async LLM client whose streamed reply arrives in ``chunks``."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, stream=False, **kwargs):
+        assert stream
+
+        async def deltas():
+            for i, text in enumerate(self.chunks):
+                if i == self.fail_after:
+                    raise RuntimeError("connection reset")
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+        return deltas()
+
+
+def _sse_events(response) -> list[tuple[str, dict]]:
+    events = []
+    for frame in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
 # ── Root ────────────────────────────────────────────────────────────────────
 
 
@@ -134,7 +166,7 @@ def test_parse_concern_insufficient_context_with_order_id(monkeypatch):
         class _Chat:
             class _Completions:
                 @staticmethod
-                def create(**kwargs):
+                async def create(**kwargs):
                     return SimpleNamespace(
                         choices=[
                             SimpleNamespace(
@@ -149,7 +181,7 @@ def test_parse_concern_insufficient_context_with_order_id(monkeypatch):
 
         chat = _Chat()
 
-    monkeypatch.setattr(parse_concern_module, "_get_groq_client", lambda: _FakeClient())
+    monkeypatch.setattr(parse_concern_module, "get_async_llm_client", lambda: _FakeClient())
 
     r = client.post(
         "/api/parse-concern",
@@ -175,7 +207,7 @@ def test_paraphrase_context_success(monkeypatch):
         class _Chat:
             class _Completions:
                 @staticmethod
-                def create(**kwargs):
+                async def create(**kwargs):
                     return SimpleNamespace(
                         choices=[
                             SimpleNamespace(
@@ -193,7 +225,7 @@ def test_paraphrase_context_success(monkeypatch):
 
         chat = _Chat()
 
-    monkeypatch.setattr(parse_concern_module, "_get_groq_client", lambda: _FakeClient())
+    monkeypatch.setattr(parse_concern_module, "get_async_llm_client", lambda: _FakeClient())
 
     r = client.post(
         "/api/paraphrase-context",
@@ -213,7 +245,7 @@ def test_paraphrase_context_success(monkeypatch):
 def test_paraphrase_context_fallback_when_llm_unavailable(monkeypatch):
     from routes import parse_concern as parse_concern_module
 
-    monkeypatch.setattr(parse_concern_module, "_get_groq_client", lambda: None)
+    monkeypatch.setattr(parse_concern_module, "get_async_llm_client", lambda: None)
 
     r = client.post(
         "/api/paraphrase-context",
@@ -297,7 +329,7 @@ def test_assess_medium_risk():
 
 
 def test_assess_llm_fallback_without_key():
-    """Without GROQ_API_KEY, assess should still work with response_script null."""
+    """Without GROQ_API_KEY, assess still works: templated scripts for auto-approvals, none for risk tiers."""
     old_key = os.environ.pop("GROQ_API_KEY", None)
     try:
         r = client.post(
@@ -310,8 +342,16 @@ def test_assess_llm_fallback_without_key():
         )
         assert r.status_code == 200
         data = r.json()
+        assert data["classification"] == "auto_approved"
         assert data.get("llm_available") is False
-        assert data.get("response_script") is None
+        assert "full refund of $65.00" in data["response_script"]
+
+        r = client.post(
+            "/api/assess",
+            json={"customer_id": "CUST_005", "booking_id": "CUST_005_B001", "refund_reason": "technical_issue"},
+        )
+        assert r.json()["classification"] == "high_risk"
+        assert r.json()["response_script"] is None
     finally:
         if old_key is not None:
             os.environ["GROQ_API_KEY"] = old_key
@@ -329,6 +369,29 @@ def test_assess_order_not_found():
     assert r.status_code == 404
 
 
+def test_assess_batch_matches_single_assess():
+    items = [
+        {"customer_id": "CUST_014", "booking_id": "CUST_014_B009", "refund_reason": "cancellation"},
+        {"customer_id": "CUST_018", "booking_id": "CUST_018_B015", "refund_reason": "technical_issue"},
+        {"customer_id": "CUST_018", "booking_id": "CUST_018_B015", "refund_reason": "no_show"},
+        {"customer_id": "CUST_001", "booking_id": "FAKE_BOOKING", "refund_reason": "cancellation"},
+        {"customer_id": "CUST_001", "booking_id": "CUST_018_B015", "refund_reason": "cancellation"},
+    ]
+    r = client.post("/api/assess/batch", json={"items": items})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert len(results) == len(items)
+
+    for item, result in zip(items[:3], results[:3]):
+        single = client.post("/api/assess", json=item).json()
+        assert result["response_script"] is None
+        for key in ("classification", "risk_score", "recommended_action", "layers", "evidence"):
+            assert result[key] == single[key], (item, key)
+
+    assert results[3]["error"] == {"status_code": 404, "detail": "Order not found"}
+    assert results[4]["error"] == {"status_code": 400, "detail": "Order does not belong to this customer"}
+
+
 # ── Guidance ─────────────────────────────────────────────────────────────────
 
 
@@ -353,6 +416,56 @@ def test_guidance():
         assert "fallback" in data
 
 
+def test_guidance_stream(monkeypatch):
+    from routes import guidance as guidance_module
+
+    body = {
+        "customer_id": "CUST_008",
+        "booking_id": "CUST_008_B006",
+        "classification": "high_risk",
+        "risk_score": 81,
+        "recommended_action": "Escalation to floor manager recommended.",
+        "evidence_summary": {},
+        "agent_message": "Customer threatened chargeback.",
+    }
+    streaming_client = _StreamingClient([" Escalate", " to L2. "])
+    monkeypatch.setattr(guidance_module, "get_async_llm_client", lambda: streaming_client)
+    r = client.post("/api/guidance/stream", json=body)
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert _sse_events(r) == [
+        ("token", {"text": "Escalate"}),
+        ("token", {"text": " to L2. "}),
+        ("done", {"guidance": "Escalate to L2.", "llm_available": True}),
+    ]
+
+    monkeypatch.setattr(guidance_module, "get_async_llm_client", lambda: _StreamingClient(["a", "b"], fail_after=1))
+    events = _sse_events(client.post("/api/guidance/stream", json=body))
+    assert events[-1][0] == "done" and events[-1][1]["llm_available"] is False
+
+
+def test_assess_stream_sends_assessment_before_script(monkeypatch):
+    from routes import assessments as assessments_module
+
+    item = {"customer_id": "CUST_005", "booking_id": "CUST_005_B001", "refund_reason": "technical_issue"}
+    expected = client.post("/api/assess", json=item).json()
+    streaming_client = _StreamingClient(["I understand.", " Let me check."])
+    monkeypatch.setattr(assessments_module, "get_async_llm_client", lambda: streaming_client)
+    (first, assessment), *tokens, (last, done) = _sse_events(client.post("/api/assess/stream", json=item))
+    assert first == "assessment" and last == "done"
+    assert assessment["response_script"] is None and assessment["llm_available"] is True
+    for key in ("classification", "risk_score", "layers", "evidence"):
+        assert assessment[key] == expected[key]
+    assert [name for name, _ in tokens] == ["token", "token"]
+    assert done == {"response_script": "I understand. Let me check."}
+
+    # Templated classifications need no LLM: the script is in the first event.
+    monkeypatch.setattr(assessments_module, "get_async_llm_client", lambda: None)
+    item = {"customer_id": "CUST_001", "booking_id": "CUST_001_B030", "refund_reason": "cancellation"}
+    events = _sse_events(client.post("/api/assess/stream", json=item))
+    assert [name for name, _ in events] == ["assessment", "done"]
+    assert events[0][1]["response_script"] == events[1][1]["response_script"] is not None
+
+
 # ── Resolutions ──────────────────────────────────────────────────────────────
 
 
@@ -547,6 +660,51 @@ def test_get_escalation_detail_not_found():
     assert r.status_code == 404
 
 
+def _keys(value):
+    if isinstance(value, dict):
+        return set(value) | {k for v in value.values() for k in _keys(v)}
+    if isinstance(value, list):
+        return {k for v in value for k in _keys(v)}
+    return set()
+
+
+def test_responses_leave_out_internal_columns():
+    from utils.schema import INTERNAL_COLUMNS
+
+    r = client.post(
+        "/api/resolve",
+        json={
+            "customer_id": "CUST_018",
+            "booking_id": "CUST_018_B015",
+            "classification": "medium_risk",
+            "risk_score": 55,
+            "recommended_action": "Review recommended.",
+            "agent_decision": "escalated_to_l2",
+            "escalate_to_l2": True,
+        },
+    )
+    log_id = r.json()["log_id"]
+    call_id = client.get("/api/calls").json()[0]["call_id"]
+    paths = [
+        "/api/customer/CUST_018",
+        "/api/customer/CUST_018/bookings",
+        "/api/escalations",
+        f"/api/escalations/{log_id}",
+        f"/api/calls/{call_id}",
+        "/api/orders",
+    ]
+    for path in paths:
+        r = client.get(path)
+        assert r.status_code == 200, path
+        assert not _keys(r.json()) & INTERNAL_COLUMNS, path
+    r = client.post(
+        "/api/assess",
+        json={"customer_id": "CUST_018", "booking_id": "CUST_018_B015", "refund_reason": "no_show"},
+    )
+    assert r.status_code == 200
+    assert not _keys(r.json()) & INTERNAL_COLUMNS
+
+
 # ── Metrics ──────────────────────────────────────────────────────────────────
 
 
@@ -558,6 +716,9 @@ def test_get_metrics():
     assert "auto_approved" in data
     assert "escalated" in data
     assert "engine_config" in data
+    assert {"hits", "misses", "size", "maxsize"} <= set(data["assessment_cache"])
+    assert data["llm_cache"] == {"enabled": False}
+    assert isinstance(data["llm_breakers"], dict)
 
 
 def test_get_orders():
@@ -596,3 +757,38 @@ def test_get_policies():
     assert "content" in first
     assert isinstance(first["content"], str)
     assert len(first["content"]) > 0
+
+
+class _SlowClient:
+    """Fake async LLM client that takes ``delay`` seconds per reply."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Script."))])
+
+
+def test_llm_calls_do_not_hold_pooled_connections(monkeypatch):
+    import routes.assessments as assessments
+    import utils.db as db
+
+    # More concurrent requests than pool slots, each awaiting the LLM longer than the pool timeout.
+    db.close_pools()
+    monkeypatch.setitem(db._pools, db.DB_PATH, db.ConnectionPool(db.DB_PATH, size=2, timeout=0.5))
+    monkeypatch.setattr(assessments, "get_async_llm_client", lambda: _SlowClient(1.0))
+    payload = {"customer_id": "CUST_001", "booking_id": "CUST_001_B001", "refund_reason": "cancellation"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.post("/api/assess", json=payload) for _ in range(6)))
+
+    try:
+        responses = asyncio.run(run())
+    finally:
+        db.close_pools()
+    assert [r.status_code for r in responses] == [200] * 6
+    assert {r.json()["response_script"] for r in responses} == {"Script."}
@@ -0,0 +1,43 @@
+"""Tests for the in-process TTL/LRU cache."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_ttl_expiry():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    clock.now = 10
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (3, 2, 1, 1)
+
+
+def test_invalidate_tag_drops_only_that_tag():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a1", 1, tag="a")
+    cache.set("a2", 2, tag="a")
+    cache.set("b1", 3, tag="b")
+    assert cache.invalidate_tag("a") == 2
+    assert cache.get("a1") is None and cache.get("b1") == 3
+    assert cache.invalidate_tag("a") == 0
+    assert len(cache) == 1
@@ -0,0 +1,91 @@
+"""Tests for the pooled SQLite helpers in utils.db."""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import ConnectionPool, SerializedWriter, query_one
+
+
+def test_pool_reuses_released_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    pool.close()
+
+
+def test_pool_times_out_when_exhausted(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.close()
+
+
+def test_pool_rolls_back_open_transaction_on_release(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert query_one("SELECT COUNT(*) AS n FROM t", conn=conn)["n"] == 0
+    pool.close()
+
+
+def test_query_helpers_use_caller_connection():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    assert query_one("SELECT 1 AS one", conn=conn)["one"] == 1
+
+
+def test_serialized_writer_isolates_failing_job(tmp_path):
+    db_path = str(tmp_path / "writer.db")
+    writer = SerializedWriter(db_path, profile="wal")
+    try:
+        writer.run(lambda c: c.execute("CREATE TABLE t (x INTEGER UNIQUE)"))
+        ok = [writer.submit(lambda c, i=i: c.execute("INSERT INTO t VALUES (?)", (i,)).lastrowid) for i in range(5)]
+        dup = writer.submit(lambda c: c.execute("INSERT INTO t VALUES (0)"))
+        assert [f.result(timeout=5) for f in ok] == [1, 2, 3, 4, 5]
+        with pytest.raises(sqlite3.IntegrityError):
+            dup.result(timeout=5)
+    finally:
+        writer.close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 5
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_serialized_writer_survives_failed_commit_and_lost_transaction(tmp_path):
+    db_path = str(tmp_path / "writer.db")
+    writer = SerializedWriter(db_path, profile="wal")
+    try:
+        writer.run(lambda c: c.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)"))
+        writer.run(lambda c: c.execute(
+            "CREATE TABLE child (parent_id INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)"
+        ))
+
+        # A deferred foreign key violation is only reported by COMMIT.
+        with pytest.raises(sqlite3.IntegrityError):
+            writer.run(lambda c: c.execute("INSERT INTO child VALUES (42)"))
+        # A job ending the transaction stands in for SQLite rolling it back on
+        # SQLITE_FULL / SQLITE_IOERR: the savepoint cleanup has nothing to act on.
+        with pytest.raises(sqlite3.OperationalError):
+            writer.run(lambda c: c.execute("ROLLBACK"))
+
+        assert writer.run(lambda c: c.execute("INSERT INTO parent VALUES (7)").lastrowid) == 7
+    finally:
+        writer.close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM child").fetchone()[0] == 0
+    assert conn.execute("SELECT id FROM parent").fetchall() == [(7,)]
+    conn.close()
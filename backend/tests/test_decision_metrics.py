@@ -0,0 +1,121 @@
+"""Tests for the decision-log rollups (engine.decision_metrics) and /api/metrics/timeseries."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.generate_seed_data import create_database
+from engine.decision_metrics import compact_rollups, timeseries
+from engine.profile_manager import update_l2_decision
+from main import app
+from utils.db import get_connection
+
+client = TestClient(app)
+
+DAY = datetime(2026, 3, 2)  # a Monday
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    db_path = str(tmp_path / "rad.db")
+    create_database(db_path)
+    conn = get_connection(db_path)
+    yield conn
+    conn.close()
+
+
+def _log(conn, timestamp, classification, risk_score=None, recommended="Approve", decision="Approve",
+         escalated=0) -> int:
+    cur = conn.execute(
+        "INSERT INTO decision_log (timestamp, classification, risk_score, recommended_action, agent_decision, "
+        "escalated_to_l2) VALUES (?, ?, ?, ?, ?, ?)",
+        (timestamp, classification, risk_score, recommended, decision, escalated),
+    )
+    return cur.lastrowid
+
+
+def _seed_decisions(conn):
+    _log(conn, "2026-03-02 09:05:10", "auto_approved")
+    _log(conn, "2026-03-02 09:40:00", "low_risk", 20, decision="Deny")
+    _log(conn, "2026-03-02 10:15:00", "high_risk", 80, recommended="Escalate", decision="Escalate", escalated=1)
+    _log(conn, "2026-03-03 12:00:00", "vendor_anomaly", 10)
+    _log(conn, "2026-03-09 08:00:00", "medium_risk", 50)
+    conn.commit()
+
+
+def _totals(series):
+    return {b["bucket_start"]: b["total_processed"] for b in series}
+
+
+def test_timeseries_groups_decisions_by_bucket(conn):
+    _seed_decisions(conn)
+    hourly = timeseries(DAY, DAY + timedelta(days=1), "hour", conn=conn)
+    assert _totals(hourly) == {"2026-03-02 09:00:00": 2, "2026-03-02 10:00:00": 1}
+    nine = hourly[0]
+    assert nine["auto_approved"] == 1 and nine["agent_reviewed"] == 1 and nine["overrides"] == 1
+    assert nine["avg_risk_score"] == 20.0
+    assert nine["by_classification"] == {"auto_approved": 1, "low_risk": 1}
+    assert hourly[1]["escalated"] == 1
+
+    weekly = timeseries(DAY - timedelta(days=7), DAY + timedelta(days=14), "week", conn=conn)
+    assert _totals(weekly) == {"2026-03-02 00:00:00": 4, "2026-03-09 00:00:00": 1}
+    assert weekly[0]["vendor_anomalies"] == 1
+    assert weekly[0]["avg_risk_score"] == round((20 + 80 + 10) / 3, 2)
+
+
+def test_rollups_follow_decision_updates_and_deletes(conn):
+    _seed_decisions(conn)
+    log_id = _log(conn, "2026-03-02 11:00:00", "medium_risk", 60, decision="Escalate", recommended="Review",
+                  escalated=1)
+    conn.commit()
+    update_l2_decision(log_id, "approve", "Verified", conn=conn)
+    conn.execute("UPDATE decision_log SET classification = 'low_risk' WHERE log_id = ?", (log_id,))
+    conn.execute("DELETE FROM decision_log WHERE classification = 'vendor_anomaly'")
+    conn.commit()
+
+    daily = timeseries(DAY, DAY + timedelta(days=2), "day", conn=conn)
+    assert _totals(daily) == {"2026-03-02 00:00:00": 4}
+    assert daily[0]["by_classification"] == {"auto_approved": 1, "high_risk": 1, "low_risk": 2}
+    assert daily[0]["escalated"] == 2
+
+
+def test_compaction_folds_old_buckets_without_changing_totals(conn):
+    _seed_decisions(conn)
+    conn.execute("DELETE FROM decision_log WHERE classification = 'medium_risk'")
+    conn.commit()
+    before = timeseries(DAY, DAY + timedelta(days=7), "day", conn=conn)
+
+    # Minutes older than the retention fold into hours...
+    folded = compact_rollups(now=DAY + timedelta(days=5), conn=conn)
+    assert folded["minute"] > 0 and folded["hour"] == 0
+    tiers = {r[0] for r in conn.execute("SELECT DISTINCT granularity FROM decision_metrics_rollup")}
+    assert tiers == {"hour"}
+    assert timeseries(DAY, DAY + timedelta(days=7), "day", conn=conn) == before
+
+    # ...and hours older than theirs into days, reported at day resolution.
+    compact_rollups(now=DAY + timedelta(days=365), conn=conn)
+    assert timeseries(DAY, DAY + timedelta(days=7), "day", conn=conn) == before
+    hourly = timeseries(DAY, DAY + timedelta(days=7), "hour", conn=conn)
+    assert _totals(hourly) == {"2026-03-02 00:00:00": 3, "2026-03-03 00:00:00": 1}
+    assert {b["resolution"] for b in hourly} == {"day"}
+    # the deleted decision's bucket netted out and was dropped
+    assert conn.execute("SELECT COUNT(*) FROM decision_metrics_rollup WHERE decisions = 0").fetchone()[0] == 0
+
+
+def test_timeseries_endpoint():
+    r = client.get("/api/metrics/timeseries", params={"granularity": "day"})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["granularity"] == "day"
+    assert data["from"] < data["to"]
+    assert isinstance(data["buckets"], list)
+
+    r = client.get("/api/metrics/timeseries", params={"from": "2026-03-02T00:00:00Z", "to": "2026-03-01T00:00:00Z"})
+    assert r.status_code == 422
+    r = client.get("/api/metrics/timeseries", params={"granularity": "fortnight"})
+    assert r.status_code == 422
@@ -0,0 +1,118 @@
+"""Tests for the shared AssessmentContext used by /assess and escalation detail."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.generate_seed_data import create_database
+from engine.assessment_cache import ASSESSMENT_CACHE
+from engine.context import (
+    CustomerNotFound,
+    OrderCustomerMismatch,
+    OrderNotFound,
+    load_context,
+    refresh_profile_if_stale,
+    run_layers,
+)
+from engine.layer2_risk_profile import compute_risk_score
+from engine.profile_manager import update_profile
+from utils.db import get_connection
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    db_path = str(tmp_path / "rad.db")
+    create_database(db_path)
+    conn = get_connection(db_path)
+    yield conn
+    conn.close()
+
+
+def test_load_context_errors(conn):
+    with pytest.raises(OrderNotFound):
+        load_context(conn, "CUST_001", "FAKE_BOOKING")
+    with pytest.raises(OrderCustomerMismatch):
+        load_context(conn, "CUST_002", "CUST_001_B030")
+    with pytest.raises(CustomerNotFound):
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("DELETE FROM customer_profiles WHERE customer_id = 'CUST_018'")
+        load_context(conn, "CUST_018", "CUST_018_B015")
+
+
+def test_request_reason_does_not_leak_into_history(conn):
+    ctx = load_context(conn, "CUST_018", "CUST_018_B015", refund_reason="no_show", with_history=True)
+    assert ctx.booking["refund_reason"] == "no_show"
+    stored = next(b for b in ctx.history if b["booking_id"] == "CUST_018_B015")
+    assert stored["refund_reason"] != "no_show"
+    assert ctx.aggregates == load_context(conn, "CUST_018", "CUST_018_B015").aggregates
+
+
+def test_layer2_from_aggregates_matches_history(conn):
+    ctx = load_context(conn, "CUST_018", "CUST_018_B015", with_history=True)
+    assert compute_risk_score("CUST_018", ctx.profile, bookings=ctx.history) == \
+        compute_risk_score("CUST_018", ctx.profile, conn=conn)
+
+
+def test_assessment_query_count_is_independent_of_history(conn):
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    for customer_id, booking_id in (("CUST_001", "CUST_001_B030"), ("CUST_018", "CUST_018_B015")):
+        statements.clear()
+        ctx = load_context(conn, customer_id, booking_id)
+        refresh_profile_if_stale(ctx, conn)
+        run_layers(ctx, conn)
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        assert len(selects) <= 4, selects
+
+
+def test_run_layers_is_cached_until_customer_data_changes(conn):
+    ASSESSMENT_CACHE.clear()
+    ctx = load_context(conn, "CUST_018", "CUST_018_B015")
+    first = run_layers(ctx, conn)
+
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    again = run_layers(load_context(conn, "CUST_018", "CUST_018_B015"), conn)
+    conn.set_trace_callback(None)
+    assert again is first
+    # booking, profile, aggregates and the Layer 0 volume lookup only
+    assert len(statements) == 4, statements
+
+    other_reason = load_context(conn, "CUST_018", "CUST_018_B015", refund_reason="no_show")
+    assert run_layers(other_reason, conn) is not first
+
+    conn.execute(
+        "UPDATE booking_refund_records SET refund_requested_at = '2026-02-25 09:00:00' WHERE booking_id = 'CUST_018_B001'"
+    )
+    conn.commit()
+    assert run_layers(load_context(conn, "CUST_018", "CUST_018_B015"), conn) is not first
+
+
+def test_update_profile_invalidates_cached_assessments(conn):
+    ASSESSMENT_CACHE.clear()
+    first = run_layers(load_context(conn, "CUST_018", "CUST_018_B015"), conn)
+    before = ASSESSMENT_CACHE.stats()["invalidations"]
+    update_profile("CUST_018", conn=conn)
+    assert ASSESSMENT_CACHE.stats()["invalidations"] == before + 1
+    assert run_layers(load_context(conn, "CUST_018", "CUST_018_B015"), conn) is not first
+
+
+def test_policy_column_write_invalidates_cached_assessment(conn):
+    ASSESSMENT_CACHE.clear()
+    ctx = load_context(conn, "CUST_014", "CUST_014_B009", refund_reason="cancellation")
+    assert run_layers(ctx, conn)["final"]["classification"] == "auto_approved"
+
+    conn.execute(
+        "UPDATE booking_refund_records SET product_cancelable = 'non_cancelable', "
+        "cancellation_window_applicable = 0 WHERE booking_id = 'CUST_014_B009'"
+    )
+    conn.commit()
+    ctx = load_context(conn, "CUST_014", "CUST_014_B009", refund_reason="cancellation")
+    after = run_layers(ctx, conn)
+    assert after["final"]["classification"] != "auto_approved"
+    ASSESSMENT_CACHE.clear()
+    fresh = run_layers(load_context(conn, "CUST_014", "CUST_014_B009", refund_reason="cancellation"), conn)
+    assert after["final"]["classification"] == fresh["final"]["classification"]
@@ -0,0 +1,101 @@
+"""Parity tests: vectorized and scalar Layer 2 scoring must match the original scorer exactly.
+
+tests/layer2_baseline.py is the scorer as it was before the performance work,
+so a change that moves both current implementations together still fails here.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+from datetime import timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.generate_seed_data import create_database
+from engine.layer2_risk_profile import compute_risk_score
+from engine.layer2_vectorized import compute_risk_scores
+from engine.timestamps import NOW
+from tests.layer2_baseline import compute_risk_score as baseline_risk_score
+
+
+@pytest.fixture()
+def seed(tmp_path):
+    db_path = str(tmp_path / "rad.db")
+    create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    profiles = [dict(r) for r in conn.execute("SELECT * FROM customer_profiles ORDER BY customer_id")]
+    histories = [
+        [dict(r) for r in conn.execute(
+            "SELECT * FROM booking_refund_records WHERE customer_id = ? ORDER BY booking_date",
+            (p["customer_id"],),
+        )]
+        for p in profiles
+    ]
+    conn.close()
+    return profiles, histories
+
+
+def _ts(rng: random.Random) -> str | None:
+    roll = rng.random()
+    if roll < 0.03:
+        return None
+    if roll < 0.06:
+        return "not a timestamp"
+    if roll < 0.10:
+        # same day as NOW: exercises the ``days or 999`` bucket quirk
+        return (NOW - timedelta(hours=rng.randint(0, 11))).strftime("%Y-%m-%d %H:%M:%S")
+    dt = NOW - timedelta(days=rng.randint(-30, 900), seconds=rng.randint(0, 86399))
+    return dt.strftime("%Y-%m-%d") if roll < 0.15 else dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _generated(n_customers: int, seed: int = 7):
+    rng = random.Random(seed)
+    profiles, histories = [], []
+    for i in range(n_customers):
+        profiles.append({
+            "customer_id": f"GEN_{i:05d}",
+            "account_created_at": _ts(rng) if rng.random() < 0.95 else "",
+            "total_no_show_refund_claims": rng.choice([None, 0, 0, 1, 2, 3]),
+            "no_show_claims_contradicted": rng.choice([None, 0, 0, 1, 2]),
+        })
+        history = []
+        for j in range(rng.choice([0, 1, 1, 2, 5, 12, 40])):
+            refunded = rng.random() < 0.4
+            history.append({
+                "booking_id": f"GEN_{i:05d}_B{j:03d}",
+                "booking_date": _ts(rng),
+                "refund_requested_at": _ts(rng) if refunded else None,
+                "confirmation_opened": rng.choice([None, 0, 1, 1]),
+                "experience_value_percentile": rng.choice([None, rng.randint(1, 99), rng.uniform(1, 99)]),
+            })
+        histories.append(history)
+    return profiles, histories
+
+
+def _assert_parity(profiles, histories):
+    vectorized = compute_risk_scores(profiles, histories)
+    assert len(vectorized) == len(profiles)
+    for profile, history, result in zip(profiles, histories, vectorized):
+        expected = baseline_risk_score(profile["customer_id"], profile, history)
+        assert result == expected, profile["customer_id"]
+        assert compute_risk_score(profile["customer_id"], profile, bookings=history) == expected, profile["customer_id"]
+
+
+def test_vectorized_matches_seed_data(seed):
+    profiles, histories = seed
+    _assert_parity(profiles, histories)
+    # the seed covers the whole score range, not only the fallbacks
+    scores = [r["risk_score"] for r in compute_risk_scores(profiles, histories)]
+    assert min(s for s in scores if s is not None) < 20 and max(scores, key=lambda s: s or 0) > 60
+
+
+def test_vectorized_matches_generated_dataset():
+    _assert_parity(*_generated(3000))
+
+
+def test_vectorized_empty_batch():
+    assert compute_risk_scores([], []) == []
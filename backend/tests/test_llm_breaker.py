@@ -0,0 +1,141 @@
+"""Tests for the per-model LLM circuit breakers (llm.breaker) and their use by llm.client."""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import breaker as breaker_module
+from llm import client as client_module
+from llm.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breaker
+from llm.client import complete_async, llm_available
+from llm.contextual_guidance import generate_guidance_async
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FailingClient:
+    def __init__(self, exc):
+        self.exc = exc
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        raise self.exc
+
+
+def _status_error(status: int) -> openai.APIStatusError:
+    response = httpx.Response(status, request=httpx.Request("POST", "http://stub/v1/chat/completions"))
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def test_opens_on_errors_and_recovers_through_a_probe(monkeypatch):
+    monkeypatch.setattr(breaker_module, "LLM_BREAKER_MIN_CALLS", 4)
+    clock = FakeClock()
+    breaker = CircuitBreaker("m", max_timeout=10, clock=clock)
+    for ok in (True, True, False, False):
+        assert breaker.allow()
+        breaker.record(ok, 0.1)
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now += breaker_module.LLM_BREAKER_COOLDOWN_SECONDS
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()  # one probe at a time
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    clock.now += breaker_module.LLM_BREAKER_COOLDOWN_SECONDS
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["opened"] == 2
+
+
+def test_timeout_adapts_to_recent_latency(monkeypatch):
+    monkeypatch.setattr(breaker_module, "LLM_BREAKER_MIN_CALLS", 3)
+    breaker = CircuitBreaker("m", max_timeout=10, clock=FakeClock())
+    assert breaker.timeout() == 10  # too few samples
+    for latency in (0.5, 0.8, 1.0):
+        breaker.record(True, latency)
+    assert breaker.timeout() == pytest.approx(3.0)
+    breaker.record(True, 9.0)
+    assert breaker.timeout() == 10
+
+
+def test_open_circuit_fails_fast_to_fallbacks(monkeypatch):
+    monkeypatch.setattr(breaker_module, "LLM_BREAKER_MIN_CALLS", 2)
+    monkeypatch.setattr(client_module, "LLM_MAX_RETRIES", 0)
+    client = _FailingClient(_status_error(503))
+    for _ in range(2):
+        with pytest.raises(openai.APIStatusError):
+            asyncio.run(complete_async(client, "m-down", "p", 0.3, 10))
+    assert "timeout" in client.calls[0]
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(complete_async(client, "m-down", "p", 0.3, 10))
+    assert len(client.calls) == 2
+    assert not llm_available(client, "m-down")
+
+    guidance_model = "llama-3.1-8b-instant"
+    for _ in range(2):
+        get_breaker(guidance_model).record(False, 1.0)
+    result = asyncio.run(generate_guidance_async(client, "high_risk", 80, "Escalate", {}, "msg", ""))
+    assert result["llm_available"] is False and len(client.calls) == 2
+
+
+def test_client_errors_do_not_open_the_circuit(monkeypatch):
+    monkeypatch.setattr(breaker_module, "LLM_BREAKER_MIN_CALLS", 2)
+    client = _FailingClient(_status_error(400))
+    for _ in range(3):
+        with pytest.raises(openai.APIStatusError):
+            asyncio.run(complete_async(client, "m-bad-request", "p", 0.3, 10))
+    assert get_breaker("m-bad-request").state == CLOSED
+
+
+class _FlakyClient(_FailingClient):
+    """Fails the first ``failures`` calls, then replies."""
+
+    def __init__(self, exc, failures):
+        super().__init__(exc)
+        self.failures = failures
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) <= self.failures:
+            raise self.exc
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+
+def test_retries_are_recorded_and_share_one_deadline(monkeypatch):
+    monkeypatch.setattr(client_module, "LLM_RETRY_BACKOFF_SECONDS", 0.01)
+    client = _FlakyClient(_status_error(503), failures=2)
+    assert asyncio.run(complete_async(client, "m-flaky", "p", 0.3, 10)) == "ok"
+    assert len(client.calls) == 3
+    stats = get_breaker("m-flaky").stats()
+    assert stats["window_calls"] == 3 and stats["window_error_rate"] == round(2 / 3, 4)
+    # every attempt gets what is left of the first attempt's timeout, not a fresh one
+    timeouts = [call["timeout"] for call in client.calls]
+    assert timeouts == sorted(timeouts, reverse=True) and timeouts[0] <= get_breaker("m-flaky").max_timeout
+
+    # no retries past LLM_MAX_RETRIES, nor for client errors
+    client = _FlakyClient(_status_error(503), failures=5)
+    with pytest.raises(openai.APIStatusError):
+        asyncio.run(complete_async(client, "m-down", "p", 0.3, 10))
+    assert len(client.calls) == 1 + client_module.LLM_MAX_RETRIES
+    client = _FlakyClient(_status_error(400), failures=1)
+    with pytest.raises(openai.APIStatusError):
+        asyncio.run(complete_async(client, "m-bad-request", "p", 0.3, 10))
+    assert len(client.calls) == 1
@@ -0,0 +1,98 @@
+"""Tests for the shared, pooled LLM client (llm.client) against a local stub server."""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import client as llm_client
+from llm.response_generator import generate_response_script_async
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay)
+        self.server.peers.add(self.client_address)
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Stub script."}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+@pytest.fixture()
+def stub_server(monkeypatch):
+    server = _StubServer(("127.0.0.1", 0), _StubHandler)
+    server.peers = set()
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setenv("RAD_LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    asyncio.run(llm_client.close_llm_clients())
+    yield server
+    asyncio.run(llm_client.close_llm_clients())
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_is_shared_and_reuses_connections(stub_server):
+    async def run():
+        client = llm_client.get_async_llm_client()
+        assert llm_client.get_async_llm_client() is client
+        scripts = [await generate_response_script_async(client, "low_risk", "Approve", {}, "", "")
+                   for _ in range(3)]
+        await llm_client.close_llm_clients()
+        return scripts
+
+    assert asyncio.run(run()) == ["Stub script."] * 3
+    # every call went over the same kept-alive connection
+    assert len(stub_server.peers) == 1
+
+
+def test_no_client_without_api_key(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    assert llm_client.get_async_llm_client() is None
+
+
+def test_async_calls_run_concurrently(stub_server):
+    stub_server.delay = 0.2
+
+    async def run():
+        client = llm_client.get_async_llm_client()
+        assert llm_client.get_async_llm_client() is client
+        started = time.perf_counter()
+        scripts = await asyncio.gather(*(
+            generate_response_script_async(client, "low_risk", "Approve", {}, "", "") for _ in range(50)
+        ))
+        elapsed = time.perf_counter() - started
+        await llm_client.close_llm_clients()
+        return scripts, elapsed
+
+    scripts, elapsed = asyncio.run(run())
+    assert scripts == ["Stub script."] * 50
+    # 50 sequential calls would take 10s
+    assert elapsed < 5
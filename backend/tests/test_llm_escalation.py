@@ -0,0 +1,67 @@
+"""Tests for the deadline-bounded escalation LLM pipeline (llm.escalation)."""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import escalation
+from llm.evidence_summarizer import MODEL as NARRATIVE_MODEL
+
+
+class _FakeClient:
+    """Replies after ``delays[model]`` seconds; the narrative echoes which note signals reached it."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, **kwargs):
+        await asyncio.sleep(self.delays[model])
+        prompt = messages[0]["content"]
+        if model == NARRATIVE_MODEL:
+            if "Raised voice." in prompt:
+                content = "with llm signals"
+            elif "Aggression detected" in prompt:
+                content = "with rule signals"
+            else:
+                content = "without signals"
+        else:
+            content = "Raised voice."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _narrative(client):
+    return escalation.escalation_narrative(
+        client, [{"timestamp": "2026-01-01", "note": "Customer shouted."}],
+        {}, "3 total bookings.", 55, [], {"booking_id": "B1"},
+    )
+
+
+def test_narrative_uses_signals_that_arrive_in_time(monkeypatch):
+    monkeypatch.setattr(escalation, "NOTE_SIGNALS_DEADLINE_SECONDS", 1.0)
+    client = _FakeClient({"llama-3.1-8b-instant": 0.01, NARRATIVE_MODEL: 0.01})
+    assert asyncio.run(_narrative(client)) == "with llm signals"
+
+
+def test_narrative_starts_with_rule_signals_when_llm_is_late(monkeypatch):
+    monkeypatch.setattr(escalation, "NOTE_SIGNALS_DEADLINE_SECONDS", 0.05)
+    client = _FakeClient({"llama-3.1-8b-instant": 5, NARRATIVE_MODEL: 0.01})
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        narrative = await _narrative(client)
+        return narrative, loop.time() - started
+
+    narrative, elapsed = asyncio.run(run())
+    assert narrative == "with rule signals"
+    assert elapsed < 1
+
+
+def test_narrative_deadline(monkeypatch):
+    monkeypatch.setattr(escalation, "NARRATIVE_DEADLINE_SECONDS", 0.05)
+    client = _FakeClient({"llama-3.1-8b-instant": 0.01, NARRATIVE_MODEL: 5})
+    assert asyncio.run(_narrative(client)) is None
@@ -0,0 +1,97 @@
+"""Tests for the two-tier LLM response cache (llm.response_cache) and its use by llm.client.complete_async."""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import response_cache
+from llm.client import complete_async
+from llm.response_cache import ResponseCache, cache_key
+
+
+class _FakeAsyncClient:
+    base_url = "http://stub/v1"
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, messages, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f" reply {self.calls} "))])
+
+
+def test_key_covers_every_input():
+    base = ("http://stub/v1", "m", 0.3, 300, "prompt")
+    keys = {cache_key(*base), cache_key("http://other/v1", *base[1:]), cache_key(*base[:2], 0.7, *base[3:]),
+            cache_key(*base[:3], 100, base[4]), cache_key(*base[:4], "prompt 2")}
+    assert len(keys) == 5
+
+
+def test_hit_skips_the_call_and_survives_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm_cache.db")
+    monkeypatch.setattr(response_cache, "LLM_RESPONSE_CACHE", ResponseCache(path))
+    client = _FakeAsyncClient()
+
+    async def calls():
+        return [
+            await complete_async(client, "m", "p", temperature=0.3, max_tokens=300, cache="guidance"),
+            await complete_async(client, "m", "p", temperature=0.3, max_tokens=300, cache="guidance"),
+            await complete_async(client, "m", "p", temperature=0.3, max_tokens=300),  # uncached call
+        ]
+
+    assert asyncio.run(calls()) == ["reply 1", "reply 1", "reply 2"]
+    assert client.calls == 2
+    response_cache.LLM_RESPONSE_CACHE.close()
+
+    # A new process (fresh memory tier) is served from disk, then from memory.
+    restarted = ResponseCache(path)
+    monkeypatch.setattr(response_cache, "LLM_RESPONSE_CACHE", restarted)
+    async_client = _FakeAsyncClient()
+    for _ in range(2):
+        assert asyncio.run(complete_async(async_client, "m", "p", 0.3, 300, cache="guidance")) == "reply 1"
+    assert async_client.calls == 0
+    stats = restarted.stats()["endpoints"]["guidance"]
+    assert (stats["disk_hits"], stats["memory_hits"], stats["hit_rate"]) == (1, 1, 1.0)
+    restarted.close()
+
+
+def test_ttl_and_disk_byte_budget(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "llm_cache.db"), memory_bytes=10, disk_bytes=25)
+    cache.set("guidance", "k1", "a" * 10)
+    cache.set("guidance", "k2", "b" * 10)
+    assert cache.stats()["memory"]["size"] == 1  # only one 10-byte value fits in memory
+    cache.set("guidance", "k3", "c" * 10)  # disk keeps the 2 most recently used rows
+    assert cache.stats()["disk"] == {"entries": 2, "bytes": 20, "maxbytes": 25}
+    assert cache.get_disk("guidance", "k1") is None and cache.get_disk("guidance", "k2") == "b" * 10
+
+    monkeypatch.setenv("RAD_LLM_CACHE_TTL_PARSE_CONCERN", "-1")
+    cache.set("parse_concern", "k4", "expired")
+    assert cache.get("parse_concern", "k4") is None
+    cache.close()
+
+
+def test_stats_track_disk_tier_without_querying_it(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm_cache.db")
+    cache = ResponseCache(path, disk_bytes=25)
+    cache.set("guidance", "k1", "a" * 10)
+    cache.set("guidance", "k1", "a" * 5)  # replaced
+    cache.set("guidance", "k2", "b" * 10)
+    cache.set("guidance", "k3", "c" * 10)
+    monkeypatch.setenv("RAD_LLM_CACHE_TTL_PARSE_CONCERN", "-1")
+    cache.set("parse_concern", "k4", "d")  # evicts k1; removed as expired by the next write
+    cache.set("guidance", "k5", "e")
+
+    statements = []
+    cache._db().set_trace_callback(statements.append)
+    assert cache.stats()["disk"] == {"entries": 3, "bytes": 21, "maxbytes": 25}
+    assert statements == []
+    cache.close()
+
+    # A new process counts the file once
+    restarted = ResponseCache(path, disk_bytes=25)
+    assert restarted.stats()["disk"] == {"entries": 3, "bytes": 21, "maxbytes": 25}
+    restarted.close()
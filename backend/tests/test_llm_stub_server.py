@@ -0,0 +1,83 @@
+"""Tests for the offline LLM stand-in (scripts/llm_stub_server.py) driven through the real clients."""
+
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import client as llm_client
+from llm.client import complete_async, get_async_llm_client, stream_async
+from llm.contextual_guidance import generate_guidance_async
+from llm.note_extractor import extract_note_signals_async
+from main import app
+from scripts.llm_stub_server import StubConfig, canned_reply, make_server
+
+
+@pytest.fixture()
+def stub(monkeypatch):
+    server = make_server(StubConfig(), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("GROQ_API_KEY", "stub")
+    monkeypatch.setenv("RAD_LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    yield server
+    asyncio.run(llm_client.close_llm_clients())
+    server.shutdown()
+    server.server_close()
+
+
+def test_routes_parse_concern_through_stub(stub):
+    r = TestClient(app).post(
+        "/api/parse-concern",
+        json={"customer_id": "CUST_001", "agent_input": "Customer wants to cancel booking CUST_001_B030."},
+    )
+    data = r.json()
+    assert data["parsed"] is True
+    assert (data["order_id"], data["refund_reason"], data["order_valid"]) == ("CUST_001_B030", "cancellation", True)
+
+
+def test_note_signals_and_streaming(stub):
+    async def run():
+        client = get_async_llm_client()
+        notes = [{"timestamp": "2026-01-01", "note": "Customer upset about the delay. Mentioned a chargeback."}]
+        signals = await extract_note_signals_async(client, notes)
+        chunks = [text async for text in stream_async(client, "llama-3.1-8b-instant", "Write guidance.", 0.3, 300)]
+        return signals, chunks
+
+    signals, chunks = asyncio.run(run())
+    assert signals["source"] == "llm" and signals["chargeback_threat"] is True
+    assert len(chunks) > 5 and "".join(chunks) == canned_reply("Write guidance.")
+
+
+def test_latency_and_injected_errors(stub):
+    stub.config = StubConfig(latency_ms=100)
+
+    async def timed():
+        started = time.perf_counter()
+        await complete_async(get_async_llm_client(), "llama-3.1-8b-instant", "hi", 0.3, 10)
+        return time.perf_counter() - started
+
+    assert asyncio.run(timed()) >= 0.1
+
+    stub.config = StubConfig(error_rate=1.0, error_status=503)
+    result = asyncio.run(_guidance())
+    assert result["llm_available"] is False
+
+
+async def _guidance():
+    return await generate_guidance_async(get_async_llm_client(), "high_risk", 80, "Escalate", {}, "msg", "")
+
+
+def test_latency_distributions():
+    lognormal = StubConfig(latency="lognormal", latency_ms=400, jitter=0.5, seed=7)
+    samples = [lognormal.sample_latency("m") for _ in range(2001)]
+    assert statistics.median(samples) == pytest.approx(0.4, rel=0.1)
+    per_model = StubConfig(latency_ms=100, model_latency_ms={"big": 1500})
+    assert (per_model.sample_latency("small"), per_model.sample_latency("big")) == (0.1, 1.5)
@@ -0,0 +1,212 @@
+"""Tests for the persisted agent-note signals (llm.note_store)."""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.generate_seed_data import create_database
+from llm import note_store
+from utils.db import execute, get_connection
+
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.reply = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        content = self.reply or f"pass {self.calls}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture()
+def db_path(tmp_path):
+    path = str(tmp_path / "rad.db")
+    create_database(path)
+    return path
+
+
+def _current(customer_id, conn, accept_rules=False):
+    version = note_store.notes_version(customer_id, conn)
+    return note_store.stored_signals(customer_id, version, conn, accept_rules)
+
+
+def _store_current(customer_id, signals, conn):
+    version = note_store.notes_version(customer_id, conn)
+    note_store.store_signals(customer_id, version, note_store.customer_notes(customer_id, conn), signals, conn=conn)
+
+
+def test_notes_hash_ignores_order():
+    notes = [{"timestamp": "2026-01-01", "note": "a"}, {"timestamp": "2026-01-02", "note": "b"}]
+    assert note_store.notes_hash(notes) == note_store.notes_hash(list(reversed(notes)))
+    assert note_store.notes_hash(notes) != note_store.notes_hash(notes[:1])
+
+
+def test_refresh_only_calls_llm_when_notes_change(db_path, monkeypatch):
+    client = _FakeClient()
+    monkeypatch.setattr(note_store, "get_async_llm_client", lambda: client)
+    customer_id = "CUST_007"
+
+    asyncio.run(note_store.refresh_note_signals(customer_id, db_path))
+    asyncio.run(note_store.refresh_note_signals(customer_id, db_path))
+    assert client.calls == 1
+
+    conn = get_connection(db_path)
+    assert _current(customer_id, conn)["summary"] == "pass 1"
+
+    execute(
+        "UPDATE booking_refund_records SET agent_notes = 'Threatened a chargeback.' WHERE booking_id = ?",
+        ("CUST_007_B001",),
+        conn=conn,
+    )
+    assert _current(customer_id, conn) is None
+
+    asyncio.run(note_store.refresh_note_signals(customer_id, db_path))
+    assert client.calls == 2
+    assert _current(customer_id, conn)["summary"] == "pass 2"
+    conn.close()
+
+
+def test_refresh_without_llm_stores_rule_signals_for_new_notes(db_path, monkeypatch):
+    customer_id = "CUST_008"
+    conn = get_connection(db_path)
+    _store_current(customer_id, {"chargeback_threat": False, "summary": "calm", "source": "llm"}, conn)
+    execute(
+        "UPDATE booking_refund_records SET agent_notes = ? WHERE booking_id = ?",
+        ("Customer was shouting and threatened a chargeback.", "CUST_008_B006"),
+        conn=conn,
+    )
+
+    monkeypatch.setattr(note_store, "get_async_llm_client", lambda: None)
+    asyncio.run(note_store.refresh_note_signals(customer_id, db_path))
+    signals = _current(customer_id, conn, accept_rules=True)
+    assert signals["chargeback_threat"] is True
+    assert signals["source"] == "rules"
+    # a caller with an LLM treats rule-only signals as a miss...
+    assert _current(customer_id, conn) is None
+
+    # ...and the next refresh with one upgrades them
+    client = _FakeClient()
+    client.reply = '{"chargeback_threat": true, "aggression_detected": true, "summary": "llm"}'
+    monkeypatch.setattr(note_store, "get_async_llm_client", lambda: client)
+    asyncio.run(note_store.refresh_note_signals(customer_id, db_path))
+    assert client.calls == 1
+    assert _current(customer_id, conn)["source"] != "rules"
+    conn.close()
+
+
+def test_agent_notes_route_ignores_signals_of_old_notes(db_path, monkeypatch):
+    import routes.customers as customers
+    import utils.db as db
+    from fastapi.testclient import TestClient
+    from main import app
+
+    customer_id = "CUST_008"
+    conn = get_connection(db_path)
+    _store_current(customer_id, {"chargeback_threat": False, "summary": "calm", "source": "llm"}, conn)
+    execute(
+        "UPDATE booking_refund_records SET agent_notes = ? WHERE booking_id = ?",
+        ("Customer was shouting and threatened a chargeback.", "CUST_008_B006"),
+        conn=conn,
+    )
+    conn.close()
+
+    db.close_pools()
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    monkeypatch.setattr(customers, "get_async_llm_client", lambda: None)
+    try:
+        data = TestClient(app).get(f"/api/customer/{customer_id}/agent-notes").json()
+    finally:
+        db.close_pools()
+    assert data["available"] is True
+    assert data["signals"]["chargeback_threat"] is True
+    assert data["signals"]["summary"] != "calm"
+
+
+@pytest.mark.parametrize(
+    "sql, params, bumped",
+    [
+        ("UPDATE booking_refund_records SET agent_notes = 'New note.' WHERE booking_id = ?", ("CUST_007_B001",), True),
+        ("UPDATE booking_refund_records SET agent_notes = NULL WHERE booking_id = ?", ("CUST_007_B004",), True),
+        ("UPDATE booking_refund_records SET refund_requested_at = '2026-01-02 10:00:00' WHERE booking_id = ?",
+         ("CUST_007_B004",), True),
+        ("DELETE FROM booking_refund_records WHERE booking_id = ?", ("CUST_007_B004",), True),
+        # no note on the row, or a column collect_agent_notes does not read
+        ("UPDATE booking_refund_records SET refund_requested_at = '2026-01-02 10:00:00' WHERE booking_id = ?",
+         ("CUST_007_B001",), False),
+        ("UPDATE booking_refund_records SET refund_reason = 'other' WHERE booking_id = ?", ("CUST_007_B004",), False),
+        ("UPDATE booking_refund_records SET agent_notes = '' WHERE booking_id = ?", ("CUST_007_B001",), False),
+    ],
+)
+def test_notes_version_follows_note_changes(db_path, sql, params, bumped):
+    conn = get_connection(db_path)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    before = note_store.notes_version("CUST_007", conn)
+    conn.execute(sql, params)
+    assert (note_store.notes_version("CUST_007", conn) > before) is bumped
+    conn.close()
+
+
+def test_moving_a_noted_booking_bumps_both_customers(db_path):
+    conn = get_connection(db_path)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    before = [note_store.notes_version(c, conn) for c in ("CUST_007", "CUST_008")]
+    conn.execute("UPDATE booking_refund_records SET customer_id = 'CUST_008' WHERE booking_id = 'CUST_007_B004'")
+    after = [note_store.notes_version(c, conn) for c in ("CUST_007", "CUST_008")]
+    assert all(a > b for a, b in zip(after, before))
+    conn.close()
+
+
+def test_agent_notes_hit_does_not_read_booking_history(db_path):
+    import routes.customers as customers
+
+    customer_id = "CUST_008"
+    conn = get_connection(db_path)
+    _store_current(customer_id, {"summary": "stored", "source": "llm"}, conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    _, stored, notes = customers._stored_signals_or_notes(conn, customer_id, False)
+    conn.close()
+    assert stored["summary"] == "stored"
+    assert notes == []
+    assert not any("booking_refund_records" in sql for sql in statements)
+
+
+def test_escalation_detail_serves_rule_signals_without_llm(db_path, monkeypatch):
+    import routes.escalations as escalations
+    import utils.db as db
+    from fastapi.testclient import TestClient
+    from main import app
+
+    customer_id = "CUST_008"
+    conn = get_connection(db_path)
+    _store_current(customer_id, {"chargeback_threat": True, "summary": "rules", "source": "rules"}, conn)
+    log_id = conn.execute(
+        "INSERT INTO decision_log (customer_id, booking_id, classification, escalated_to_l2) "
+        "VALUES (?, 'CUST_008_B006', 'high_risk', 1)",
+        (customer_id,),
+    ).lastrowid
+    conn.commit()
+    conn.execute("UPDATE customer_note_signals SET computed_at = '2000-01-01 00:00:00'")
+    conn.commit()
+    conn.close()
+
+    db.close_pools()
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    monkeypatch.setattr(escalations, "get_async_llm_client", lambda: None)
+    try:
+        data = TestClient(app).get(f"/api/escalations/{log_id}").json()
+    finally:
+        db.close_pools()
+    assert data["agent_note_signals"]["summary"] == "rules"
+    conn = get_connection(db_path)
+    row = conn.execute("SELECT computed_at FROM customer_note_signals WHERE customer_id = ?", (customer_id,)).fetchone()
+    conn.close()
+    assert row["computed_at"] == "2000-01-01 00:00:00"
@@ -0,0 +1,102 @@
+"""Tests for the latency histograms (utils.perf) and /api/metrics/perf."""
+
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from utils import perf
+from utils.perf import Histogram, bucket_bounds, bucket_index, sql_label, timed
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("value", [0, 1, 31, 32, 33, 1000, 999_999, 123_456_789, 2**39 + 12345])
+def test_bucket_bounds_contain_value_within_relative_error(value):
+    low, high = bucket_bounds(bucket_index(value))
+    assert low <= value <= high
+    assert high - low <= max(1, value) / perf.SUB_BUCKETS
+
+
+def test_values_past_the_trackable_range_share_the_last_bucket():
+    assert bucket_index(2**50) == perf.BUCKET_COUNT - 1
+    hist = Histogram()
+    hist.record(2**50)
+    assert hist.percentile(100) == 2**50
+
+
+def test_percentiles_are_within_bucket_precision():
+    hist = Histogram()
+    for micros in range(1, 1001):
+        hist.record(micros * 1000)
+    assert hist.count == 1000
+    assert hist.min == 1000 and hist.max == 1_000_000
+    for pct, expected in ((50, 500_000), (90, 900_000), (99, 990_000)):
+        assert expected <= hist.percentile(pct) <= expected * (1 + 1 / perf.SUB_BUCKETS)
+    assert hist.percentile(100) == 1_000_000
+    summary = hist.summary()
+    assert summary["count"] == 1000
+    assert summary["mean_us"] == 500.5
+    assert set(summary) == {"count", "mean_us", "min_us", "p50_us", "p90_us", "p99_us", "p99_9_us", "max_us"}
+
+
+def test_empty_histogram_reports_zeros():
+    assert Histogram().summary()["p99_us"] == 0.0
+
+
+@pytest.mark.parametrize("sql,label", [
+    ("SELECT * FROM booking_refund_records WHERE customer_id = ?", "select:booking_refund_records"),
+    ("  insert into decision_log (a) values (?)", "insert:decision_log"),
+    ("UPDATE customer_profiles SET x = 1", "update:customer_profiles"),
+    ("WITH recent AS (SELECT 1) SELECT * FROM bookings", "select:bookings"),
+    ("PRAGMA journal_mode = WAL", "pragma"),
+])
+def test_sql_label(sql, label):
+    assert sql_label(sql) == label
+
+
+def test_timed_is_a_no_op_when_disabled(monkeypatch):
+    def stage():
+        return 1
+
+    monkeypatch.setattr(perf, "PERF_ENABLED", False)
+    assert timed("test.disabled")(stage) is stage
+
+
+def test_timed_records_stage(monkeypatch):
+    monkeypatch.setattr(perf, "PERF_ENABLED", True)
+
+    @timed("test.stage")
+    def stage(x):
+        return x * 2
+
+    before = perf.histogram("stage", "test.stage").count
+    assert stage(21) == 42
+    assert perf.histogram("stage", "test.stage").count == before + 1
+
+
+@pytest.mark.skipif(not perf.PERF_ENABLED, reason="RAD_PERF=0")
+def test_perf_endpoint_reports_endpoint_and_db_latency():
+    r = client.post(
+        "/api/assess",
+        json={"customer_id": "CUST_014", "booking_id": "CUST_014_B009", "refund_reason": "cancellation"},
+    )
+    assert r.status_code == 200
+
+    data = client.get("/api/metrics/perf").json()
+    assert data["enabled"] is True
+    assert data["unit"] == "microseconds"
+    histograms = data["histograms"]
+    assert histograms["endpoint"]["POST /api/assess"]["count"] >= 1
+    assert any(name.startswith("select:") for name in histograms["db"])
+
+    r = client.get("/api/metrics/perf", params={"format": "prometheus"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert "# TYPE rad_latency_seconds summary" in r.text
+    assert 'rad_latency_seconds_count{kind="endpoint",name="POST /api/assess"}' in r.text
+    assert 'quantile="0.99"' in r.text
@@ -0,0 +1,150 @@
+"""Query-plan regression guard.
+
+Drives the hot API paths against a fresh seed database, records every SQL
+statement the routes and engine issue (with bound values expanded) and runs
+EXPLAIN QUERY PLAN on each. A bare ``SCAN`` of a large table means a missing
+or unusable index and fails the test.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.db as db
+from data.generate_seed_data import create_database
+from engine.profile_manager import ensure_decision_log_table
+from main import app
+
+LARGE_TABLES = {"booking_refund_records", "decision_log", "decision_metrics_rollup"}
+
+# Endpoints that intentionally read a whole large table (dashboards/listings).
+FULL_SCAN_ENDPOINTS = {"/api/orders"}
+
+_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SCAN_RE = re.compile(r"^SCAN (\w+)(.*)$")
+
+
+@pytest.fixture()
+def traced_client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "rad.db")
+    create_database(db_path)
+    ensure_decision_log_table(db_path)
+
+    statements: list[str] = []
+    real_connect = db._connect
+
+    def traced_connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    db.close_pools()
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    monkeypatch.setattr(db, "_connect", traced_connect)
+    yield TestClient(app), statements, db_path
+    db.close_pools()
+
+
+def _table_aliases(sql: str) -> dict[str, str]:
+    aliases = {}
+    for table, alias in _ALIAS_RE.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in {"WHERE", "ON", "JOIN", "LEFT", "INNER", "ORDER", "GROUP", "LIMIT"}:
+            aliases[alias] = table
+    return aliases
+
+
+def _full_scans(conn: sqlite3.Connection, sql: str) -> list[str]:
+    aliases = _table_aliases(sql)
+    offending = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        match = _SCAN_RE.match(row[3])
+        if not match:
+            continue
+        name, rest = match.groups()
+        if aliases.get(name, name) in LARGE_TABLES and "USING" not in rest:
+            offending.append(row[3])
+    return offending
+
+
+def _plannable(sql: str) -> bool:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    return head in {"SELECT", "UPDATE", "DELETE"} and any(t in sql for t in LARGE_TABLES)
+
+
+def test_hot_paths_use_indexes(traced_client):
+    client, statements, db_path = traced_client
+
+    hot_calls = [
+        ("get", "/api/calls", None),
+        ("get", "/api/customer/CUST_008", None),
+        ("get", "/api/customer/CUST_008/bookings", None),
+        ("post", "/api/validate-order", {"customer_id": "CUST_008", "booking_id": "CUST_008_B006"}),
+        ("post", "/api/assess", {"customer_id": "CUST_008", "booking_id": "CUST_008_B006", "refund_reason": "no_show"}),
+        ("post", "/api/assess", {"customer_id": "CUST_018", "booking_id": "CUST_018_B015", "refund_reason": "technical_issue"}),
+        ("post", "/api/assess/batch", {"items": [
+            {"customer_id": "CUST_008", "booking_id": "CUST_008_B006", "refund_reason": "no_show"},
+            {"customer_id": "CUST_018", "booking_id": "CUST_018_B015", "refund_reason": "technical_issue"},
+        ]}),
+        ("post", "/api/resolve", {
+            "customer_id": "CUST_018",
+            "booking_id": "CUST_018_B015",
+            "classification": "medium_risk",
+            "risk_score": 55,
+            "recommended_action": "Review recommended.",
+            "agent_decision": "escalated_to_l2",
+            "escalate_to_l2": True,
+            "agent_notes": "Customer asked again about the missing confirmation.",
+        }),
+        ("get", "/api/escalations", None),
+        ("get", "/api/metrics", None),
+        ("get", "/api/metrics/timeseries?granularity=week", None),
+    ]
+    for method, path, body in hot_calls:
+        r = client.request(method.upper(), path, json=body)
+        assert r.status_code == 200, (path, r.text)
+
+    log_id = client.get("/api/escalations").json()[0]["log_id"]
+    assert client.get(f"/api/escalations/{log_id}").status_code == 200
+
+    conn = sqlite3.connect(db_path)
+    try:
+        failures = {}
+        for sql in dict.fromkeys(statements):
+            if _plannable(sql):
+                scans = _full_scans(conn, sql)
+                if scans:
+                    failures[sql.strip()] = scans
+    finally:
+        conn.close()
+    assert not failures, "Full table scans on hot paths:\n" + "\n".join(
+        f"{scans} <- {sql}" for sql, scans in failures.items()
+    )
+
+
+def test_full_scan_endpoints_still_served(traced_client):
+    client, _, _ = traced_client
+    for path in FULL_SCAN_ENDPOINTS:
+        assert client.get(path).status_code == 200
+
+
+def test_layer0_anomaly_lookup_is_index_range(traced_client):
+    _, _, db_path = traced_client
+    conn = sqlite3.connect(db_path)
+    try:
+        plan = " ".join(
+            row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT booking_id FROM booking_refund_records "
+                "WHERE experience_id = ? AND booking_day = DATE(?) AND refund_requested_at IS NOT NULL",
+                ("EXP_COL_SKIP", "2026-02-20 10:00:00"),
+            )
+        )
+    finally:
+        conn.close()
+    assert "idx_bookings_refunds_by_experience_day (experience_id=? AND booking_day=?)" in plan
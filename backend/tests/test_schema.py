@@ -0,0 +1,279 @@
+"""Tests for the derived columns and trigger-maintained aggregates in utils.schema."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.generate_seed_data import create_database
+from engine.aggregates import check_aggregates, get_aggregates, rebuild_aggregates
+from engine.profile_manager import get_profile, is_profile_stale, log_interaction, update_l2_decision, update_profile
+from engine.timestamps import epoch_seconds
+from utils.db import get_connection
+from utils.schema import DECISION_METRICS_RECOUNT
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    db_path = str(tmp_path / "rad.db")
+    create_database(db_path)
+    conn = get_connection(db_path)
+    yield conn
+    conn.close()
+
+
+def _refund_count(conn, experience_id, day):
+    row = conn.execute(
+        "SELECT refund_count FROM experience_day_refund_counts WHERE experience_id = ? AND booking_day = ?",
+        (experience_id, day),
+    ).fetchone()
+    return row["refund_count"] if row else 0
+
+
+def _recount(conn, experience_id, day):
+    return conn.execute(
+        "SELECT COUNT(*) FROM booking_refund_records "
+        "WHERE experience_id = ? AND DATE(booking_date) = ? AND refund_requested_at IS NOT NULL",
+        (experience_id, day),
+    ).fetchone()[0]
+
+
+def test_refund_counts_backfilled_from_seed(conn):
+    rows = conn.execute(
+        "SELECT experience_id, booking_day, refund_count FROM experience_day_refund_counts"
+    ).fetchall()
+    assert rows
+    for r in rows:
+        assert r["refund_count"] == _recount(conn, r["experience_id"], r["booking_day"])
+
+
+def test_refund_counts_follow_booking_writes(conn):
+    b = conn.execute(
+        "SELECT booking_id, experience_id, booking_day FROM booking_refund_records "
+        "WHERE refund_requested_at IS NULL LIMIT 1"
+    ).fetchone()
+    before = _refund_count(conn, b["experience_id"], b["booking_day"])
+
+    conn.execute(
+        "UPDATE booking_refund_records SET refund_requested_at = '2026-02-25 09:00:00' WHERE booking_id = ?",
+        (b["booking_id"],),
+    )
+    assert _refund_count(conn, b["experience_id"], b["booking_day"]) == before + 1
+
+    conn.execute(
+        "UPDATE booking_refund_records SET booking_date = '2026-03-30 10:00:00' WHERE booking_id = ?",
+        (b["booking_id"],),
+    )
+    assert _refund_count(conn, b["experience_id"], b["booking_day"]) == before
+    assert _refund_count(conn, b["experience_id"], "2026-03-30") == 1
+
+    conn.execute("DELETE FROM booking_refund_records WHERE booking_id = ?", (b["booking_id"],))
+    assert _refund_count(conn, b["experience_id"], "2026-03-30") == 0
+
+
+def test_refund_counts_skip_bookings_without_a_booking_day(conn):
+    stored_columns = [r["name"] for r in conn.execute("PRAGMA table_info(booking_refund_records)")]
+    row = dict(conn.execute("SELECT * FROM booking_refund_records WHERE booking_id = 'CUST_018_B015'").fetchone())
+    row.update(booking_id="CUST_018_TBD", booking_date="TBD", refund_requested_at="2026-02-21 09:00:00")
+    before = conn.execute("SELECT SUM(refund_count) FROM experience_day_refund_counts").fetchone()[0]
+
+    conn.execute(
+        f"INSERT INTO booking_refund_records ({', '.join(stored_columns)}) "
+        f"VALUES ({', '.join('?' for _ in stored_columns)})",
+        tuple(row[c] for c in stored_columns),
+    )
+    assert conn.execute("SELECT SUM(refund_count) FROM experience_day_refund_counts").fetchone()[0] == before
+
+    conn.execute("UPDATE booking_refund_records SET booking_date = '2026-03-30' WHERE booking_id = 'CUST_018_TBD'")
+    assert _refund_count(conn, row["experience_id"], "2026-03-30") == 1
+    conn.execute("UPDATE booking_refund_records SET booking_date = 'TBD' WHERE booking_id = 'CUST_018_TBD'")
+    assert _refund_count(conn, row["experience_id"], "2026-03-30") == 0
+    conn.execute("DELETE FROM booking_refund_records WHERE booking_id = 'CUST_018_TBD'")
+    assert conn.execute("SELECT SUM(refund_count) FROM experience_day_refund_counts").fetchone()[0] == before
+
+
+def test_reseed_rebuilds_refund_counts(conn):
+    db_path = conn.execute("PRAGMA database_list").fetchone()["file"]
+    conn.execute("UPDATE booking_refund_records SET refund_requested_at = NULL WHERE refund_requested_at IS NOT NULL")
+    conn.commit()
+    conn.close()
+
+    create_database(db_path)
+    reseeded = get_connection(db_path)
+    try:
+        rows = reseeded.execute(
+            "SELECT experience_id, booking_day, refund_count FROM experience_day_refund_counts"
+        ).fetchall()
+        assert rows
+        for r in rows:
+            assert r["refund_count"] == _recount(reseeded, r["experience_id"], r["booking_day"])
+    finally:
+        reseeded.close()
+
+
+@pytest.mark.parametrize("value", [
+    "2026-02-20 10:00:00",
+    "2026-02-20",
+    "2024-02-29",
+    "2023-02-29",
+    "2026-2-5",
+    "2026-02-20T10:00:00",
+    "2026-02-20 24:00:00",
+    "2026-2-20 10:00:00",
+    "2026-02-20 9:05:00",
+    "2026-02-20 10:00",
+    "2026-02-20 10:00:00.5",
+    "2026-02-20 10:00:60",
+    "2026-02-20 10:00+01",
+    " 2026-02-20",
+    "2026-13-01",
+    "garbage",
+    "",
+    None,
+])
+def test_epoch_columns_agree_with_engine_parser(conn, value):
+    conn.execute(
+        "UPDATE booking_refund_records SET refund_requested_at = ? WHERE booking_id = 'CUST_018_B015'",
+        (value,),
+    )
+    stored = conn.execute(
+        "SELECT refund_requested_at_epoch FROM booking_refund_records WHERE booking_id = 'CUST_018_B015'"
+    ).fetchone()[0]
+    # Both paths accept and reject the same values
+    assert stored == epoch_seconds(value)
+    assert check_aggregates(conn, ["CUST_018"]) == []
+
+
+def test_unpadded_timestamps_count_as_missing_on_both_paths(conn):
+    conn.execute(
+        "UPDATE booking_refund_records SET refund_requested_at = '2026-2-20 10:00:00' "
+        "WHERE booking_id = (SELECT booking_id FROM booking_refund_records "
+        "WHERE customer_id = 'CUST_001' AND refund_requested_at IS NOT NULL LIMIT 1)"
+    )
+    conn.execute(
+        "UPDATE booking_refund_records SET booking_date = '2025-9-1' "
+        "WHERE booking_id = (SELECT booking_id FROM booking_refund_records WHERE customer_id = 'CUST_001' LIMIT 1)"
+    )
+    assert check_aggregates(conn, ["CUST_001"]) == []
+
+
+def test_customer_aggregates_backfilled_from_seed(conn):
+    assert check_aggregates(conn) == []
+
+
+def test_customer_aggregates_follow_booking_writes(conn):
+    before = get_aggregates("CUST_018", conn=conn)
+    stored_columns = [r["name"] for r in conn.execute("PRAGMA table_info(booking_refund_records)")]
+    row = dict(conn.execute(
+        "SELECT * FROM booking_refund_records WHERE booking_id = 'CUST_018_B015'"
+    ).fetchone())
+    row.update(
+        booking_id="CUST_018_NEW", refund_requested_at=None, refund_reason=None,
+        qr_checkin_confirmed=1, booking_date="2026-02-20 10:00:00", booking_created_at="2026-02-26 11:30:00",
+    )
+    conn.execute(
+        f"INSERT INTO booking_refund_records ({', '.join(stored_columns)}) "
+        f"VALUES ({', '.join('?' for _ in stored_columns)})",
+        tuple(row[c] for c in stored_columns),
+    )
+    conn.execute(
+        "UPDATE booking_refund_records SET refund_requested_at = '2026-02-21 09:00:00', "
+        "refund_reason = 'no_show' WHERE booking_id = 'CUST_018_NEW'"
+    )
+    after = get_aggregates("CUST_018", conn=conn)
+    assert after["total_bookings"] == before["total_bookings"] + 1
+    assert after["total_refunds"] == before["total_refunds"] + 1
+    assert after["refunds_recent"] == before["refunds_recent"] + 1
+    assert after["post_experience"] == before["post_experience"] + 1
+    assert after["no_show_contradicted"] == before["no_show_contradicted"] + 1
+    assert after["data_version"] == before["data_version"] + 2
+    assert check_aggregates(conn, ["CUST_018"]) == []
+
+    cust_001_version = get_aggregates("CUST_001", conn=conn)["data_version"]
+    conn.execute("UPDATE booking_refund_records SET customer_id = 'CUST_001' WHERE booking_id = 'CUST_018_NEW'")
+    assert check_aggregates(conn, ["CUST_018", "CUST_001"]) == []
+    assert get_aggregates("CUST_018", conn=conn)["data_version"] == after["data_version"] + 1
+    assert get_aggregates("CUST_001", conn=conn)["data_version"] == cust_001_version + 1
+    conn.execute("DELETE FROM booking_refund_records WHERE booking_id = 'CUST_018_NEW'")
+    assert check_aggregates(conn) == []
+
+
+def test_reseed_rebuilds_customer_aggregates(conn):
+    db_path = conn.execute("PRAGMA database_list").fetchone()["file"]
+    conn.execute("UPDATE booking_refund_records SET refund_requested_at = NULL WHERE customer_id = 'CUST_001'")
+    conn.execute("UPDATE booking_refund_records SET booking_date = '2026-02-25' WHERE customer_id = 'CUST_018'")
+    conn.commit()
+    conn.close()
+
+    create_database(db_path)
+    reseeded = get_connection(db_path)
+    try:
+        assert check_aggregates(reseeded) == []
+    finally:
+        reseeded.close()
+
+
+def test_rebuild_customer_aggregates_repairs_drift(conn):
+    conn.execute("UPDATE customer_booking_aggregates SET total_refunds = total_refunds + 5")
+    assert check_aggregates(conn)
+    assert rebuild_aggregates(conn) > 0
+    assert check_aggregates(conn) == []
+
+
+def test_profile_version_tracks_booking_writes(conn):
+    update_profile("CUST_018", conn=conn)
+    profile = get_profile("CUST_018", conn=conn)
+    assert not is_profile_stale(profile, conn=conn)
+
+    conn.execute(
+        "UPDATE booking_refund_records SET refund_requested_at = NULL WHERE booking_id = 'CUST_018_B015'"
+    )
+    conn.commit()
+    assert is_profile_stale(profile, conn=conn)
+    # agent notes are not booking/refund data
+    update_profile("CUST_018", conn=conn)
+    profile = get_profile("CUST_018", conn=conn)
+    conn.execute("UPDATE booking_refund_records SET agent_notes = 'x' WHERE booking_id = 'CUST_018_B015'")
+    conn.commit()
+    assert not is_profile_stale(profile, conn=conn)
+
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    is_profile_stale(profile, conn=conn)
+    conn.set_trace_callback(None)
+    assert statements == ["SELECT * FROM customer_booking_aggregates WHERE customer_id = 'CUST_018'"]
+
+
+def _decision_metrics(conn):
+    stored = dict(conn.execute("SELECT * FROM decision_metrics WHERE id = 0").fetchone())
+    stored.pop("id")
+    return stored, dict(conn.execute(DECISION_METRICS_RECOUNT).fetchone())
+
+
+def test_decision_metrics_follow_decision_log_writes(conn):
+    stored, recount = _decision_metrics(conn)
+    assert stored == recount
+
+    log_interaction("CUST_001", "CUST_001_B001", "auto_approved", None, "Approve", "Approve", conn=conn)
+    log_interaction("CUST_018", "CUST_018_B015", "medium_risk", 55, "Review", "Deny", conn=conn)
+    escalated = log_interaction("CUST_008", "CUST_008_B006", "high_risk", 80, "Escalate", "Escalate", conn=conn)
+    log_interaction("CUST_002", "CUST_002_B001", "vendor_anomaly", 10, "Approve", None, conn=conn)
+    update_l2_decision(escalated, "deny", "Pattern of abuse", conn=conn)
+    conn.commit()
+
+    after, recount = _decision_metrics(conn)
+    assert after == recount
+    assert after["total_processed"] == stored["total_processed"] + 4
+    assert after["auto_approved"] == stored["auto_approved"] + 1
+    assert after["agent_reviewed"] == stored["agent_reviewed"] + 1
+    assert after["escalated"] == stored["escalated"] + 1
+    assert after["overrides"] == stored["overrides"] + 1
+    assert after["vendor_anomalies"] == stored["vendor_anomalies"] + 1
+    assert after["risk_score_count"] == stored["risk_score_count"] + 3
+
+    conn.execute("UPDATE decision_log SET classification = 'low_risk', risk_score = 20 WHERE log_id = ?", (escalated,))
+    conn.execute("DELETE FROM decision_log WHERE classification = 'vendor_anomaly'")
+    stored, recount = _decision_metrics(conn)
+    assert stored == recount
@@ -0,0 +1,30 @@
+"""Tests for the templated response scripts (llm.script_templates)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm.script_templates import TEMPLATED_CLASSIFICATIONS, render_script
+
+
+def _auto_approved(rate):
+    return {"auto_approve": {"refund_amount": 65.0 * rate, "refund_rate": rate, "policy_basis": "cancelable"}}
+
+
+def test_auto_approved_scripts():
+    assert "full refund of $65.00" in render_script("auto_approved", "cancellation", _auto_approved(1.0))
+    partial = render_script("auto_approved", "technical_issue", _auto_approved(0.5))
+    assert "50% refund of $32.50" in partial and "cancellation window" not in partial
+
+
+def test_vendor_anomaly_script_names_experience_and_date():
+    evidence = {"anomaly": {"experience_name": "Rome Colosseum Guided Tour", "date": "2026-02-22 10:00:00"}}
+    script = render_script("vendor_anomaly", "no_show", evidence)
+    assert "Rome Colosseum Guided Tour on 2026-02-22" in script
+
+
+def test_untemplated_or_incomplete():
+    assert TEMPLATED_CLASSIFICATIONS == {"auto_approved", "vendor_anomaly"}
+    assert render_script("high_risk", "cancellation", {}) is None
+    assert render_script("auto_approved", "cancellation", {"auto_approve": None}) is None
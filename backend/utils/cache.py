@@ -0,0 +1,110 @@
+"""Small in-process caches shared by the engine and routes."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after being set.
+
+    Entries may carry a ``tag`` (e.g. a customer) so every entry for that tag
+    can be dropped at once with ``invalidate_tag``, and their own ``ttl``.
+    With ``maxbytes`` the cache is also bounded by the summed ``sizeof`` of
+    its values. ``stats()`` reports hit, miss and eviction counters for sizing.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic,
+                 maxbytes: int | None = None, sizeof: Callable[[Any], int] = len):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._clock = clock
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Hashable | None, Any]] = OrderedDict()
+        self._sizes: dict[Hashable, int] = {}
+        self._tags: dict[Hashable, set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "evictions", "expirations", "invalidations"), 0)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return default
+            expires_at, _, value = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tag: Hashable | None = None, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        size = self._sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), tag, value)
+            self._sizes[key] = size
+            self._bytes += size
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize or (
+                self.maxbytes is not None and self._bytes > self.maxbytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """Drop every entry stored under ``tag``; returns how many were dropped."""
+        with self._lock:
+            keys = self._tags.pop(tag, ())
+            for key in keys:
+                del self._entries[key]
+                self._bytes -= self._sizes.pop(key)
+            self._counters["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            bytes_stats = {} if self.maxbytes is None else {"bytes": self._bytes, "maxbytes": self.maxbytes}
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                **bytes_stats,
+                "ttl_seconds": self.ttl,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        _, tag, _ = self._entries.pop(key)
+        self._bytes -= self._sizes.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -1,59 +1,455 @@
 """Database connection and query helpers for the RAD System prototype."""
 
-import sqlite3
 import os
+import queue
+import sqlite3
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from time import perf_counter_ns
+from typing import Any
+
+from utils import perf
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "rad_seed_data.db")
 
+# Connection pool sizing. Sync routes hold one pooled connection per in-flight
+# request; async routes hold one only while they read or write (with_connection).
+POOL_SIZE = int(os.environ.get("RAD_DB_POOL_SIZE", "16"))
+POOL_TIMEOUT_SECONDS = float(os.environ.get("RAD_DB_POOL_TIMEOUT", "10"))
 
-def get_db_connection() -> sqlite3.Connection:
-    """Create a new database connection for each request."""
-    conn = sqlite3.connect(DB_PATH)
+# Max values bound into one IN (...) / VALUES list by multi-row fetches.
+IN_CLAUSE_CHUNK = 500
+
+# Storage profiles: PRAGMAs applied to every new connection, plus whether writes
+# go through a single serialized writer thread. "rollback" is SQLite's stock
+# behaviour; "wal" lets readers proceed while a write is in progress.
+STORAGE_PROFILES: dict[str, dict[str, Any]] = {
+    "rollback": {
+        "pragmas": {
+            "foreign_keys": "ON",
+            # INSERT OR REPLACE only fires DELETE triggers with this on, which
+            # the aggregate tables in utils/schema.py rely on.
+            "recursive_triggers": "ON",
+            "busy_timeout": 5000,
+        },
+        "serialized_writes": False,
+    },
+    "wal": {
+        "pragmas": {
+            "foreign_keys": "ON",
+            "recursive_triggers": "ON",
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64 * 1024,  # negative = KiB, i.e. 64 MiB per connection
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+        },
+        "serialized_writes": True,
+    },
+}
+STORAGE_PROFILE = os.environ.get("RAD_DB_PROFILE", "wal")
+
+# Max queued writes the writer thread folds into one transaction (group commit).
+WRITER_BATCH_SIZE = int(os.environ.get("RAD_DB_WRITER_BATCH", "64"))
+WRITER_TIMEOUT_SECONDS = float(os.environ.get("RAD_DB_WRITER_TIMEOUT", "30"))
+
+
+class RADConnection(sqlite3.Connection):
+    """sqlite3.Connection that remembers which database file it was opened on."""
+
+    db_path: str = ""
+
+
+class TimedRADConnection(RADConnection):
+    """RADConnection recording each statement's latency in utils.perf (used when RAD_PERF is on)."""
+
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        started = perf_counter_ns()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            perf.record("db", perf.sql_label(sql), perf_counter_ns() - started)
+
+    def executemany(self, sql: str, parameters, /) -> sqlite3.Cursor:
+        started = perf_counter_ns()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            perf.record("db", perf.sql_label(sql), perf_counter_ns() - started)
+
+
+def _connect(db_path: str, check_same_thread: bool = True,
+             profile: str | None = None) -> sqlite3.Connection:
+    factory = TimedRADConnection if perf.PERF_ENABLED else RADConnection
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, factory=factory)
+    conn.db_path = db_path
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    for name, value in STORAGE_PROFILES[profile or STORAGE_PROFILE]["pragmas"].items():
+        conn.execute(f"PRAGMA {name} = {value}")
     return conn
 
 
+def chunked(values: list, size: int = IN_CLAUSE_CHUNK) -> Iterator[list]:
+    """Split values into lists of at most ``size`` for multi-row lookups."""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """Create a new, unpooled database connection."""
+    return _connect(DB_PATH)
+
+
 def get_connection(db_path: str | None = None) -> sqlite3.Connection:
     if db_path is None:
         return get_db_connection()
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+    return _connect(db_path)
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections reused across requests.
+
+    Connections are opened lazily up to ``size`` and handed out one at a time.
+    They are created with ``check_same_thread=False`` because FastAPI may run a
+    request's dependency and its handler on different threadpool workers; a
+    connection is still only ever used by one request at a time.
+    """
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT_SECONDS,
+                 profile: str | None = None):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.profile = profile or STORAGE_PROFILE
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return _connect(self.db_path, check_same_thread=False, profile=self.profile)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No database connection available after {self.timeout}s (pool size {self.size})"
+            ) from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            conn.close()
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection: drop it and let the pool open a fresh one.
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SerializedWriter:
+    """Single background thread that owns the write connection for one database.
+
+    Writers enqueue a callable that receives the writer's connection. The thread
+    drains up to ``batch_size`` queued jobs, runs each inside its own SAVEPOINT
+    and commits them together, so concurrent request threads never contend for
+    SQLite's write lock and a failing job only rolls back its own changes.
+    Futures resolve after the shared COMMIT succeeds.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = WRITER_BATCH_SIZE,
+                 profile: str | None = None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.profile = profile or STORAGE_PROFILE
+        self._jobs: queue.Queue[tuple[Future, Callable[[sqlite3.Connection], Any]] | None] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="rad-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        future: Future = Future()
+        self._jobs.put((future, fn))
+        return future
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any], timeout: float | None = WRITER_TIMEOUT_SECONDS) -> Any:
+        return self.submit(fn).result(timeout=timeout)
 
+    def close(self) -> None:
+        self._jobs.put(None)
+        self._thread.join(timeout=WRITER_TIMEOUT_SECONDS)
 
-def query(sql: str, params: tuple = (), db_path: str | None = None) -> list[sqlite3.Row]:
-    conn = get_connection(db_path)
+    def _run(self) -> None:
+        conn = _connect(self.db_path, profile=self.profile)
+        conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        try:
+            stopping = False
+            while not stopping:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                batch = [job]
+                while len(batch) < self.batch_size:
+                    try:
+                        job = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stopping = True
+                        break
+                    batch.append(job)
+                try:
+                    self._apply(conn, batch)
+                except Exception as exc:
+                    # Never let one batch end the only writer thread.
+                    _fail((future for future, _ in batch), exc)
+                    if conn.in_transaction:
+                        _quietly(conn, "ROLLBACK")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, batch: list) -> None:
+        """Run a batch in one transaction.
+
+        SQLite may roll the whole transaction back on its own (SQLITE_FULL,
+        SQLITE_IOERR, a job ending it); the remaining jobs and those already
+        run then fail with the error that ended it.
+        """
+        done: list[tuple[Future, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as exc:
+            _fail((future for future, _ in batch), exc)
+            return
+
+        for index, (future, fn) in enumerate(batch):
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                conn.execute("SAVEPOINT rad_write")
+                try:
+                    result = fn(conn)
+                except BaseException as exc:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK TO rad_write")
+                        conn.execute("RELEASE rad_write")
+                    future.set_exception(exc)
+                else:
+                    conn.execute("RELEASE rad_write")
+                    done.append((future, result))
+            except sqlite3.Error as exc:
+                _fail([future], exc)
+                if conn.in_transaction:
+                    _quietly(conn, "ROLLBACK")
+                _fail((f for f, _ in done), exc)
+                _fail((f for f, _ in batch[index + 1:]), exc)
+                return
+            if not conn.in_transaction:
+                exc = sqlite3.OperationalError("transaction was rolled back")
+                _fail((f for f, _ in done), exc)
+                _fail((f for f, _ in batch[index + 1:]), exc)
+                return
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            if conn.in_transaction:
+                _quietly(conn, "ROLLBACK")
+            _fail((future for future, _ in done), exc)
+            return
+        for future, result in done:
+            future.set_result(result)
+
+
+def _fail(futures, exc: BaseException) -> None:
+    for future in futures:
+        if not future.done():
+            future.set_exception(exc)
+
+
+def _quietly(conn: sqlite3.Connection, sql: str) -> None:
+    """Cleanup statement whose own failure must not mask the original error."""
     try:
-        return conn.execute(sql, params).fetchall()
-    finally:
-        conn.close()
+        conn.execute(sql)
+    except sqlite3.Error:
+        pass
+
+
+_pools: dict[str, ConnectionPool] = {}
+_writers: dict[str, SerializedWriter] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str | None = None) -> ConnectionPool:
+    path = db_path or DB_PATH
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = ConnectionPool(path)
+                _pools[path] = pool
+    return pool
+
+
+def get_writer(db_path: str | None = None) -> SerializedWriter:
+    path = db_path or DB_PATH
+    writer = _writers.get(path)
+    if writer is None:
+        with _pools_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                writer = SerializedWriter(path)
+                _writers[path] = writer
+    return writer
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for writer in _writers.values():
+            writer.close()
+        _writers.clear()
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def _write_path(conn: sqlite3.Connection | None, db_path: str | None) -> str | None:
+    """Database file to hand to the serialized writer, or None to write in place.
 
+    Writes are only rerouted for connections this module opened (so we know
+    which file they point at) and only when the active profile asks for it.
+    """
+    if not STORAGE_PROFILES[STORAGE_PROFILE]["serialized_writes"]:
+        return None
+    if conn is None:
+        return db_path or DB_PATH
+    return getattr(conn, "db_path", None) or None
 
-def query_one(sql: str, params: tuple = (), db_path: str | None = None) -> sqlite3.Row | None:
-    conn = get_connection(db_path)
+
+def get_db() -> Iterator[sqlite3.Connection]:
+    """FastAPI dependency: one pooled connection for the lifetime of a request.
+
+    For sync routes only. An async route awaiting the LLM would keep the
+    connection for the whole call, capping in-flight LLM requests at the pool
+    size; those run their database phases through ``with_connection``.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
     try:
-        return conn.execute(sql, params).fetchone()
+        yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+
+def with_connection(fn: Callable[..., Any], *args: Any) -> Any:
+    """Call ``fn(conn, *args)`` on a pooled connection that is released when it returns.
+
+    Blocking; async routes run it in the threadpool for each database phase.
+    """
+    with get_pool().connection() as conn:
+        return fn(conn, *args)
+
+
+@contextmanager
+def _use(conn: sqlite3.Connection | None, db_path: str | None) -> Iterator[sqlite3.Connection]:
+    """Use the caller's connection if given, otherwise borrow one from the pool."""
+    if conn is not None:
+        yield conn
+        return
+    with get_pool(db_path).connection() as pooled:
+        yield pooled
+
+
+def query(sql: str, params: tuple = (), db_path: str | None = None,
+          conn: sqlite3.Connection | None = None) -> list[sqlite3.Row]:
+    with _use(conn, db_path) as c:
+        return c.execute(sql, params).fetchall()
 
 
-def execute(sql: str, params: tuple = (), db_path: str | None = None) -> int:
+def query_one(sql: str, params: tuple = (), db_path: str | None = None,
+              conn: sqlite3.Connection | None = None) -> sqlite3.Row | None:
+    with _use(conn, db_path) as c:
+        return c.execute(sql, params).fetchone()
+
+
+def execute(sql: str, params: tuple = (), db_path: str | None = None,
+            conn: sqlite3.Connection | None = None) -> int:
     """Execute a write operation. Returns lastrowid."""
-    conn = get_connection(db_path)
-    try:
-        cur = conn.execute(sql, params)
-        conn.commit()
+    write_path = _write_path(conn, db_path)
+    if write_path is not None:
+        return get_writer(write_path).run(lambda c: c.execute(sql, params).lastrowid)
+    with _use(conn, db_path) as c:
+        cur = c.execute(sql, params)
+        c.commit()
         return cur.lastrowid
-    finally:
-        conn.close()
 
 
-def execute_many(sql: str, params_list: list[tuple], db_path: str | None = None) -> None:
-    conn = get_connection(db_path)
-    try:
-        conn.executemany(sql, params_list)
-        conn.commit()
-    finally:
-        conn.close()
+def execute_many(sql: str, params_list: list[tuple], db_path: str | None = None,
+                 conn: sqlite3.Connection | None = None) -> None:
+    write_path = _write_path(conn, db_path)
+    if write_path is not None:
+        get_writer(write_path).run(lambda c: c.executemany(sql, params_list))
+        return
+    with _use(conn, db_path) as c:
+        c.executemany(sql, params_list)
+        c.commit()
+
+
+def write_transaction(fn: Callable[[sqlite3.Connection], Any], db_path: str | None = None,
+                      conn: sqlite3.Connection | None = None) -> Any:
+    """Run ``fn(conn)`` as one write transaction; returns its result.
+
+    Routed through the serialized writer like ``execute``, so several
+    statements (e.g. a read-modify-delete) commit or roll back together.
+    """
+    write_path = _write_path(conn, db_path)
+    if write_path is not None:
+        return get_writer(write_path).run(fn)
+    with _use(conn, db_path) as c:
+        try:
+            result = fn(c)
+        except BaseException:
+            c.rollback()
+            raise
+        c.commit()
+        return result
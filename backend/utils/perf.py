@@ -0,0 +1,253 @@
+"""Latency histograms per engine stage, DB statement, LLM call and endpoint.
+
+Each histogram is HDR-style: log-linear buckets over nanoseconds with
+``SUB_BUCKETS`` linear sub-buckets per power of two, so any recorded value is
+reported within 1/``SUB_BUCKETS`` (about 6%) of its true value, from
+nanoseconds to minutes, in ``BUCKET_COUNT`` (608) counters. Recording is a
+bucket index computation and a counter increment under a lock, about a
+microsecond.
+
+Sources, by ``kind``:
+
+- ``stage``: functions decorated with ``@timed`` (the engine layers).
+- ``db``: every statement run on a connection from ``utils.db`` (execution
+  up to the first row), labelled ``<verb>:<table>``.
+- ``llm``: each completion call per model (``llm.client``), and
+  ``llm_ttft`` for time to first streamed token.
+- ``endpoint``: each request, labelled by method and route template
+  (``PerfMiddleware``), including the time to send a streamed body.
+
+``RAD_PERF=0`` turns it off. The decorator then returns the function itself,
+connections are plain, and the middleware is not installed, so disabled
+instrumentation costs nothing. Exposed at ``/api/metrics/perf`` as JSON or
+Prometheus text.
+"""
+
+import functools
+import os
+import re
+import threading
+from collections.abc import Callable
+from time import perf_counter_ns
+
+PERF_ENABLED = os.environ.get("RAD_PERF", "1") != "0"
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Durations up to 2**40 ns (about 18 minutes) get their own bucket; longer ones share the last.
+MAX_TRACKABLE_BITS = 40
+REPORTED_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(value: int) -> int:
+    """Bucket for a non-negative integer: exact below 2*SUB_BUCKETS, then SUB_BUCKETS per power of two."""
+    if value < 2 * SUB_BUCKETS:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return min(shift * SUB_BUCKETS + (value >> shift), BUCKET_COUNT - 1)
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """Inclusive (lowest, highest) value that maps to ``index``."""
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = (index - SUB_BUCKETS) // SUB_BUCKETS
+    mantissa = index - shift * SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+BUCKET_COUNT = (MAX_TRACKABLE_BITS - SUB_BUCKET_BITS) * SUB_BUCKETS + 2 * SUB_BUCKETS
+
+
+class Histogram:
+    """Thread-safe log-linear histogram of nanosecond durations."""
+
+    __slots__ = ("_counts", "_lock", "count", "total", "min", "max")
+
+    def __init__(self):
+        self._counts = [0] * BUCKET_COUNT
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, nanos: int) -> None:
+        # bucket_index, inlined: this runs on every instrumented call.
+        if nanos < 2 * SUB_BUCKETS:
+            index = nanos if nanos > 0 else 0
+        else:
+            shift = nanos.bit_length() - SUB_BUCKET_BITS - 1
+            index = (shift << SUB_BUCKET_BITS) + (nanos >> shift)
+            if index >= BUCKET_COUNT:
+                index = BUCKET_COUNT - 1
+        with self._lock:
+            self._counts[index] += 1
+            if nanos > self.max:
+                self.max = nanos
+            if nanos < self.min or not self.count:
+                self.min = nanos
+            self.count += 1
+            self.total += nanos
+
+    def percentile(self, pct: float) -> int:
+        """Highest value equivalent to the ``pct``-th percentile (HDR convention), in nanoseconds."""
+        with self._lock:
+            if not self.count:
+                return 0
+            target = max(1, -(-self.count * pct // 100))
+            seen = 0
+            for index, bucket_count in enumerate(self._counts):
+                seen += bucket_count
+                if seen >= target:
+                    if index == BUCKET_COUNT - 1:
+                        return self.max
+                    return min(bucket_bounds(index)[1], self.max)
+            return self.max
+
+    def summary(self) -> dict:
+        """Count and latencies in microseconds."""
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        return {
+            "count": count,
+            "mean_us": round(total / count / 1000, 3) if count else 0.0,
+            "min_us": round(low / 1000, 3),
+            **{
+                f"p{pct:g}_us".replace(".", "_"): round(self.percentile(pct) / 1000, 3)
+                for pct in REPORTED_PERCENTILES
+            },
+            "max_us": round(high / 1000, 3),
+        }
+
+
+_histograms: dict[tuple[str, str], Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(kind: str, name: str) -> Histogram:
+    hist = _histograms.get((kind, name))
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault((kind, name), Histogram())
+    return hist
+
+
+def record(kind: str, name: str, nanos: int) -> None:
+    histogram(kind, name).record(nanos)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator recording each call's duration as ``stage`` ``name``; a no-op when disabled."""
+    def decorate(fn: Callable) -> Callable:
+        if not PERF_ENABLED:
+            return fn
+        hist = histogram("stage", name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.record(perf_counter_ns() - started)
+
+        return wrapper
+
+    return decorate
+
+
+_SQL_LABEL_RE = re.compile(
+    r"^\s*(?:WITH\b.*?\)\s*)?(\w+)(?:.*?\b(?:FROM|INTO|TABLE|INDEX\s+\w+\s+ON)\s+(\w+))?",
+    re.IGNORECASE | re.DOTALL,
+)
+_SQL_UPDATE_RE = re.compile(r"^\s*UPDATE\s+(?:OR\s+\w+\s+)?(\w+)", re.IGNORECASE)
+_sql_labels: dict[str, str] = {}
+SQL_LABEL_CACHE_SIZE = 2048
+
+
+def sql_label(sql: str) -> str:
+    """``verb:table`` for a statement (e.g. ``select:booking_refund_records``), cached per SQL string."""
+    label = _sql_labels.get(sql)
+    if label is None:
+        match = _SQL_UPDATE_RE.match(sql) or _SQL_LABEL_RE.match(sql)
+        if match is None:
+            verb, table = "other", ""
+        elif match.re is _SQL_UPDATE_RE:
+            verb, table = "update", match.group(1).lower()
+        else:
+            verb, table = match.group(1).lower(), (match.group(2) or "").lower()
+        label = f"{verb}:{table}" if table else verb
+        if len(_sql_labels) < SQL_LABEL_CACHE_SIZE:
+            _sql_labels[sql] = label
+    return label
+
+
+class PerfMiddleware:
+    """ASGI middleware recording request latency per method and route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter_ns()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            record("endpoint", f"{scope['method']} {_route_label(scope)}", perf_counter_ns() - started)
+
+
+def _route_label(scope) -> str:
+    """Route template with its router prefix (newer FastAPI reports included routes without it)."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    for index in range(1, len(path)):
+        if path[index] == "/" and regex.match(path[index:]):
+            return path[:index] + template
+    return template
+
+
+def reset() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def snapshot() -> dict:
+    """JSON view: ``{kind: {name: summary}}``."""
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    result: dict = {"enabled": PERF_ENABLED, "unit": "microseconds", "histograms": {}}
+    for (kind, name), hist in items:
+        result["histograms"].setdefault(kind, {})[name] = hist.summary()
+    return result
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Prometheus exposition format: one summary (quantiles, _sum, _count) per histogram, in seconds."""
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    lines = [
+        "# HELP rad_latency_seconds Latency per endpoint, engine stage, DB statement and LLM call.",
+        "# TYPE rad_latency_seconds summary",
+    ]
+    for (kind, name), hist in items:
+        labels = f'kind="{kind}",name="{_label_value(name)}"'
+        for pct in REPORTED_PERCENTILES:
+            value = hist.percentile(pct) / 1e9
+            lines.append(f'rad_latency_seconds{{{labels},quantile="{pct / 100:g}"}} {value:.9f}')
+        lines.append(f"rad_latency_seconds_sum{{{labels}}} {hist.total / 1e9:.9f}")
+        lines.append(f"rad_latency_seconds_count{{{labels}}} {hist.count}")
+    return "\n".join(lines) + "\n"
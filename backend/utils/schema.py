@@ -0,0 +1,587 @@
+"""Idempotent schema additions (derived columns, indexes, aggregate tables) applied on startup.
+
+The base tables are created by ``data.generate_seed_data``; everything here
+can be re-run safely against an existing database.
+"""
+
+import sqlite3
+from collections.abc import Callable
+
+from engine.config import RECENCY_DECAY_DAYS, RECENCY_FULL_WEIGHT_DAYS
+from engine.timestamps import NOW_EPOCH, SECONDS_PER_DAY
+from utils.db import get_connection
+
+
+def _epoch_column(source: str) -> str:
+    # Integer seconds since 1970, only for values that survive a round trip
+    # through julianday() unchanged, i.e. valid "YYYY-MM-DD[ HH:MM:SS]".
+    # Anything else (2023-02-29, unpadded fields) stays NULL, and
+    # engine.timestamps.parse_ts rejects the same values.
+    return (
+        f"INTEGER GENERATED ALWAYS AS (CASE WHEN {source} IN "
+        f"(datetime(julianday({source})), date(julianday({source}))) "
+        f"THEN CAST(strftime('%s', {source}) AS INTEGER) END) VIRTUAL"
+    )
+
+
+# (table, column, definition, backfill SQL). Added with ALTER TABLE when
+# missing from an existing table; the backfill runs only right after the
+# ALTER. Generated columns are computed by SQLite on every insert/update, so
+# they can never drift from their source column; indexing them persists the
+# value. SQLite cannot add STORED generated columns to an existing table,
+# hence VIRTUAL.
+COLUMNS: list[tuple[str, str, str, str | None]] = [
+    # Layer 0 compares calendar days; DATE(booking_date) in a WHERE clause
+    # cannot use an index, this column can.
+    (
+        "booking_refund_records",
+        "booking_day",
+        "TEXT GENERATED ALWAYS AS (DATE(booking_date)) VIRTUAL",
+        None,
+    ),
+    # Engine timestamp comparisons (engine/timestamps.row_epoch)
+    ("booking_refund_records", "booking_date_epoch", _epoch_column("booking_date"), None),
+    ("booking_refund_records", "refund_requested_at_epoch", _epoch_column("refund_requested_at"), None),
+    ("booking_refund_records", "booking_created_at_epoch", _epoch_column("booking_created_at"), None),
+    ("customer_profiles", "account_created_at_epoch", _epoch_column("account_created_at"), None),
+    # Profile staleness check: compared with customer_booking_aggregates.data_version
+    ("customer_booking_aggregates", "data_version", "INTEGER NOT NULL DEFAULT 0", None),
+    # Note-signal staleness check: compared with customer_note_signals.notes_version.
+    # Rows stored before the column existed stay NULL and are re-extracted once.
+    ("customer_booking_aggregates", "notes_version", "INTEGER NOT NULL DEFAULT 0", None),
+    ("customer_note_signals", "notes_version", "INTEGER", None),
+    (
+        "customer_profiles",
+        "profile_version",
+        "INTEGER",
+        # Every data_version starts at 0. Profiles that are current by the
+        # previous timestamp comparison start current; the rest stay NULL
+        # (stale) and are recomputed on next read.
+        """
+        UPDATE customer_profiles SET profile_version = 0
+        WHERE last_profile_computed_at IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM booking_refund_records b
+              WHERE b.customer_id = customer_profiles.customer_id
+                AND (b.booking_created_at > customer_profiles.last_profile_computed_at
+                     OR b.refund_requested_at > customer_profiles.last_profile_computed_at)
+          )
+        """,
+    ),
+]
+
+
+# Columns added for the engine and the derived tables; API responses leave them out.
+INTERNAL_COLUMNS = frozenset(column for _, column, _, _ in COLUMNS)
+
+
+def public_row(row: sqlite3.Row | dict) -> dict:
+    """``row`` as a dict without INTERNAL_COLUMNS, for API responses."""
+    return {key: value for key, value in dict(row).items() if key not in INTERNAL_COLUMNS}
+
+
+def _days_before_now(epoch: str) -> str:
+    # Floored like timedelta.days; SQLite's integer division truncates toward zero.
+    delta = f"({NOW_EPOCH} - {epoch})"
+    return f"({delta} / {SECONDS_PER_DAY} - ({delta} % {SECONDS_PER_DAY} < 0))"
+
+
+def _recency_buckets(epoch: str) -> tuple[str, str, str]:
+    # Layer 2 buckets with its ``days or 999`` quirk: missing and same-day
+    # timestamps count as old. Buckets are relative to the fixed NOW, so a
+    # row's bucket never changes after it is written.
+    days = _days_before_now(epoch)
+    old = f"({epoch} IS NULL OR {days} = 0)"
+    return (
+        f"(NOT {old} AND {days} <= {RECENCY_FULL_WEIGHT_DAYS})",
+        f"(NOT {old} AND {days} > {RECENCY_FULL_WEIGHT_DAYS} AND {days} <= {RECENCY_DECAY_DAYS})",
+        f"({old} OR {days} > {RECENCY_DECAY_DAYS})",
+    )
+
+
+def _customer_aggregate_terms(r: str) -> list[tuple[str, str]]:
+    """(column, contribution of booking row ``r``) for customer_booking_aggregates."""
+    refunded = f"({r}.refund_requested_at IS NOT NULL)"
+    booked, requested = f"{r}.booking_date_epoch", f"{r}.refund_requested_at_epoch"
+    b_recent, b_mid, b_old = _recency_buckets(booked)
+    r_recent, r_mid, r_old = _recency_buckets(requested)
+    timed = f"{refunded} AND {requested} IS NOT NULL AND {booked} IS NOT NULL"
+    has_percentile = f"{refunded} AND {r}.experience_value_percentile IS NOT NULL"
+    no_show = f"{refunded} AND {r}.refund_reason IS 'no_show'"
+    return [
+        ("total_bookings", "1"),
+        ("total_refunds", refunded),
+        ("refunds_recent", f"({refunded} AND {r_recent})"),
+        ("refunds_mid", f"({refunded} AND {r_mid})"),
+        ("refunds_old", f"({refunded} AND {r_old})"),
+        ("bookings_recent", b_recent),
+        ("bookings_mid", b_mid),
+        ("bookings_old", b_old),
+        ("email_known", f"({r}.confirmation_opened IS NOT NULL)"),
+        ("email_opened", f"(COALESCE({r}.confirmation_opened, 0) != 0)"),
+        ("post_experience", f"({timed} AND {requested} > {booked})"),
+        ("pre_experience", f"({timed} AND {requested} <= {booked})"),
+        ("percentile_sum", f"(CASE WHEN {has_percentile} THEN {r}.experience_value_percentile ELSE 0 END)"),
+        ("percentile_count", f"({has_percentile})"),
+        ("no_show_claims", f"({no_show})"),
+        ("no_show_contradicted", f"({no_show} AND COALESCE({r}.qr_checkin_confirmed, 0) != 0)"),
+    ]
+
+
+CUSTOMER_AGGREGATE_COLUMNS: list[str] = [col for col, _ in _customer_aggregate_terms("r")]
+
+
+def _escalated(r: str) -> str:
+    return f"COALESCE({r}.escalated_to_l2 = 1, 0)"
+
+
+def _overridden(r: str) -> str:
+    return f"COALESCE({r}.agent_decision != {r}.recommended_action, 0)"
+
+
+def _decision_metric_terms(r: str) -> list[tuple[str, str]]:
+    """(column, contribution of decision_log row ``r``) for decision_metrics (GET /api/metrics)."""
+    scored = f"({r}.risk_score IS NOT NULL)"
+    return [
+        ("total_processed", "1"),
+        ("auto_approved", f"({r}.classification IS 'auto_approved')"),
+        ("agent_reviewed", f"COALESCE({r}.classification IN ('low_risk', 'medium_risk'), 0)"),
+        ("escalated", _escalated(r)),
+        ("overrides", _overridden(r)),
+        ("vendor_anomalies", f"({r}.classification IS 'vendor_anomaly')"),
+        ("risk_score_sum", f"(CASE WHEN {scored} THEN {r}.risk_score ELSE 0 END)"),
+        ("risk_score_count", scored),
+    ]
+
+
+DECISION_METRIC_COLUMNS: list[str] = [col for col, _ in _decision_metric_terms("r")]
+
+# The same counts in one grouped pass over decision_log: the backfill, and
+# what the stored row is checked against.
+DECISION_METRICS_RECOUNT = f"""
+    SELECT {", ".join(f"COALESCE(SUM({term}), 0) AS {col}" for col, term in _decision_metric_terms("r"))}
+    FROM decision_log AS r
+"""
+
+# Storage tiers of decision_metrics_rollup, finest first. Triggers write
+# minute buckets; engine/decision_metrics.compact_rollups folds old ones into
+# the coarser tiers.
+ROLLUP_GRANULARITIES = ("minute", "hour", "day")
+ROLLUP_KEY = "granularity, bucket_start, classification, escalated, overridden"
+
+
+def _minute_bucket(r: str) -> str:
+    # A decision without a parseable timestamp counts towards the current minute.
+    return (
+        f"COALESCE(strftime('%Y-%m-%d %H:%M:00', {r}.timestamp), "
+        "strftime('%Y-%m-%d %H:%M:00', 'now'))"
+    )
+
+# (name, DDL, backfill SQL). Aggregate tables kept in sync by TRIGGERS; the
+# backfill runs only when the table is first created.
+TABLES: list[tuple[str, str, str | None]] = [
+    # Layer 0: refunded bookings per experience per calendar day
+    (
+        "experience_day_refund_counts",
+        """
+        CREATE TABLE IF NOT EXISTS experience_day_refund_counts (
+            experience_id TEXT NOT NULL,
+            booking_day TEXT NOT NULL,
+            refund_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (experience_id, booking_day)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT INTO experience_day_refund_counts (experience_id, booking_day, refund_count)
+        SELECT experience_id, booking_day, COUNT(*)
+        FROM booking_refund_records
+        WHERE refund_requested_at IS NOT NULL AND booking_day IS NOT NULL
+        GROUP BY experience_id, booking_day
+        """,
+    ),
+    # Layer 2 and profile refresh: everything they derive from a customer's
+    # history, so neither needs to read it (engine/aggregates.py)
+    (
+        "customer_booking_aggregates",
+        f"""
+        CREATE TABLE IF NOT EXISTS customer_booking_aggregates (
+            customer_id TEXT PRIMARY KEY,
+            {", ".join(f"{col} {'NUMERIC' if col == 'percentile_sum' else 'INTEGER'} NOT NULL DEFAULT 0"
+                       for col in CUSTOMER_AGGREGATE_COLUMNS)},
+            data_version INTEGER NOT NULL DEFAULT 0,
+            notes_version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        f"""
+        INSERT INTO customer_booking_aggregates
+            (customer_id, {", ".join(CUSTOMER_AGGREGATE_COLUMNS)})
+        SELECT r.customer_id, {", ".join(f"SUM({term})" for _, term in _customer_aggregate_terms("r"))}
+        FROM booking_refund_records AS r
+        GROUP BY r.customer_id
+        """,
+    ),
+    # GET /api/metrics: running dashboard counts over the whole decision log,
+    # one row (id 0)
+    (
+        "decision_metrics",
+        f"""
+        CREATE TABLE IF NOT EXISTS decision_metrics (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            {", ".join(f"{col} {'NUMERIC' if col == 'risk_score_sum' else 'INTEGER'} NOT NULL DEFAULT 0"
+                       for col in DECISION_METRIC_COLUMNS)}
+        )
+        """,
+        f"""
+        INSERT INTO decision_metrics (id, {", ".join(DECISION_METRIC_COLUMNS)})
+        SELECT 0, * FROM ({DECISION_METRICS_RECOUNT})
+        """,
+    ),
+    # GET /api/metrics/timeseries: decisions per time bucket, classification,
+    # escalation and override (engine/decision_metrics.py)
+    (
+        "decision_metrics_rollup",
+        """
+        CREATE TABLE IF NOT EXISTS decision_metrics_rollup (
+            granularity TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            classification TEXT NOT NULL,
+            escalated INTEGER NOT NULL,
+            overridden INTEGER NOT NULL,
+            decisions INTEGER NOT NULL DEFAULT 0,
+            risk_score_sum NUMERIC NOT NULL DEFAULT 0,
+            risk_score_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket_start, classification, escalated, overridden)
+        ) WITHOUT ROWID
+        """,
+        f"""
+        INSERT INTO decision_metrics_rollup ({ROLLUP_KEY}, decisions, risk_score_sum, risk_score_count)
+        SELECT 'minute', {_minute_bucket("r")}, COALESCE(r.classification, ''), {_escalated("r")},
+               {_overridden("r")}, COUNT(*), COALESCE(SUM(r.risk_score), 0), COUNT(r.risk_score)
+        FROM decision_log AS r
+        GROUP BY 2, 3, 4, 5
+        """,
+    ),
+    # LLM signals extracted from a customer's agent notes, stored with the
+    # customer's notes_version and a hash of the notes they were computed from
+    # (llm/note_store.py)
+    (
+        "customer_note_signals",
+        """
+        CREATE TABLE IF NOT EXISTS customer_note_signals (
+            customer_id TEXT PRIMARY KEY,
+            notes_hash TEXT NOT NULL,
+            signals TEXT NOT NULL,
+            computed_at TEXT NOT NULL,
+            notes_version INTEGER
+        ) WITHOUT ROWID
+        """,
+        None,
+    ),
+]
+
+# TABLES derived from the seed tables. A backfill only runs for a new table,
+# so data/generate_seed_data.create_database drops these together with the
+# tables they are computed from.
+SEED_DERIVED_TABLES = ("experience_day_refund_counts", "customer_booking_aggregates", "customer_note_signals")
+
+# A booking_date that is not a date ('TBD') has no booking_day; Layer 0 never
+# matches such a booking, so it is not counted.
+_REFUND_COUNT_UP = """
+    INSERT INTO experience_day_refund_counts (experience_id, booking_day, refund_count)
+    SELECT NEW.experience_id, NEW.booking_day, 1
+    WHERE NEW.refund_requested_at IS NOT NULL AND NEW.booking_day IS NOT NULL
+    ON CONFLICT (experience_id, booking_day) DO UPDATE SET refund_count = refund_count + 1;
+"""
+_REFUND_COUNT_DOWN = """
+    UPDATE experience_day_refund_counts SET refund_count = refund_count - 1
+    WHERE OLD.refund_requested_at IS NOT NULL AND OLD.booking_day IS NOT NULL
+      AND experience_id = OLD.experience_id AND booking_day = OLD.booking_day;
+"""
+
+_CUSTOMER_AGGREGATE_UP = f"""
+    INSERT INTO customer_booking_aggregates
+        (customer_id, {", ".join(CUSTOMER_AGGREGATE_COLUMNS)})
+    VALUES (NEW.customer_id, {", ".join(term for _, term in _customer_aggregate_terms("NEW"))})
+    ON CONFLICT (customer_id) DO UPDATE SET
+        {", ".join(f"{col} = {col} + excluded.{col}" for col in CUSTOMER_AGGREGATE_COLUMNS)};
+"""
+_CUSTOMER_AGGREGATE_DOWN = f"""
+    UPDATE customer_booking_aggregates SET
+        {", ".join(f"{col} = {col} - {term}" for col, term in _customer_aggregate_terms("OLD"))}
+    WHERE customer_id = OLD.customer_id;
+"""
+_CUSTOMER_AGGREGATE_SOURCES = (
+    "customer_id, booking_date, booking_created_at, refund_requested_at, refund_reason, "
+    "confirmation_opened, experience_value_percentile, qr_checkin_confirmed"
+)
+
+# Profile staleness: every booking/refund write bumps the customer's
+# data_version; update_profile stores the version it computed from.
+_DATA_VERSION_BUMP = """
+    INSERT INTO customer_booking_aggregates (customer_id, data_version) VALUES ({r}.customer_id, 1)
+    ON CONFLICT (customer_id) DO UPDATE SET data_version = data_version + 1;
+"""
+
+# Note-signal staleness: every write that changes what collect_agent_notes
+# returns for a customer (a non-empty note, or the columns it is dated and
+# ordered by) bumps their notes_version; note_store stores the version it
+# extracted from.
+_NOTES_VERSION_BUMP = """
+    INSERT INTO customer_booking_aggregates (customer_id, notes_version) VALUES ({r}.customer_id, 1)
+    ON CONFLICT (customer_id) DO UPDATE SET notes_version = notes_version + 1;
+"""
+_NOTES_VERSION_SOURCES = "agent_notes, refund_requested_at, booking_date, customer_id"
+
+
+def _has_note(r: str) -> str:
+    return f"COALESCE({r}.agent_notes, '') != ''"
+
+
+_DECISION_METRICS_UP = f"""
+    INSERT INTO decision_metrics (id, {", ".join(DECISION_METRIC_COLUMNS)})
+    VALUES (0, {", ".join(term for _, term in _decision_metric_terms("NEW"))})
+    ON CONFLICT (id) DO UPDATE SET
+        {", ".join(f"{col} = {col} + excluded.{col}" for col in DECISION_METRIC_COLUMNS)};
+"""
+_DECISION_METRICS_DOWN = f"""
+    UPDATE decision_metrics SET
+        {", ".join(f"{col} = {col} - {term}" for col, term in _decision_metric_terms("OLD"))}
+    WHERE id = 0;
+"""
+_DECISION_METRICS_SOURCES = "classification, risk_score, recommended_action, agent_decision, escalated_to_l2"
+
+
+def _decision_rollup_add(r: str, sign: str = "") -> str:
+    """Add (or with ``sign="-"``, remove) row ``r`` in its minute bucket.
+
+    Removals also land in the minute tier, keyed by the row's own time; the
+    tiers are summed when read and when compacted, so a removal is exact
+    even after the original bucket was folded into an hour or day.
+    """
+    return f"""
+    INSERT INTO decision_metrics_rollup ({ROLLUP_KEY}, decisions, risk_score_sum, risk_score_count)
+    VALUES ('minute', {_minute_bucket(r)}, COALESCE({r}.classification, ''), {_escalated(r)}, {_overridden(r)},
+            {sign}1, {sign}COALESCE({r}.risk_score, 0), {sign}({r}.risk_score IS NOT NULL))
+    ON CONFLICT ({ROLLUP_KEY}) DO UPDATE SET
+        decisions = decisions + excluded.decisions,
+        risk_score_sum = risk_score_sum + excluded.risk_score_sum,
+        risk_score_count = risk_score_count + excluded.risk_score_count;
+"""
+
+
+_DECISION_ROLLUP_SOURCES = f"timestamp, {_DECISION_METRICS_SOURCES}"
+
+# Booking columns no engine layer or profile computation reads. Every other
+# column feeds an assessment (Layer 1 and 3 read the policy and confirmation
+# columns directly), so changing any of them must change data_version.
+DATA_VERSION_IGNORED_COLUMNS = frozenset({"agent_notes"})
+
+
+def _data_version_update_trigger(conn: sqlite3.Connection) -> str:
+    # Built from the table's current columns, so a column added later is
+    # covered the next time the schema is applied.
+    changed = " OR ".join(
+        f"OLD.{row[1]} IS NOT NEW.{row[1]}"
+        for row in conn.execute("PRAGMA table_info(booking_refund_records)").fetchall()
+        if row[1] not in DATA_VERSION_IGNORED_COLUMNS
+    )
+    return (
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_data_version_update "
+        f"AFTER UPDATE ON booking_refund_records WHEN {changed} BEGIN"
+        + _DATA_VERSION_BUMP.format(r="NEW")
+        + """
+    UPDATE customer_booking_aggregates SET data_version = data_version + 1
+    WHERE customer_id = OLD.customer_id AND OLD.customer_id IS NOT NEW.customer_id;
+END"""
+    )
+
+
+# (name, DDL, or a function of the connection returning it). A trigger whose
+# stored definition differs from its DDL is dropped and recreated.
+TRIGGERS: list[tuple[str, str | Callable[[sqlite3.Connection], str]]] = [
+    (
+        "trg_refund_counts_insert",
+        "CREATE TRIGGER IF NOT EXISTS trg_refund_counts_insert "
+        "AFTER INSERT ON booking_refund_records BEGIN" + _REFUND_COUNT_UP + "END",
+    ),
+    (
+        "trg_refund_counts_update",
+        "CREATE TRIGGER IF NOT EXISTS trg_refund_counts_update "
+        "AFTER UPDATE OF refund_requested_at, experience_id, booking_date ON booking_refund_records BEGIN"
+        + _REFUND_COUNT_DOWN + _REFUND_COUNT_UP + "END",
+    ),
+    (
+        "trg_refund_counts_delete",
+        "CREATE TRIGGER IF NOT EXISTS trg_refund_counts_delete "
+        "AFTER DELETE ON booking_refund_records BEGIN" + _REFUND_COUNT_DOWN + "END",
+    ),
+    (
+        "trg_customer_aggregates_insert",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_aggregates_insert "
+        "AFTER INSERT ON booking_refund_records BEGIN" + _CUSTOMER_AGGREGATE_UP + "END",
+    ),
+    (
+        "trg_customer_aggregates_update",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_aggregates_update "
+        f"AFTER UPDATE OF {_CUSTOMER_AGGREGATE_SOURCES} ON booking_refund_records BEGIN"
+        + _CUSTOMER_AGGREGATE_DOWN + _CUSTOMER_AGGREGATE_UP + "END",
+    ),
+    (
+        "trg_customer_aggregates_delete",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_aggregates_delete "
+        "AFTER DELETE ON booking_refund_records BEGIN" + _CUSTOMER_AGGREGATE_DOWN + "END",
+    ),
+    (
+        "trg_customer_data_version_insert",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_data_version_insert "
+        "AFTER INSERT ON booking_refund_records BEGIN" + _DATA_VERSION_BUMP.format(r="NEW") + "END",
+    ),
+    ("trg_customer_data_version_update", _data_version_update_trigger),
+    (
+        "trg_customer_data_version_delete",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_data_version_delete "
+        "AFTER DELETE ON booking_refund_records BEGIN" + _DATA_VERSION_BUMP.format(r="OLD") + "END",
+    ),
+    (
+        "trg_customer_notes_version_insert",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_notes_version_insert "
+        f"AFTER INSERT ON booking_refund_records WHEN {_has_note('NEW')} BEGIN"
+        + _NOTES_VERSION_BUMP.format(r="NEW") + "END",
+    ),
+    (
+        "trg_customer_notes_version_update",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_notes_version_update "
+        f"AFTER UPDATE OF {_NOTES_VERSION_SOURCES} ON booking_refund_records "
+        f"WHEN ({_has_note('OLD')} OR {_has_note('NEW')}) AND ("
+        + " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in _NOTES_VERSION_SOURCES.split(", "))
+        + ") BEGIN" + _NOTES_VERSION_BUMP.format(r="NEW")
+        + """
+    UPDATE customer_booking_aggregates SET notes_version = notes_version + 1
+    WHERE customer_id = OLD.customer_id AND OLD.customer_id IS NOT NEW.customer_id;
+END""",
+    ),
+    (
+        "trg_customer_notes_version_delete",
+        "CREATE TRIGGER IF NOT EXISTS trg_customer_notes_version_delete "
+        f"AFTER DELETE ON booking_refund_records WHEN {_has_note('OLD')} BEGIN"
+        + _NOTES_VERSION_BUMP.format(r="OLD") + "END",
+    ),
+    (
+        "trg_decision_metrics_insert",
+        "CREATE TRIGGER IF NOT EXISTS trg_decision_metrics_insert "
+        "AFTER INSERT ON decision_log BEGIN" + _DECISION_METRICS_UP + "END",
+    ),
+    (
+        "trg_decision_metrics_update",
+        "CREATE TRIGGER IF NOT EXISTS trg_decision_metrics_update "
+        f"AFTER UPDATE OF {_DECISION_METRICS_SOURCES} ON decision_log BEGIN"
+        + _DECISION_METRICS_DOWN + _DECISION_METRICS_UP + "END",
+    ),
+    (
+        "trg_decision_metrics_delete",
+        "CREATE TRIGGER IF NOT EXISTS trg_decision_metrics_delete "
+        "AFTER DELETE ON decision_log BEGIN" + _DECISION_METRICS_DOWN + "END",
+    ),
+    (
+        "trg_decision_rollup_insert",
+        "CREATE TRIGGER IF NOT EXISTS trg_decision_rollup_insert "
+        "AFTER INSERT ON decision_log BEGIN" + _decision_rollup_add("NEW") + "END",
+    ),
+    (
+        # update_l2_decision re-sets escalated_to_l2 = 1 on escalated rows;
+        # only a changed key column moves the row between buckets.
+        "trg_decision_rollup_update",
+        "CREATE TRIGGER IF NOT EXISTS trg_decision_rollup_update "
+        f"AFTER UPDATE OF {_DECISION_ROLLUP_SOURCES} ON decision_log WHEN "
+        + " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in _DECISION_ROLLUP_SOURCES.split(", "))
+        + " BEGIN" + _decision_rollup_add("OLD", "-") + _decision_rollup_add("NEW") + "END",
+    ),
+    (
+        "trg_decision_rollup_delete",
+        "CREATE TRIGGER IF NOT EXISTS trg_decision_rollup_delete "
+        "AFTER DELETE ON decision_log BEGIN" + _decision_rollup_add("OLD", "-") + "END",
+    ),
+]
+
+# Indexes superseded by a later entry in INDEXES.
+DROPPED_INDEXES: list[str] = [
+    "idx_bookings_experience_date",
+]
+
+# (name, DDL). Each index is named after the query shape it serves.
+INDEXES: list[tuple[str, str]] = [
+    # Layer 2 history, profile recompute, staleness check, /customer/{id}/bookings
+    (
+        "idx_bookings_customer_date",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_customer_date "
+        "ON booking_refund_records(customer_id, booking_date)",
+    ),
+    # Layer 0 experience/day refund volume: only refunded rows are indexed
+    (
+        "idx_bookings_refunds_by_experience_day",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_refunds_by_experience_day "
+        "ON booking_refund_records(experience_id, booking_day) "
+        "WHERE refund_requested_at IS NOT NULL",
+    ),
+    # /api/orders listing, newest first
+    (
+        "idx_bookings_booking_date",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_booking_date "
+        "ON booking_refund_records(booking_date)",
+    ),
+    # L2 escalation queue: only the open cases are indexed
+    (
+        "idx_decision_log_open_escalations",
+        "CREATE INDEX IF NOT EXISTS idx_decision_log_open_escalations "
+        "ON decision_log(risk_score, timestamp) "
+        "WHERE escalated_to_l2 = 1 AND l2_decision IS NULL",
+    ),
+]
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set[str]:
+    # table_xinfo (unlike table_info) also lists generated columns
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall()}
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def apply_schema(conn: sqlite3.Connection) -> None:
+    """Add missing columns, indexes, aggregate tables and triggers (caller commits)."""
+    for table, column, definition, backfill in COLUMNS:
+        # Tables created below by TABLES already include their columns
+        if _table_exists(conn, table) and column not in _column_names(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            if backfill:
+                conn.execute(backfill)
+    for name in DROPPED_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for _, ddl in INDEXES:
+        conn.execute(ddl)
+    for name, ddl, backfill in TABLES:
+        existed = _table_exists(conn, name)
+        conn.execute(ddl)
+        if not existed and backfill:
+            conn.execute(backfill)
+    for name, ddl in TRIGGERS:
+        if callable(ddl):
+            ddl = ddl(conn)
+        stored = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+        ).fetchone()
+        if stored is not None and stored[0] != ddl.replace(" IF NOT EXISTS", "", 1):
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.execute(ddl)
+
+
+def ensure_schema(db_path: str | None = None) -> None:
+    conn = get_connection(db_path)
+    try:
+        apply_schema(conn)
+        conn.commit()
+    finally:
+        conn.close()
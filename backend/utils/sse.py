@@ -0,0 +1,18 @@
+"""Server-Sent Events helpers for the streaming routes."""
+
+import json
+from collections.abc import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+# Disable proxy buffering (nginx honours X-Accel-Buffering) so each event is flushed as it is written.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    """One SSE frame; ``data`` is sent as single-line JSON."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)